@@ -3,6 +3,9 @@ import datetime
 import platform
 import io
 import os
+import re
+import operator
+import collections
 import ebfe
 
 # custom external module imports
@@ -13,6 +16,19 @@ from ebfe.interface import O
 
 # internal module imports
 import ebfe.tui as tui
+import ebfe.streams as streams
+import ebfe.archive as archive
+import ebfe.carve as carve
+import ebfe.compressed as compressed
+import ebfe.digest as digest
+import ebfe.edit_buffer as edit_buffer
+import ebfe.follow as follow
+import ebfe.index_cache as index_cache
+import ebfe.jobs as jobs
+import ebfe.overview as overview
+import ebfe.procmem as procmem
+import ebfe.save as save
+import ebfe.search as search
 
 PRINTABLE_ASCII_CHARMAP = '._______________________________' + \
         ''.join(chr(x) for x in range(32, 127)) + \
@@ -58,19 +74,69 @@ assert len(CP437_CHARMAP) == 256
 TWEAKED_CP437_CHARMAP = '.' + CP437_CHARMAP[1:-1] + '#'
 assert len(TWEAKED_CP437_CHARMAP) == 256
 
+# splits data into runs of printable / non-printable bytes
+CHAR_RUN_RE = re.compile(rb'[\x20-\x7E]+|[^\x20-\x7E]+')
+
 #* open_file_from_uri *******************************************************
-def open_file_from_uri (uri):
+def open_file_from_uri (uri, checkpoint_spacing = compressed.DEFAULT_CHECKPOINT_SPACING):
     if '://' in uri:
         scheme, res = uri.split('://', 1)
     else:
         scheme, res = 'file', uri
     if scheme == 'file':
         return open(res, 'rb')
+    elif scheme in compressed.SCHEMES:
+        return compressed.open_compressed(scheme, res, checkpoint_spacing)
+    elif scheme in archive.SCHEMES:
+        return archive.open_member(scheme, res, checkpoint_spacing)
     elif scheme == 'mem':
         f = io.BytesIO()
         f.write(b'All your bytes are belong to Us:' + bytes(i for i in range(256)))
         return f
 
+#* open_stream_from_uri *****************************************************
+def open_stream_from_uri (uri, server, pool, load_delay = 0, notify = None, use_mmap = True,
+        checkpoint_spacing = compressed.DEFAULT_CHECKPOINT_SPACING,
+        proc_ttl = procmem.DEFAULT_TTL):
+    '''
+    Returns the stream source for the given uri: local regular files get
+    mapped in memory, other seekable streams are read in pages kept in the
+    given page pool and the rest go through a zlx stream cache.
+    Compressed files start empty and grow as their index_job runs.
+    proc://PID gives the memory of a process (not a file object).
+    '''
+    if uri.startswith(procmem.SCHEME + '://'):
+        return procmem.open_process(uri.split('://', 1)[1], proc_ttl)
+    f = open_file_from_uri(uri, checkpoint_spacing)
+    if isinstance(f, compressed.compressed_file):
+        sc = streams.block_cache(f, pool, server, delay = load_delay, notify = notify)
+        f.on_extend = sc.extend
+        return sc
+    if use_mmap and not load_delay and streams.can_mmap(f):
+        try:
+            if isinstance(f, archive.file_region):
+                return streams.mmap_stream(f.file, f.start, f.size)
+            return streams.mmap_stream(f, notify = notify)
+        except (OSError, ValueError) as e:
+            dmsg('cannot mmap {!r}: {}', uri, e)
+    if f.seekable():
+        return streams.block_cache(f, pool, server,
+                delay = load_delay, notify = notify)
+    return streams.stream_cache_proxy(
+            streams.versioned_stream_cache(f),
+            server, delay = load_delay, notify = notify)
+
+#* is_being_indexed *********************************************************
+def is_being_indexed (sc):
+    '''
+    Tells if sc (or the stream under a piece_table) is a compressed file
+    whose index job has not found its whole size yet: its end is only
+    how far decompressing got so far.
+    '''
+    sc = getattr(sc, 'source', sc)
+    cf = getattr(sc, 'stream', None)
+    return isinstance(cf, compressed.compressed_file) and not cf.complete
+
 #* config class *************************************************************
 class settings_manager ():
 
@@ -151,6 +217,17 @@ class command_manager ():
                 'test' : self.cmd_test,
                 'q' : self.cmd_q,
                 'g' : self.cmd_g,
+                'cache' : self.cmd_cache,
+                '/' : self.cmd_search,
+                '?' : self.cmd_search,
+                'carve' : self.cmd_carve,
+                'hash' : self.cmd_hash,
+                'w' : self.cmd_w,
+                'jobs' : self.cmd_jobs,
+                'overview' : self.cmd_overview,
+                'kill' : self.cmd_kill,
+                'maps' : self.cmd_maps,
+                'follow' : self.cmd_follow,
                 }
 
     def out (self, text):
@@ -173,12 +250,72 @@ class command_manager ():
         except ValueError as e:
             self.out('!Invalid offset: ' + params)
 
+    def cmd_cache (self, cmd, params):
+        for line in O['cache_stats']():
+            self.out(line)
+
+    def cmd_search (self, cmd, params):
+        if not params:
+            O['search_next'](cmd == '?')
+            return
+        O['search'](params, cmd == '?')
+
+    def cmd_carve (self, cmd, params):
+        O['carve'](params.strip() or None)
+
+    def cmd_hash (self, cmd, params):
+        args = params.split()
+        if not args or len(args) > 3:
+            self.out('!usage: hash {} [START] [END]'.format('|'.join(digest.ALGORITHMS)))
+            return
+        try:
+            offsets = [int(a, 0) for a in args[1:]]
+        except ValueError as e:
+            self.out('!Invalid offset: ' + params)
+            return
+        O['hash'](args[0], *offsets)
+
+    def cmd_w (self, cmd, params):
+        O['save'](params.strip() or None)
+
+    def cmd_overview (self, cmd, params):
+        O['overview']()
+
+    def cmd_jobs (self, cmd, params):
+        for line in O['jobs']():
+            self.out(line)
+
+    def cmd_maps (self, cmd, params):
+        params = params.strip()
+        try:
+            O['maps'](int(params, 0) if params else None)
+        except ValueError as e:
+            self.out('!usage: maps [INDEX]')
+
+    def cmd_follow (self, cmd, params):
+        params = params.strip()
+        if params not in ('', 'on', 'off'):
+            self.out('!usage: follow [on|off]')
+            return
+        O['follow']({'': None, 'on': True, 'off': False}[params])
+
+    def cmd_kill (self, cmd, params):
+        params = params.strip()
+        if params in ('', 'all'):
+            O['kill'](params or None)
+            return
+        try:
+            O['kill'](int(params, 0))
+        except ValueError as e:
+            self.out('!Invalid job id: ' + params)
+
 #* title_bar ****************************************************************
 class title_bar (tui.window):
     '''
     Title bar
     '''
     def __init__ (self, title = ''):
+        self.clock_timer = None
         tui.window.__init__(self,
             wid = 'title_bar',
             styles = '''
@@ -191,8 +328,13 @@ class title_bar (tui.window):
         self.title = title
         self.tick = 0
 
+    def attach (self, parent):
+        tui.window.attach(self, parent)
+        if parent and self.clock_timer is None:
+            self.clock_timer = self.add_timer(1, self.on_clock_tick)
+
     def refresh_strip (self, row, col, width):
-        t = str(datetime.datetime.now())
+        t = str(datetime.datetime.now().replace(microsecond = 0))
 
         stext = self.sfmt('{passive_title}[{dash_title}{}{passive_title}]{normal_title} {} - ver {} ', "|/-\\"[self.tick & 3], self.title, ebfe.VER_STR)
         #text = '[{}] {}'.format("|/-\\"[self.tick & 3], self.title)
@@ -214,7 +356,7 @@ class title_bar (tui.window):
         self.put(0, 0, stext, clip_col = col, clip_width = width)
         #self.put(0, col, text, [col : col + width])
 
-    def on_input_timeout (self):
+    def on_clock_tick (self):
         self.tick += 1
         #self.refresh(start_row = 0, height = 1)
         self.refresh(start_row = 0, start_col = 1, height = 1, width = 1)
@@ -235,6 +377,7 @@ class status_bar (tui.window):
         self.title = title
         self.tick = 0
         self.text = ''
+        self.mode = ''
 
     def refresh_strip (self, row, col, width):
         dmsg('{}.refresh_strip(row={}, col={}, width={})', self, row, col, width)
@@ -244,6 +387,12 @@ class status_bar (tui.window):
         self.put(0, 0, stext, clip_col = col, clip_width = width)
         if len(self.text) > 0:
             self.put(0, 20, self.text)
+        if self.mode:
+            self.put(0, max(0, self.width - len(self.mode) - 1), self.mode)
+
+    def set_mode (self, mode):
+        self.mode = mode
+        self.refresh()
 
     def push (self, c):
         self.text += c
@@ -274,7 +423,7 @@ class status_bar (tui.window):
 #* job details **************************************************************
 class processing_details (tui.window):
     '''
-    Processing Job details
+    Processing Job details: a line showing the state of the background jobs
     '''
     def __init__ (self):
         tui.window.__init__(self,
@@ -283,9 +432,15 @@ class processing_details (tui.window):
             default_status_bar
             ''')
         self.lines_to_display = 1
+        self.text = 'Working...'
+
+    def set_text (self, text):
+        if text != self.text:
+            self.text = text
+            self.refresh()
 
     def refresh_strip (self, row, col, width):
-        stext = self.sfmt('{default_status_bar}Working...{}', ' ' * (self.width - 10))
+        stext = self.sfmt('{default_status_bar}{}{}', self.text, ' ' * max(0, self.width - len(self.text)))
         self.put(row, 0, stext, clip_col = col, clip_width = width)
 
 #* console ******************************************************************
@@ -323,6 +478,11 @@ class console (tui.container):
             self.msg_win.set_content(len(self.msg_win.content), '> '+text)
             self.input_win.erase_text()
 
+            if text[0] in '/?':
+                # search patterns may contain spaces
+                O['cmd'](text[0], text[1:])
+                return
+
             split = text.split(maxsplit=1)
             if len(split) > 0:
                 rest = ''
@@ -355,6 +515,142 @@ class console (tui.container):
             return True
         return False
 
+#* hex_row_renderer *********************************************************
+class hex_row_renderer (object):
+    '''
+    Precomputed styled cells for the rows of a stream_edit_window.
+    One instance exists for each theme (style markers) and charmap pair;
+    it holds 256-entry tables of styled hex cells and the separator templates
+    for each (items_per_line, column_size) layout so that a row is assembled
+    with a single join instead of formatting each byte.
+    '''
+
+# hex_row_renderer.__init__()
+    def __init__ (self, style_markers, charmap):
+        object.__init__(self)
+        sm = style_markers
+        self.sm = sm
+        self.charmap = charmap
+        self.known_cells = [sm['known_item'] + '{:02X}'.format(b) for b in range(256)]
+        self.edited_cells = [sm['altered_char'] + '{:02X}'.format(b) for b in range(256)]
+        self.uncached_cell = sm['uncached_item'] + '??'
+        self.missing_cell = sm['missing_item'] + '--'
+        self.end_cell = sm['missing_item'] + '  '
+        self.normal_char = sm['normal_char']
+        self.altered_char = sm['altered_char']
+        self.uncached_char = sm['uncached_char']
+        self.missing_char = sm['missing_char']
+        self.hex_char_sep = sm['item_char_sep'] + '  '
+        self.gap_templates = {}
+
+# hex_row_renderer.get_gaps()
+    def get_gaps (self, items_per_line, column_size):
+        '''
+        Returns the list of separators that precede each item of a row.
+        '''
+        k = (items_per_line, column_size)
+        gaps = self.gap_templates.get(k)
+        if gaps is None:
+            sep = self.sm['item1_sep'] + ' '
+            col_sep = sep + ' '
+            gaps = [''] + [col_sep if column_size and i % column_size == 0 else sep
+                    for i in range(1, items_per_line)]
+            self.gap_templates[k] = gaps
+        return gaps
+
+# hex_row_renderer.render_offset()
+    def render_offset (self, row_offset):
+        if row_offset < 0:
+            return '{}{:+08X}: '.format(self.sm['negative_offset'], row_offset)
+        return '{}{:+08X}{}: '.format(self.sm['normal_offset'], row_offset, self.sm['offset_item_sep'])
+
+# hex_row_renderer.render_chars()
+    def render_chars (self, data):
+        cm = self.charmap
+        l = []
+        for m in CHAR_RUN_RE.finditer(data):
+            run = m.group()
+            l.append(self.normal_char if run[0] >= 0x20 and run[0] <= 0x7E else self.altered_char)
+            l.append(''.join(map(cm.__getitem__, run)))
+        return ''.join(l)
+
+# hex_row_renderer.render_row()
+    def render_row (self, row_offset, blocks, items_per_line, column_size, show_hex):
+        '''
+        Returns the styled text for a row (without trailing padding).
+        '''
+        gaps = self.get_gaps(items_per_line, column_size)
+        hl = [self.render_offset(row_offset)]
+        cl = []
+        o = 0
+        for blk in blocks:
+            if blk.kind == zlx.io.SCK_CACHED:
+                data = bytes(blk.data)
+                n = len(data)
+                if show_hex:
+                    hl.append(''.join(map(operator.add, gaps[o : o + n],
+                        map(self.known_cells.__getitem__, data))))
+                cl.append(self.render_chars(data))
+            elif blk.kind == edit_buffer.SCK_EDITED:
+                data = blk.data
+                n = len(data)
+                if show_hex:
+                    hl.append(''.join(map(operator.add, gaps[o : o + n],
+                        map(self.edited_cells.__getitem__, data))))
+                cl.append(self.altered_char + ''.join(map(self.charmap.__getitem__, data)))
+            else:
+                if blk.kind == zlx.io.SCK_UNCACHED:
+                    n = blk.size
+                    cell = self.uncached_cell
+                    cl.append(self.uncached_char + '?' * n)
+                else:
+                    n = blk.size or items_per_line - o
+                    cell = self.missing_cell if blk.size else self.end_cell
+                    cl.append(self.missing_char + ' ' * n)
+                if show_hex:
+                    hl.append(cell.join(gaps[o : o + n]) + cell)
+            o += n
+        if show_hex: hl.append(self.hex_char_sep)
+        hl.extend(cl)
+        return ''.join(hl)
+
+# class hex_row_renderer - end
+
+#* row_cache ****************************************************************
+class row_cache (object):
+    '''
+    LRU map of rendered rows.
+    Keys must describe everything the rendered text depends on (including
+    the data version of the row range) so entries never need invalidating;
+    stale ones just age out.
+    '''
+
+# row_cache.__init__()
+    def __init__ (self, capacity = 1024):
+        object.__init__(self)
+        self.capacity = capacity
+        self.rows = collections.OrderedDict()
+
+# row_cache.get()
+    def get (self, key):
+        text = self.rows.get(key)
+        if text is not None:
+            self.rows.move_to_end(key)
+        return text
+
+# row_cache.put()
+    def put (self, key, text):
+        self.rows[key] = text
+        self.rows.move_to_end(key)
+        if len(self.rows) > self.capacity:
+            self.rows.popitem(last = False)
+
+# row_cache.clear()
+    def clear (self):
+        self.rows.clear()
+
+# class row_cache - end
+
 #* stream_edit_window *******************************************************
 class stream_edit_window (tui.window):
     '''
@@ -401,6 +697,7 @@ class stream_edit_window (tui.window):
 
 # stream_edit_window.__init__
     def __init__ (self, stream_cache, stream_uri):
+        self.refresh_timer = None
         tui.window.__init__(self,
                 styles = self.INACTIVE_STYLES,
                 active_styles = self.ACTIVE_STYLES,
@@ -408,6 +705,7 @@ class stream_edit_window (tui.window):
         cfg = settings_manager('ebfe.ini')
         self.stream_uri = stream_uri
         self.stream_cache = stream_cache
+        self.known_end = stream_cache.get_known_end_offset()
         self.stream_offset = 0
         self.cursor_offset = 0
         self.cursor_strip = 0
@@ -422,92 +720,96 @@ class stream_edit_window (tui.window):
         self.show_hex = True
         self.character_display = cfg.get('window: hex edit', 'charmap', 'printable_ascii')
         self.charmap = globals()[self.character_display.upper() + '_CHARMAP']
+        self.row_renderers = {}
+        self.row_cache = row_cache(cfg.iget('window: hex edit', 'row_cache_size', 1024))
+        self.read_ahead = streams.read_ahead(
+                max_screens = cfg.iget('window: hex edit', 'prefetch_screens', 8),
+                radius = cfg.iget('window: hex edit', 'prefetch_radius', 2))
         self.temp_demo_update_strip = False
+        self.edit_mode = None
+        self.edit_nibble_offset = None
+        self.journal = None
+        self.journal_budget = cfg.iget('window: hex edit', 'undo_budget_mb', 64) << 20
+        if hasattr(stream_cache, 'replace'):
+            self.journal = edit_buffer.edit_journal(stream_cache, budget = self.journal_budget)
         O['hexedit_goto'] = self.move_cursor_to_offset
 
+# stream_edit_window.set_stream_cache
+    def set_stream_cache (self, stream_cache):
+        '''
+        Replaces the stream shown (after the file got saved); the edit
+        history does not apply to the new stream and is dropped.
+        '''
+        self.stream_cache = stream_cache
+        self.known_end = stream_cache.get_known_end_offset()
+        self.journal = None
+        if hasattr(stream_cache, 'replace'):
+            self.journal = edit_buffer.edit_journal(stream_cache, budget = self.journal_budget)
+        self.edit_nibble_offset = None
+        self.row_cache.clear()
+        self.update_refresh_timer()
+        self.refresh()
+
+# stream_edit_window.attach
+    def attach (self, parent):
+        tui.window.attach(self, parent)
+        self.update_refresh_timer()
+
+# stream_edit_window.update_refresh_timer
+    def update_refresh_timer (self):
+        '''
+        Streams that change on their own (a process) ask to be checked
+        every so often; the timer runs while the window is attached.
+        '''
+        self.cancel_timer(self.refresh_timer)
+        self.refresh_timer = None
+        if not self.parent: return
+        interval = self.stream_cache.get_refresh_interval()
+        if interval: self.refresh_timer = self.add_timer(interval, self.on_input_timeout)
+
+# stream_edit_window.get_theme
+    def get_theme (self):
+        return 'active' if self.style_markers is self.active_style_markers else 'inactive'
+
+# stream_edit_window.get_row_renderer
+    def get_row_renderer (self, theme):
+        '''
+        Returns the hex_row_renderer for the given theme and current charmap.
+        '''
+        k = (theme, self.character_display)
+        r = self.row_renderers.get(k)
+        if r is None:
+            r = hex_row_renderer(self.style_markers, self.charmap)
+            self.row_renderers[k] = r
+        return r
+
+# stream_edit_window.render_row
+    def render_row (self, row_offset):
+        '''
+        Returns the styled text for the row starting at given offset, reusing
+        the cached text if the data in that range has not changed.
+        Rows showing uncached data are not kept so that the next refresh asks
+        the stream cache again (which queues the load).
+        '''
+        n = self.items_per_line
+        theme = self.get_theme()
+        k = (row_offset, n, self.column_size, self.show_hex,
+                self.character_display, theme,
+                self.stream_cache.get_data_version(row_offset, n))
+        stext = self.row_cache.get(k)
+        if stext is None:
+            blocks = self.stream_cache.get(row_offset, n)
+            #dmsg('got {!r}', blocks)
+            stext = self.get_row_renderer(theme).render_row(row_offset, blocks,
+                    n, self.column_size, self.show_hex)
+            if all(blk.kind != zlx.io.SCK_UNCACHED for blk in blocks):
+                self.row_cache.put(k, stext)
+        return stext
+
 # stream_edit_window.refresh_strip
     def refresh_strip (self, row, col, width):
         row_offset = self.stream_offset + row * self.items_per_line
-        #text = self.offset_format.format(row_offset)
-        if row_offset < 0:
-            stext = self.sfmt('{negative_offset}{:+08X}: ', row_offset)
-        else:
-            stext = self.sfmt('{normal_offset}{:+08X}{offset_item_sep}: ', row_offset)
-
-        o = 0
-        blocks = self.stream_cache.get(row_offset, self.items_per_line)
-        #dmsg('got {!r}', blocks)
-        cstrip = ''
-        last_cstrip_style = '{normal}'
-        for blk in blocks:
-            if blk.kind == zlx.io.SCK_HOLE:
-                if blk.size == 0:
-                    x = '{missing_item}  '
-                    c = ' '
-                    #x = '  '
-                    #c = ' '
-                    n = self.items_per_line - o
-                else:
-                    x = '{missing_item}--'
-                    c = ' '
-                    #c = ' '
-                    n = blk.size
-                #stext += self.sfmt('{item1_sep} '.join((x for i in range(n))))
-                if self.show_hex:
-                    for i in range(n):
-                        if i+o != 0:
-                            stext += self.sfmt('{item1_sep} ')
-                            if self.column_size != 0 and ((i+o) % self.column_size) == 0:
-                                stext += ' '
-                        stext += self.sfmt(x)
-                #text += ' '.join((x for i in range(n)))
-                last_cstrip_style = '{missing_char}'
-                cstrip += self.sfmt(last_cstrip_style + '{}', c * n)
-            elif blk.kind == zlx.io.SCK_UNCACHED:
-                #text += ' '.join(('??' for i in range(blk.size)))
-                #stext += self.sfmt('{item1_sep} '.join(('{uncached_item}??' for i in range(blk.size))))
-                if self.show_hex:
-                    for i in range(blk.size):
-                        if i+o != 0:
-                            stext += self.sfmt('{item1_sep} ')
-                            if self.column_size != 0 and ((i+o) % self.column_size) == 0:
-                                stext += ' '
-                        stext += self.sfmt('{uncached_item}??')
-
-                last_cstrip_style = '{uncached_char}'
-                cstrip += self.sfmt(last_cstrip_style + '?' * blk.size)
-            elif blk.kind == zlx.io.SCK_CACHED:
-                #text += ' '.join(('{:02X}'.format(b) for b in blk.data))
-                #cstrip = ''.join((chr(b) if b >= 0x20 and b <= 0x7E else '.' for b in blk.data))
-                #stext += self.sfmt('{item1_sep} ').join((self.sfmt('{known_item}{:02X}', b) for b in blk.data))
-                i = 0
-                for b in blk.data:
-                    if self.show_hex:
-                        if i + o != 0:
-                            stext += self.sfmt('{item1_sep} ')
-                            if self.column_size != 0 and ((i+o) % self.column_size) == 0:
-                                stext += ' '
-                        stext += self.sfmt('{known_item}{:02X}', b)
-
-                    if b >= 0x20 and b <= 0x7E:
-                        cstrip_style = '{normal_char}'
-                    else:
-                        cstrip_style = '{altered_char}'
-                    if cstrip_style != last_cstrip_style:
-                        cstrip += self.sfmt(cstrip_style)
-                        last_cstrip_style = cstrip_style
-                    ch = self.charmap[b]
-                    cstrip += ch
-                    i += 1
-                #cstrip += ''.join((self.sfmt('{normal_char}{}', chr(b)) if b >= 0x20 and b <= 0x7E else self.sfmt('{altered_char}.') for b in blk.data))
-            o += blk.get_size()
-            #text += ' '
-            #stext += self.sfmt('{item1_sep} ')
-        if self.show_hex: stext += self.sfmt('{item_char_sep}  ')
-        stext += cstrip
-        #text += ' ' + cstrip
-        #text = text.ljust(self.width)
-        #self.write(row, 0, 'default', text, clip_col = col, clip_width = width)
+        stext = self.render_row(row_offset)
         sw = tui.compute_styled_text_width(stext)
         stext += self.sfmt('{default}{}', ' ' * max(0, self.width  - sw))
         self.put(row, 0, stext, clip_col = col, clip_width = width)
@@ -518,13 +820,15 @@ class stream_edit_window (tui.window):
 
         if row == self.cursor_strip:
             strip_bin_offset =self.cursor_offset - (self.stream_offset + (self.items_per_line * row))
+            # offsets past 32 bits (process memory) take more columns
+            offset_width = len('{:+08X}: '.format(row_offset))
             extra_offset_hex = strip_bin_offset // self.column_size
-            extra_offset_hex += 10      # skip the offset
+            extra_offset_hex += offset_width      # skip the offset
 
             extra_offset_ascii = self.items_per_line // self.column_size
             if self.items_per_line % self.column_size > 0:
                 extra_offset_ascii += 1
-            extra_offset_ascii += 10      # skip the offset
+            extra_offset_ascii += offset_width      # skip the offset
             extra_offset_ascii += self.items_per_line * 3
 
             self.update_style(row, strip_bin_offset * 3 + extra_offset_hex, 2, 'normal_title')
@@ -539,50 +843,122 @@ class stream_edit_window (tui.window):
             shift = ofs % self.items_per_line
             half = ((self.height * percentage) // 100) * self.items_per_line
             self.stream_offset = ofs - half - shift + stream_shift
+        if ofs != self.cursor_offset: self.edit_nibble_offset = None
         self.cursor_offset = ofs
         self.cursor_strip = (ofs - self.stream_offset) // self.items_per_line
         self.refresh()
-
-# stream_edit_window.move_cursor
-    def move_cursor (self, x, y):
-        old_strip = self.cursor_strip
-        new_offset = self.cursor_offset + x + (y * self.items_per_line)
-        # If new offset for cursor is negative then we don't update anything
-        if new_offset < 0:
+        self.update_prefetch(jump = True)
+
+# stream_edit_window.get_sparse_map
+    def get_sparse_map (self):
+        '''
+        Returns the sparse_map of the holes of the stream or None.
+        '''
+        sc = self.stream_cache
+        return sc.get_sparse_map() if hasattr(sc, 'get_sparse_map') else None
+
+# stream_edit_window.jump_to_data
+    def jump_to_data (self, backward = False):
+        '''
+        Moves the cursor to the start of the next (or previous) data extent
+        of a sparse file; elsewhere it moves one row like j / k.
+        '''
+        sparse = self.get_sparse_map()
+        if sparse is None:
+            self.vmove(-1 if backward else +1)
             return
-        self.cursor_offset = new_offset
-
-        strip = (new_offset - self.stream_offset) // self.items_per_line
-        
+        if backward: ofs = sparse.prev_data(self.cursor_offset)
+        else: ofs = sparse.next_data(self.cursor_offset)
+        if ofs is None:
+            O['console_out']('!no data extent {} 0x{:X}'.format(
+                'before' if backward else 'after', self.cursor_offset))
+            return
+        self.move_cursor_to_offset(ofs, 20)
+
+# stream_edit_window.update_prefetch
+    def update_prefetch (self, jump = False):
+        '''
+        Tells the stream which ranges to read ahead given how the view moved.
+        Call after refreshing so the visible rows get loaded first.
+        '''
+        ranges = self.read_ahead.update(self.stream_offset,
+                self.items_per_line * self.height, jump)
+        if ranges: self.stream_cache.prefetch(ranges)
+
+# stream_edit_window.place_cursor
+    def place_cursor (self):
+        '''
+        Computes the cursor strip, scrolling the view if needed to bring
+        the cursor inside the window.
+        '''
+        strip = (self.cursor_offset - self.stream_offset) // self.items_per_line
         # if the strip is negative then we just set it to 0 and scroll up the window
         if strip < 0:
             self.cursor_strip = 0
             self.stream_offset -= -strip * self.items_per_line
-            self.refresh()
         elif strip > self.height-1:
             self.cursor_strip = self.height-1
             self.stream_offset += (strip - (self.height - 1)) * self.items_per_line
-            self.refresh()
         else:
-            # if cursor move doesn't require a window scroll then refresh a maximum of two lines
             self.cursor_strip = strip
 
-            if old_strip == strip:
-                self.refresh(start_row = strip, height = 1)
+# stream_edit_window.update_view
+    def update_view (self, old_stream_offset, old_cursor_strip):
+        '''
+        Refreshes what changed since the view was at old_stream_offset with
+        the cursor on old_cursor_strip. Scrolls by whole rows shift the
+        displayed content and render only the rows exposed.
+        '''
+        disp = self.stream_offset - old_stream_offset
+        if disp % self.items_per_line:
+            self.refresh()
+            return
+        rows = disp // self.items_per_line
+        if rows:
+            if not self.scroll_rows(rows):
+                self.refresh()
+                return
+            if rows > 0:
+                self.refresh(start_row = self.height - rows, height = rows)
             else:
-                self.refresh(start_row = old_strip, height = 1)
-                self.refresh(start_row = strip, height = 1)
+                self.refresh(start_row = 0, height = -rows)
+        # if cursor move doesn't require a window scroll then refresh a maximum of two lines
+        old_cursor_strip -= rows
+        if old_cursor_strip >= 0 and old_cursor_strip < self.height and old_cursor_strip != self.cursor_strip:
+            self.refresh(start_row = old_cursor_strip, height = 1)
+        self.refresh(start_row = self.cursor_strip, height = 1)
+
+# stream_edit_window.move_cursor
+    def move_cursor (self, x, y):
+        old_strip = self.cursor_strip
+        old_stream_offset = self.stream_offset
+        new_offset = self.cursor_offset + x + (y * self.items_per_line)
+        # If new offset for cursor is negative then we don't update anything
+        if new_offset < 0:
+            return
+        self.cursor_offset = new_offset
+        self.place_cursor()
+        self.update_view(old_stream_offset, old_strip)
+        self.update_prefetch()
 
 # stream_edit_window.vmove
     def vmove (self, count = 1):
-        self.stream_offset += self.items_per_line * count
+        '''
+        Scrolls the view by count rows; the cursor moves along so it keeps
+        its place in the window.
+        '''
+        old_strip = self.cursor_strip
+        old_stream_offset = self.stream_offset
+        disp = self.items_per_line * count
+        self.stream_offset += disp
+        self.cursor_offset = max(0, self.cursor_offset + disp)
+        self.place_cursor()
         if self.fluent_scroll:
-            self.move_cursor(0, 0)
-            self.refresh()
+            self.update_view(old_stream_offset, old_strip)
         else:
-            self.move_cursor(0, 0)
-            self.refresh_on_next_tick = True
+            self.defer_refresh()
             self.refresh(height = 2)
+        self.update_prefetch()
 
 # stream_edit_window.shift_offset
     def shift_offset (self, disp):
@@ -590,26 +966,45 @@ class stream_edit_window (tui.window):
             self.stream_offset -= disp
         else:
             self.stream_offset += disp
-        self.move_cursor(0, 0)
+        self.place_cursor()
         self.refresh()
 
 # stream_edit_window.adjust_items_per_line
     def adjust_items_per_line (self, disp):
         self.items_per_line += disp
         if self.items_per_line < 1: self.items_per_line = 1
+        self.place_cursor()
         if self.fluent_resize:
-            self.move_cursor(0, 0)
             self.refresh()
         else:
-            self.move_cursor(0, 0)
-            self.refresh_on_next_tick = True
+            self.defer_refresh()
             self.refresh(height = 1)
 
+# stream_edit_window.defer_refresh
+    def defer_refresh (self):
+        if not self.refresh_on_next_tick:
+            self.refresh_on_next_tick = True
+            self.add_timer(0.1, self.on_input_timeout, repeat = False)
+
+# stream_edit_window.on_resize
+    def on_resize (self, width, height):
+        self.place_cursor()
+        self.refresh()
+
 # stream_edit_window.on_input_timeout
     def on_input_timeout (self):
         upd = self.stream_cache.reset_updated()
+        if upd:
+            end = self.stream_cache.get_known_end_offset()
+            old_end, self.known_end = self.known_end, end
+            if end > old_end and self.cursor_offset == old_end - 1:
+                # the stream grew with the cursor on its last byte (G): it
+                # stays at the end, like tail -f
+                self.refresh_on_next_tick = False
+                self.jump_to_end()
+                return
         if self.refresh_on_next_tick or upd:
-            self.move_cursor(0, 0)
+            self.place_cursor()
             self.refresh_on_next_tick = False
             self.refresh()
 
@@ -622,13 +1017,18 @@ class stream_edit_window (tui.window):
         else:
             self.show_hex = True
             self.items_per_line = self.prev_items_per_line
-        self.move_cursor(0, 0)
+        self.place_cursor()
         self.refresh()
 
 # stream_edit_window.jump_to_end
     def jump_to_end (self):
+        '''
+        Moves the cursor to the last byte; it stays there when the stream
+        grows (see on_input_timeout()).
+        '''
         #self.move_cursor_to_offset(self.stream_cache.get_known_end_offset() - 1, 90)
-        self.move_cursor_to_offset(self.stream_cache.get_known_end_offset() - 1, 95)
+        self.known_end = self.stream_cache.get_known_end_offset()
+        self.move_cursor_to_offset(self.known_end - 1, 95)
         self.refresh()
 
 # stream_edit_window.jump_to_begin
@@ -642,17 +1042,113 @@ class stream_edit_window (tui.window):
             ofs = O['status_get']()
 
         self.cursor_offset = ofs
-        self.move_cursor(0, 0)
+        self.place_cursor()
         self.refresh()
+        self.update_prefetch(jump = True)
+
+# stream_edit_window.EDIT_MODE_NAMES
+    EDIT_MODE_NAMES = {
+        'overwrite': '-- REPLACE --',
+        'insert': '-- INSERT --',
+    }
+
+# stream_edit_window.set_edit_mode
+    def set_edit_mode (self, mode):
+        '''
+        Selects the edit mode: None (keys navigate), 'overwrite' or 'insert'
+        (hex digits edit the byte at the cursor, one nibble at a time).
+        '''
+        if mode and not self.journal:
+            O['console_out']('!{} cannot be edited'.format(self.stream_uri))
+            return
+        self.edit_mode = mode
+        self.edit_nibble_offset = None
+        if self.journal: self.journal.seal()
+        O['status_mode'](self.EDIT_MODE_NAMES.get(mode, ''))
+
+# stream_edit_window.edit_nibble
+    def edit_nibble (self, value):
+        '''
+        The first digit typed for a byte sets its high nibble (inserting a
+        byte in insert mode), the second one its low nibble and moves on.
+        '''
+        sc = self.stream_cache
+        o = self.cursor_offset
+        if o > sc.get_known_end_offset(): return
+        if self.edit_nibble_offset == o:
+            b = sc.get_byte(o) or 0
+            self.journal.replace(self.edit_mode, o, 1, bytes(((b & 0xF0) | value, )), o, o + 1)
+            self.edit_nibble_offset = None
+            self.refresh(start_row = self.cursor_strip, height = 1)
+            self.move_cursor(1, 0)
+            return
+        if self.edit_mode == 'insert':
+            self.journal.replace('insert', o, 0, bytes((value << 4, )), o, o)
+            self.refresh(start_row = self.cursor_strip)
+        else:
+            b = sc.get_byte(o) or 0
+            self.journal.replace('overwrite', o, 1, bytes(((value << 4) | (b & 0x0F), )), o, o)
+            self.refresh(start_row = self.cursor_strip, height = 1)
+        self.edit_nibble_offset = o
+
+# stream_edit_window.delete_at_cursor
+    def delete_at_cursor (self, before = False):
+        if not self.journal: return
+        o = self.cursor_offset
+        if before:
+            if o == 0: return
+            self.move_cursor(-1, 0)
+        self.journal.replace('delete', self.cursor_offset, 1, b'', o, self.cursor_offset)
+        self.edit_nibble_offset = None
+        self.refresh(start_row = self.cursor_strip)
+
+# stream_edit_window.undo
+    def undo (self, redo = False):
+        '''
+        Reverts (or redoes) the last edit and moves the cursor where it was
+        before (after) it.
+        '''
+        if not self.journal: return
+        e = self.journal.redo() if redo else self.journal.undo()
+        if e is None:
+            O['console_out']('!nothing to ' + ('redo' if redo else 'undo'))
+            return
+        self.edit_nibble_offset = None
+        self.move_cursor_to_offset(e.cursor_after if redo else e.cursor_before)
+
+# stream_edit_window.on_edit_key
+    def on_edit_key (self, key):
+        '''
+        Handles the keys that behave differently in the edit modes.
+        '''
+        if len(key) == 1 and key in '0123456789abcdefABCDEF':
+            self.edit_nibble(int(key, 16))
+            return True
+        self.edit_nibble_offset = None
+        if key == 'Esc': self.set_edit_mode(None)
+        elif key == 'Ic':
+            self.set_edit_mode('overwrite' if self.edit_mode == 'insert' else 'insert')
+        elif key == 'Backspace':
+            if self.edit_mode == 'insert': self.delete_at_cursor(before = True)
+            else: self.move_cursor(-1, 0)
+        else:
+            return False
+        return True
+
+# stream_edit_window.NAV_KEYS
+    NAV_KEYS = ('j', 'J', 'k', 'K', 'Ctrl-F', ' ', 'Ctrl-B', 'Ctrl-D',
+            'Ctrl-U', 'Left', 'Up', 'Right', 'Down')
 
 # stream_edit_window.on_key
     def on_key (self, key):
-        if key in ('0123456789xXaAbBcCdDeEfF'): O['status_push'](key)
+        if self.edit_mode and self.on_edit_key(key): return True
+        if key in self.NAV_KEYS: return self.on_key_repeat(key, 1)
+        elif key in ('0123456789xXaAbBcCdDeEfF'): O['status_push'](key)
         elif key == ('Backspace'): O['status_pop']()
-        elif key in ('j', 'J'): self.vmove(+1)
-        elif key in ('k', 'K'): self.vmove(-1)
         elif key in ('g',): self.jump_to_begin()
         elif key in ('G',): self.jump_to_end()
+        elif key in (']',): self.jump_to_data()
+        elif key in ('[',): self.jump_to_data(backward = True)
         elif key in ('<', 'h'): self.shift_offset(-1)
         elif key in ('>', 'l'): self.shift_offset(+1)
         elif key in ('_',): self.adjust_items_per_line(-1)
@@ -665,40 +1161,45 @@ class stream_edit_window (tui.window):
             #self.move_cursor(0, 0)
             self.move_cursor_to_offset(0x500, percentage=80)
         elif key in ('Enter',): self.cycle_modes()
-        elif key in ('Ctrl-F', ' '): self.vmove(self.height - 3) # Ctrl-F
-        elif key in ('Ctrl-B',): self.vmove(-(self.height - 3)) # Ctrl-B
-        elif key in ('Ctrl-D',): self.vmove(self.height // 3) # Ctrl-D
-        elif key in ('Ctrl-U',): self.vmove(-(self.height // 3)) # Ctrl-U
-
-        elif key in ('Left'): 
-            val = 1
-            if not O['status_is_empty']():
-                val = O['status_get']()
-            self.move_cursor(-val, 0)
-        
-        elif key in ('Up'): 
-            val = 1
-            if not O['status_is_empty']():
-                val = O['status_get']()
-            self.move_cursor(0, -val)
-        
-        elif key in ('Right'): 
-            val = 1
-            if not O['status_is_empty']():
-                val = O['status_get']()
-            self.move_cursor(val, 0)
-        
-        elif key in ('Down'): 
-            val = 1
-            if not O['status_is_empty']():
-                val = O['status_get']()
-            self.move_cursor(0, val)
-        
+        elif key in ('n',): O['search_next'](False)
+        elif key in ('N',): O['search_next'](True)
+        elif key in ('R',): self.set_edit_mode('overwrite')
+        elif key in ('i', 'Ic'): self.set_edit_mode('insert')
+        elif key in ('Dc',): self.delete_at_cursor()
+        elif key in ('u',): self.undo()
+        elif key in ('Ctrl-R',): self.undo(redo = True)
         else:
             dmsg("Unknown key: {}", key)
             return False
         return True
 
+# stream_edit_window.on_key_repeat
+    def on_key_repeat (self, key, count):
+        '''
+        Navigation keys pressed count times in a row result in one move.
+        '''
+        if key not in self.NAV_KEYS:
+            return tui.window.on_key_repeat(self, key, count)
+        # batched presses come here without going through on_edit_key():
+        # a digit typed after moving starts a new byte
+        self.edit_nibble_offset = None
+        if key in ('j', 'J'): self.vmove(+count)
+        elif key in ('k', 'K'): self.vmove(-count)
+        elif key in ('Ctrl-F', ' '): self.vmove(count * (self.height - 3)) # Ctrl-F
+        elif key in ('Ctrl-B',): self.vmove(-count * (self.height - 3)) # Ctrl-B
+        elif key in ('Ctrl-D',): self.vmove(count * (self.height // 3)) # Ctrl-D
+        elif key in ('Ctrl-U',): self.vmove(-count * (self.height // 3)) # Ctrl-U
+        else:
+            # the first press can use the count typed in the status bar
+            val = count
+            if not O['status_is_empty']():
+                val = O['status_get']() + count - 1
+            if key in ('Left'): self.move_cursor(-val, 0)
+            elif key in ('Up'): self.move_cursor(0, -val)
+            elif key in ('Right'): self.move_cursor(val, 0)
+            elif key in ('Down'): self.move_cursor(0, val)
+        return True
+
 # stream_edit_window.on_focus_change()
     def on_focus_change (self):
         tui.window.on_focus_change(self)
@@ -747,13 +1248,44 @@ with some default key-mappings to keep you going before you hit the shelves.
 {key}Tab{normal}{tab}8{cpar}    cycle focus between windows{br}
 {key}:{normal}{tab}8{cpar}      open (or switch to) command window{br}
 {key}F1{normal}{tab}8{cpar}     toggle this help window{br}
+{key}F2{normal}{tab}8{cpar}     toggle the overview map (entropy and byte
+        classes along the file; {key}Enter{normal}{sp}on a row moves the
+        cursor there){br}
+{key}Ctrl-X{normal}{tab}8{cpar} cancel the last background job started{br}
 {key}Alt-x{normal}{tab}8{cpar}  exit{br}
 
 
 {par}{stress}Hex editor window keys:{br}
 {key}Up{normal}, {key}k{normal}{tab}12{cpar}    move up{br}
 {key}Down{normal}, {key}j{normal}{tab}12{cpar}  move down{br}
+{key}]{normal}, {key}[{normal}{tab}12{cpar}     next / previous data extent of a sparse file{br}
+{key}g{normal}, {key}G{normal}{tab}12{cpar}     go to the start / end (the cursor stays at the end
+        while a followed file grows){br}
 {key}Enter{normal}{tab}12{cpar}                 cycle modes{br}
+{key}/{normal}, {key}?{normal}{tab}12{cpar}     search forward / backward{br}
+{key}n{normal}, {key}N{normal}{tab}12{cpar}     next / previous match{br}
+{key}R{normal}, {key}i{normal}{tab}12{cpar}     overwrite / insert mode (type hex digits, {key}Esc{normal}{sp}to leave){br}
+{key}Del{normal}{tab}12{cpar}                   delete the byte under the cursor{br}
+{key}u{normal}, {key}Ctrl-R{normal}{tab}12{cpar} undo / redo{br}
+
+{par}{wrap_indent}8{stress}Commands:{br}
+{key}w{normal}{tab}8{cpar}      write the changes (to the given file or the one
+        being edited; only the changed bytes get written when nothing moved){br}
+{key}jobs{normal}{tab}8{cpar}   list the background jobs{br}
+{key}kill{normal}{tab}8{cpar}   cancel a background job (by id, or {key}all{normal}){br}
+{key}maps{normal}{tab}8{cpar}   list the memory regions of a process opened as
+        {key}proc://PID{normal}; {key}maps N{normal}{sp}goes to region N{br}
+{key}overview{normal}{tab}8{cpar} map the file again in the overview panel{br}
+{key}follow{normal}{tab}8{cpar} follow the file as it grows (like {key}tail -f{normal};
+        {key}follow on{normal}{sp}/ {key}follow off{normal}, toggles by default); carve
+        results and the overview map then get extended with the new data{br}
+{key}hash{normal}{tab}8{cpar}   hash the file or a range of it: {key}hash ALGO [START] [END]{normal}
+        with ALGO one of md5, sha1, sha256, sha512, blake2b, crc32 or the
+        tree hashes sha256-tree and blake2b-tree (hashed on all cores){br}
+{key}carve{normal}{tab}8{cpar}  scan for known file signatures
+        (from the given file, the signatures.txt file in the config folder
+        or the built-in ones); {key}Enter{normal}{sp}on a hit moves the cursor
+        to it{br}
 
 {par}
 For more info:{br}
@@ -777,6 +1309,291 @@ For more info:{br}
     def run_command (self, cmd):
         O['cmd'](*cmd.split(' ', 1))
 
+#* carve_results_window *****************************************************
+class carve_results_window (tui.window):
+    '''
+    Lists the hits of a carve job. Only the visible rows get formatted, so
+    the list can hold millions of hits; it follows the job as it grows.
+    '''
+
+    ACTIVE_STYLES = '''
+        normal=active_list_normal
+        selected=active_list_selected
+        heading=active_list_heading
+    '''
+
+    INACTIVE_STYLES = '''
+        normal=inactive_list_normal
+        selected=inactive_list_selected
+        heading=inactive_list_heading
+    '''
+
+# carve_results_window.__init__()
+    def __init__ (self, goto = None):
+        tui.window.__init__(self,
+            wid = 'carve_results_win',
+            styles = self.INACTIVE_STYLES,
+            active_styles = self.ACTIVE_STYLES,
+            can_have_focus = True)
+        self.goto = goto or (lambda offset: None)
+        self.job = None
+        self.top = 0
+        self.selected = 0
+        self.shown_count = 0
+        self.shown_heading = ''
+
+# carve_results_window.set_job()
+    def set_job (self, job, keep_place = False):
+        '''
+        Shows the hits of job, from the top unless keep_place is set (the
+        job extends the one shown).
+        '''
+        self.job = job
+        if not keep_place:
+            self.top = 0
+            self.selected = 0
+        self.shown_count = 0
+        self.shown_heading = ''
+        self.refresh()
+
+# carve_results_window.get_hit_count()
+    def get_hit_count (self):
+        return self.job.get_hit_count() if self.job else 0
+
+# carve_results_window.get_heading()
+    def get_heading (self):
+        job = self.job
+        if not job: return 'No carve results'
+        n = job.get_hit_count()
+        if job.done:
+            return '{} hits{}'.format(n, ' (cancelled)' if job.cancel_event.is_set() else '')
+        return '{} hits, {:.0f}%'.format(n, job.get_progress() * 100)
+
+# carve_results_window.refresh_strip()
+    def refresh_strip (self, row, col, width):
+        if row == 0:
+            stext = self.sfmt('{heading}{}', self.shown_heading.ljust(self.width))
+        else:
+            index = self.top + row - 1
+            if index < self.shown_count:
+                offset, name = self.job.get_hit(index)
+                text = '{:012X} {}'.format(offset, name).ljust(self.width)
+                stext = self.sfmt('{selected}{}' if index == self.selected else '{normal}{}', text)
+            else:
+                stext = self.sfmt('{normal}{}', ' ' * self.width)
+        self.put(row, 0, stext, clip_col = col, clip_width = width)
+
+# carve_results_window.update()
+    def update (self):
+        '''
+        Refreshes the heading and the rows that got new hits since the last
+        call; called periodically while the job runs.
+        '''
+        heading = self.get_heading()
+        if heading != self.shown_heading:
+            self.shown_heading = heading
+            self.refresh(start_row = 0, height = 1)
+        n = self.get_hit_count()
+        if n != self.shown_count:
+            old = self.shown_count
+            self.shown_count = n
+            start = max(old - self.top, 0) + 1
+            if start < self.height:
+                self.refresh(start_row = start, height = self.height - start)
+
+# carve_results_window.select()
+    def select (self, index):
+        n = self.get_hit_count()
+        if n == 0: return
+        index = max(0, min(n - 1, index))
+        rows = max(1, self.height - 1)
+        old_top = self.top
+        old_selected = self.selected
+        self.selected = index
+        if index < self.top: self.top = index
+        elif index >= self.top + rows: self.top = index - rows + 1
+        if self.top != old_top:
+            self.refresh(start_row = 1, height = rows)
+            return
+        for i in (old_selected, index):
+            self.refresh(start_row = i - self.top + 1, height = 1)
+
+# carve_results_window.on_resize()
+    def on_resize (self, width, height):
+        self.select(self.selected)
+        self.refresh()
+
+# carve_results_window.on_input_timeout()
+    def on_input_timeout (self):
+        self.update()
+
+# carve_results_window.on_key()
+    def on_key (self, key):
+        page = max(1, self.height - 2)
+        if key in ('j', 'Down'): self.select(self.selected + 1)
+        elif key in ('k', 'Up'): self.select(self.selected - 1)
+        elif key in ('Npage', 'Ctrl-F'): self.select(self.selected + page)
+        elif key in ('Ppage', 'Ctrl-B'): self.select(self.selected - page)
+        elif key in ('g', 'Home'): self.select(0)
+        elif key in ('G', 'End'): self.select(self.get_hit_count() - 1)
+        elif key in ('Enter', ):
+            if self.selected < self.get_hit_count():
+                self.goto(self.job.get_hit(self.selected)[0])
+        else:
+            return False
+        return True
+
+# class carve_results_window - end
+
+#* overview_window **********************************************************
+class overview_window (tui.window):
+    '''
+    Shows the map of an overview job: one row per range of buckets with its
+    offset, entropy, the percentages of zero, text and high bytes and an
+    entropy bar. Rows with no bucket computed yet repeat the closest one
+    before them, dimmed, until the job gets to them.
+    '''
+
+    ACTIVE_STYLES = '''
+        normal=active_list_normal
+        selected=active_list_selected
+        heading=active_list_heading
+        dim=active_list_dim
+    '''
+
+    INACTIVE_STYLES = '''
+        normal=inactive_list_normal
+        selected=inactive_list_selected
+        heading=inactive_list_heading
+        dim=inactive_list_dim
+    '''
+
+    BAR_CHARS = ' \u258F\u258E\u258D\u258C\u258B\u258A\u2589\u2588'
+
+# overview_window.__init__()
+    def __init__ (self, goto = None):
+        tui.window.__init__(self,
+            wid = 'overview_win',
+            styles = self.INACTIVE_STYLES,
+            active_styles = self.ACTIVE_STYLES,
+            can_have_focus = True)
+        self.goto = goto or (lambda offset: None)
+        self.job = None
+        self.selected = 0
+        self.shown_done_count = None
+        self.shown_heading = ''
+
+# overview_window.set_job()
+    def set_job (self, job, keep_place = False):
+        self.job = job
+        if not keep_place: self.selected = 0
+        self.shown_done_count = None
+        self.shown_heading = ''
+        self.refresh()
+
+# overview_window.get_row_count()
+    def get_row_count (self):
+        if not self.job: return 0
+        return min(self.job.bucket_count, max(0, self.height - 1))
+
+# overview_window.get_row_buckets()
+    def get_row_buckets (self, index):
+        '''
+        Returns the range [first, last) of buckets shown on a row.
+        '''
+        n = self.job.bucket_count
+        rows = self.get_row_count()
+        return index * n // rows, (index + 1) * n // rows
+
+# overview_window.get_heading()
+    def get_heading (self):
+        job = self.job
+        if not job: return 'No overview'
+        w = len('{:X}'.format(max(0, job.end - 1)))
+        text = '{:<{}} ent nul txt  hi'.format('offset', w)
+        if job.done:
+            return text + (' (cancelled)' if job.is_cancelled() else '')
+        return text + ' {:.0f}%'.format(job.get_progress() * 100)
+
+# overview_window.format_row()
+    def format_row (self, index):
+        job = self.job
+        first, last = self.get_row_buckets(index)
+        w = len('{:X}'.format(max(0, job.end - 1)))
+        st, exact = job.get_range_stats(first, last)
+        text = '{:0{}X}'.format(job.get_bucket_offset(first), w)
+        if st is None: return text.ljust(self.width), False
+        text += ' {:3.1f} {:3.0f} {:3.0f} {:3.0f} '.format(st.entropy,
+                st.zero * 100, st.text * 100, st.high * 100)
+        bar_width = max(0, self.width - len(text))
+        eighths = int(st.entropy / 8 * bar_width * 8 + 0.5)
+        bar = self.BAR_CHARS[-1] * (eighths >> 3)
+        if eighths & 7: bar += self.BAR_CHARS[eighths & 7]
+        return (text + bar).ljust(self.width), exact
+
+# overview_window.refresh_strip()
+    def refresh_strip (self, row, col, width):
+        if row == 0:
+            stext = self.sfmt('{heading}{}', self.shown_heading.ljust(self.width))
+        elif row - 1 < self.get_row_count():
+            text, exact = self.format_row(row - 1)
+            if row - 1 == self.selected: style = '{selected}{}'
+            elif exact: style = '{normal}{}'
+            else: style = '{dim}{}'
+            stext = self.sfmt(style, text)
+        else:
+            stext = self.sfmt('{normal}{}', ' ' * self.width)
+        self.put(row, 0, stext, clip_col = col, clip_width = width)
+
+# overview_window.update()
+    def update (self):
+        '''
+        Refreshes the window when the job computed more buckets since the
+        last call; called periodically while the job runs.
+        '''
+        if not self.job: return
+        heading = self.get_heading()
+        if heading != self.shown_heading:
+            self.shown_heading = heading
+            self.refresh(start_row = 0, height = 1)
+        if self.job.done_count != self.shown_done_count:
+            self.shown_done_count = self.job.done_count
+            self.refresh(start_row = 1, height = max(0, self.height - 1))
+
+# overview_window.select()
+    def select (self, index):
+        n = self.get_row_count()
+        if n == 0: return
+        old = self.selected
+        self.selected = max(0, min(n - 1, index))
+        for i in (old, self.selected):
+            self.refresh(start_row = i + 1, height = 1)
+
+# overview_window.on_resize()
+    def on_resize (self, width, height):
+        self.selected = max(0, min(self.get_row_count() - 1, self.selected))
+        self.refresh()
+
+# overview_window.on_input_timeout()
+    def on_input_timeout (self):
+        self.update()
+
+# overview_window.on_key()
+    def on_key (self, key):
+        if key in ('j', 'Down'): self.select(self.selected + 1)
+        elif key in ('k', 'Up'): self.select(self.selected - 1)
+        elif key in ('g', 'Home'): self.select(0)
+        elif key in ('G', 'End'): self.select(self.get_row_count() - 1)
+        elif key in ('Enter', ):
+            if self.selected < self.get_row_count():
+                first, last = self.get_row_buckets(self.selected)
+                self.goto(self.job.get_bucket_offset(first))
+        else:
+            return False
+        return True
+
+# class overview_window - end
+
 #* DEFAULT_STYLE_MAP ********************************************************
 DEFAULT_STYLE_MAP = '''
     default attr=normal fg=7 bg=0
@@ -836,6 +1653,17 @@ DEFAULT_STYLE_MAP = '''
     inactive_help_heading attr=normal fg=11 bg=0
     inactive_help_topic attr=normal fg=5 bg=0
     inactive_selected_help_topic attr=normal fg=13 bg=0
+
+    active_list_normal attr=normal fg=7 bg=4
+    active_list_selected attr=bold fg=0 bg=6
+    active_list_heading attr=bold fg=11 bg=4
+
+    inactive_list_normal attr=normal fg=7 bg=0
+    inactive_list_selected attr=normal fg=0 bg=7
+    inactive_list_heading attr=normal fg=11 bg=0
+
+    active_list_dim attr=normal fg=8 bg=4
+    inactive_list_dim attr=normal fg=8 bg=0
 '''
 
 #* main *********************************************************************/
@@ -844,19 +1672,39 @@ class main (tui.application):
     This is the editor app (and the root window).
     '''
 
+    REPEATABLE_KEYS = frozenset(stream_edit_window.NAV_KEYS + ('Npage', 'Ppage'))
+
     def __init__ (self, cli):
         tui.application.__init__(self)
 
+        self.cli = cli
         self.server = zlx.io.stream_cache_server()
+        cfg = settings_manager('ebfe.ini')
+        self.page_pool = streams.page_pool(
+                budget = cfg.iget('main settings', 'cache_budget_mb', 256) << 20,
+                page_size = cfg.iget('main settings', 'cache_page_size', 0x10000))
+        O['cache_stats'] = self.page_pool.format_stats
+        self.jobs = jobs.scheduler(notify = self.wakeup,
+                max_running = cfg.iget('main settings', 'job_workers', 2),
+                max_processes = cfg.iget('main settings', 'search_workers', os.cpu_count() or 1))
+        O['jobs'] = self.list_jobs
+        O['kill'] = self.kill_job
+
+        # results of scans over large files are kept in the index cache
+        self.indexes = {}
+        self.index_dir = None
+        if cfg.bget('main settings', 'index_cache', True):
+            self.index_dir = os.path.join(O['cfg']['folder'], 'index')
+
+        self.checkpoint_spacing = cfg.iget('main settings', 'checkpoint_spacing_kb', 4096) << 10
+        self.proc_ttl = cfg.iget('main settings', 'proc_cache_ttl_ms', 1000) / 1000
         self.stream_windows = []
         file_uris = cli.file or ('mem://0',)
         for uri in file_uris:
             dmsg('uri={!r}', uri)
-            f = open_file_from_uri(uri)
-            sc = zlx.io.stream_cache(f)
-            sc = self.server.wrap(sc, cli.load_delay)
+            sc = self.open_stream(uri)
             sew = stream_edit_window(
-                    stream_cache = sc,
+                    stream_cache = edit_buffer.piece_table(sc),
                     stream_uri = uri)
             self.stream_windows.append(sew)
         dmsg('stream windows: {!r}', self.stream_windows)
@@ -868,6 +1716,10 @@ class main (tui.application):
         self.panel = help_window()
         self.body = tui.hcontainer(wid = 'body')
         self.body.add(self.panel, weight = 0.3, min_size = 10, max_size = 60)
+        self.overview_win = overview_window(goto = self.goto_overview_offset)
+        self.body.add(self.overview_win, weight = 0.3, min_size = 20, max_size = 48, concealed = True)
+        self.carve_win = carve_results_window(goto = self.goto_carve_hit)
+        self.body.add(self.carve_win, weight = 0.3, min_size = 20, max_size = 48, concealed = True)
         self.console_win = console()
         self.console_win.input_win.cancel_text_func = self._cancel_console_input
 
@@ -876,6 +1728,8 @@ class main (tui.application):
         self.root.add(title_bar('EBFE'), max_size = 1)
         self.root.add(self.body, weight = 4)
         self.root.add(self.console_win, concealed = True)
+        self.details_win = processing_details()
+        self.root.add(self.details_win, max_size = 1, concealed = True)
         sbar = status_bar()
         self.root.add(sbar, max_size = 1)
         O['status_push'] = sbar.push
@@ -883,6 +1737,7 @@ class main (tui.application):
         O['status_empty'] = sbar.empty
         O['status_get'] = sbar.get
         O['status_is_empty'] = sbar.is_empty
+        O['status_mode'] = sbar.set_mode
 
         #self.set_active_stream(0)
         for i in range(len(self.stream_windows)):
@@ -895,6 +1750,39 @@ class main (tui.application):
         O['console_out'] = self.console_win.msg_win.general_out
         
         O['quit'] = self.quit
+        self.quitting = False
+
+        self.search_job = None
+        self.search_win = None
+        self.last_search = None
+        O['search'] = self.start_search
+        O['search_next'] = self.search_next
+
+        self.carve_job = None
+        self.carve_stream_win = None
+        O['carve'] = self.start_carve
+
+        self.save_job = None
+        self.save_win = None
+        O['save'] = self.start_save
+
+        self.overview_job = None
+        self.overview_stream_win = None
+        O['overview'] = self.start_overview
+
+        self.hash_workers = cfg.iget('main settings', 'hash_workers', os.cpu_count() or 1)
+        O['hash'] = self.start_hash
+
+        O['maps'] = self.show_maps
+
+        # files followed as they grow (tail -f): stream window -> file_watcher
+        self.watchers = {}
+        O['follow'] = self.set_follow
+        if cli.follow:
+            for win in self.stream_windows:
+                if not self.set_follow(True, win): continue
+                # shown from the end, where the cursor then stays
+                win.cursor_offset = max(0, win.known_end - 1)
 
         self.root.focus_to(self.active_stream_win)
 
@@ -926,13 +1814,494 @@ class main (tui.application):
     def refresh_strip (self, row, col, width):
         return self.root.refresh_strip(row, col, width)
 
+    def get_pending_saves (self):
+        return [j for j in self.jobs.get_jobs() if isinstance(j, save.save_job) and not j.done]
+
     def quit (self):
+        '''
+        Quits once the saves ended: everything else gets cancelled (so that
+        a save queued behind other jobs can start) and the UI keeps running
+        meanwhile, showing the save in the details line.
+        '''
+        for j in self.jobs.get_jobs():
+            if not isinstance(j, save.save_job): j.cancel()
+        if self.get_pending_saves():
+            self.quitting = True
+            self.update_job_details()
+            return
+        for w in self.watchers.values(): w.stop()
+        self.jobs.shutdown()
         self.server.shutdown()
         raise tui.app_quit(0)
 
     def on_input_timeout (self):
+        self.jobs.poll()
+        if self.quitting:
+            if not self.get_pending_saves(): self.quit()
+        else:
+            self.extend_scans()
+        self.update_job_details()
         self.root.input_timeout()
 
+    def update_job_details (self):
+        '''
+        Shows the state of the newest running job in the details line.
+        '''
+        active = [j for j in self.jobs.get_jobs() if not j.done]
+        if not active:
+            self.root.set_item_visibility(self.details_win, False)
+            return
+        if self.quitting:
+            saves = self.get_pending_saves()
+            if saves:
+                self.details_win.set_text('waiting for save to end before quitting: {} | Ctrl-X: cancel'.format(
+                    saves[0].format_status()))
+                self.root.set_item_visibility(self.details_win, True)
+                return
+        text = active[-1].format_status()
+        if len(active) > 1: text += ' (+{} more)'.format(len(active) - 1)
+        self.details_win.set_text(text + ' | Ctrl-X: cancel')
+        self.root.set_item_visibility(self.details_win, True)
+
+    def list_jobs (self):
+        l = ['#{} {}'.format(j.id, j.format_status()) for j in self.jobs.get_jobs()]
+        return l or ['no jobs']
+
+    def kill_job (self, job_id = None):
+        '''
+        Cancels a job by id, the newest one (None, system jobs left out) or
+        all of them ('all').
+        '''
+        if job_id == 'all':
+            for j in self.jobs.get_jobs(): self.jobs.cancel(j.id)
+            self.update_job_details()
+            return
+        j = self.jobs.cancel(job_id)
+        if j is None:
+            O['console_out']('!no such job' if job_id is not None else '!no jobs running')
+        self.update_job_details()
+
+    def start_search (self, text, backward = False):
+        try:
+            pat = search.compile_pattern(text)
+        except search.error as e:
+            O['console_out']('!' + str(e))
+            return
+        self.last_search = pat
+        self.run_search(pat, backward)
+
+    def search_next (self, backward = False):
+        if self.last_search is None:
+            O['console_out']('!no previous search')
+            return
+        self.run_search(self.last_search, backward)
+
+    def run_search (self, pat, backward):
+        if self.search_job:
+            self.search_job.cancel()
+        win = self.active_stream_win
+        sc = win.stream_cache
+        if not sc.can_read():
+            O['console_out']('!searching is not supported for ' + win.stream_uri)
+            return
+        if backward:
+            start, end = 0, win.cursor_offset
+        else:
+            start, end = win.cursor_offset + 1, sc.get_known_end_offset()
+        self.search_win = win
+        self.search_job = self.jobs.submit(search.search_job(sc.read, pat, start, end,
+                backward = backward,
+                path = sc.get_local_path() if hasattr(sc, 'get_local_path') else None,
+                workers = self.jobs.max_processes,
+                sparse = win.get_sparse_map()), on_done = self.on_search_done)
+        self.update_job_details()
+
+    def on_search_done (self, job):
+        '''
+        Moves the cursor to the match of a search job once it ended.
+        '''
+        if job is self.search_job: self.search_job = None
+        if job.exception:
+            O['console_out']('!search failed: {}'.format(job.exception))
+        elif job.is_cancelled():
+            O['console_out']('search cancelled: ' + job.pattern.text)
+        elif job.result is None:
+            O['console_out']('!pattern not found: ' + job.pattern.text)
+        else:
+            self.search_win.move_cursor_to_offset(job.result)
+            O['console_out']('{} found at 0x{:X}'.format(job.pattern.text, job.result))
+
+    def start_carve (self, path = None):
+        win = self.active_stream_win
+        sc = win.stream_cache
+        if not sc.can_read():
+            O['console_out']('!carving is not supported for ' + win.stream_uri)
+            return
+        if not self.check_indexed(win, 'carve'): return
+        if path is None:
+            default_path = O['cfg']['folder'] + 'signatures.txt'
+            if os.path.isfile(default_path): path = default_path
+        try:
+            atm = carve.automaton(carve.load_signatures(path))
+        except carve.error as e:
+            O['console_out']('!' + str(e))
+            return
+        O['console_out']('carving with {} signatures from {}'.format(
+            len(atm.names), path or 'the built-in list'))
+        self.with_index(win, lambda index: self.run_carve(win, atm, index))
+
+    def run_carve (self, win, atm, index):
+        sc = win.stream_cache
+        end = sc.get_known_end_offset()
+        if index is not None and index.key[0] != end: index = None
+        known = index.get_carve_spans(atm.digest) if index else ()
+        if self.carve_job: self.carve_job.cancel()
+        self.carve_stream_win = win
+        self.carve_job = self.jobs.submit(
+                carve.carve_job(sc.read, atm, 0, end, known = known,
+                    sparse = win.get_sparse_map()),
+                on_done = lambda job: self.on_carve_done(job, win, index))
+        self.carve_win.set_job(self.carve_job)
+        self.body.set_item_visibility(self.carve_win, True)
+        self.root.focus_to(self.carve_win)
+        self.update_job_details()
+
+    def on_carve_done (self, job, win, index):
+        if job is self.carve_job: self.carve_job = None
+        self.carve_win.update()
+        if job.exception:
+            O['console_out']('!carve failed: {}'.format(job.exception))
+            return
+        O['console_out']('carve {}: {} hits'.format(
+            'cancelled' if job.is_cancelled() else 'done',
+            job.get_hit_count()))
+        if index is None or job.is_cancelled(): return
+        if sum(e - s for s, e, o, i in job.known) < job.end:
+            index.set_carve_hits(job.automaton.digest, job.offsets, job.sig_indexes)
+            self.store_index(win, index)
+
+    def start_hash (self, algo, start = 0, end = None):
+        '''
+        Hashes [start, end) of the active stream (to its end by default);
+        ranges going past the end of the stream get cut there and the
+        result names the range actually hashed.
+        '''
+        win = self.active_stream_win
+        sc = win.stream_cache
+        if not sc.can_read():
+            O['console_out']('!hashing is not supported for ' + win.stream_uri)
+            return
+        known_end = sc.get_known_end_offset()
+        if (end is None or end > known_end) and not self.check_indexed(win, 'hash it'): return
+        if end is None or end > known_end: end = known_end
+        if not 0 <= start <= end:
+            O['console_out']('!bad range: 0x{:X}-0x{:X}'.format(start, end))
+            return
+        try:
+            job = digest.hash_job(sc.read, algo, start, end, workers = self.hash_workers,
+                    sparse = win.get_sparse_map())
+        except digest.error as e:
+            O['console_out']('!' + str(e))
+            return
+        self.jobs.submit(job, on_done = self.on_hash_done)
+        self.update_job_details()
+
+    def on_hash_done (self, job):
+        if job.exception:
+            O['console_out']('!hash failed: {}'.format(job.exception))
+        elif job.is_cancelled():
+            O['console_out']('hash cancelled')
+        else:
+            O['console_out']('{} 0x{:X}-0x{:X}: {}'.format(job.algo, job.start, job.end, job.result))
+            O['console_out']('  {} in {:.2f}s, {}/s'.format(jobs.format_size(job.bytes_done),
+                job.get_elapsed(), jobs.format_size(job.get_rate())))
+
+    def show_maps (self, index = None):
+        '''
+        Lists the memory regions of the active stream (a process) or moves
+        the cursor to the start of one of them.
+        '''
+        win = self.active_stream_win
+        src = getattr(win.stream_cache, 'source', None)
+        if not hasattr(src, 'get_regions'):
+            O['console_out']('!{} has no memory regions'.format(win.stream_uri))
+            return
+        regions = src.get_regions()
+        if index is None:
+            for i, r in enumerate(regions):
+                O['console_out']('{:4} {:012X}-{:012X} {} {:>8} {}'.format(i, r.start, r.end,
+                    r.perms, jobs.format_size(r.end - r.start), r.path))
+        elif 0 <= index < len(regions):
+            win.move_cursor_to_offset(regions[index].start, 20)
+        else:
+            O['console_out']('!no region {} (there are {})'.format(index, len(regions)))
+
+    def set_follow (self, enable = None, win = None):
+        '''
+        Starts or stops (None: toggles) following the file of a stream
+        window (the active one by default) as it grows; returns True if it
+        is followed.
+        '''
+        win = win or self.active_stream_win
+        if enable is None: enable = win not in self.watchers
+        w = self.watchers.pop(win, None)
+        if w: w.stop()
+        if not enable:
+            if w: O['console_out']('stopped following ' + win.stream_uri)
+            return False
+        src = win.stream_cache.source
+        path = src.get_local_path() if hasattr(src, 'extend') else None
+        if path is None:
+            O['console_out']('!{} is not a local file that can be followed'.format(win.stream_uri))
+            return False
+        self.watchers[win] = follow.file_watcher(path, src.get_known_end_offset(), src.extend).start()
+        O['console_out']('following ' + win.stream_uri)
+        return True
+
+    def extend_scans (self):
+        '''
+        Once the carve results or the overview map of a followed file are
+        done, scans what got appended to it since; the earlier results are
+        kept, so only the new data gets read.
+        '''
+        job = self.carve_win.job
+        win = self.carve_stream_win
+        if (win in self.watchers and self.carve_job is None and job is not None
+                and job.done and not job.exception and not job.is_cancelled()
+                and win.stream_cache.get_known_end_offset() > job.end):
+            count = job.get_hit_count()
+            self.carve_job = self.jobs.submit(
+                    carve.carve_job(win.stream_cache.read, job.automaton, job.start,
+                        win.stream_cache.get_known_end_offset(),
+                        known = carve.get_growth_spans(job), sparse = win.get_sparse_map()),
+                    on_done = lambda j: self.on_carve_extended(j, count))
+            self.carve_win.set_job(self.carve_job, keep_place = True)
+        job = self.overview_win.job
+        win = self.overview_stream_win
+        if (win in self.watchers and self.overview_job is None and job is not None
+                and job.done and not job.exception and not job.is_cancelled()
+                and win.stream_cache.get_known_end_offset() > job.end):
+            end = win.stream_cache.get_known_end_offset()
+            known, bucket_size = overview.get_growth_layout(job, end)
+            self.overview_job = self.jobs.submit(
+                    overview.overview_job(win.stream_cache.read, end, known = known,
+                        sparse = win.get_sparse_map(), bucket_size = bucket_size),
+                    on_done = lambda j: self.on_overview_done(j, win, None))
+            self.overview_win.set_job(self.overview_job, keep_place = True)
+
+    def on_carve_extended (self, job, old_count):
+        if job is self.carve_job: self.carve_job = None
+        self.carve_win.update()
+        if job.exception:
+            O['console_out']('!carve failed: {}'.format(job.exception))
+        elif job.get_hit_count() > old_count and not job.is_cancelled():
+            O['console_out']('carve: {} new hits up to 0x{:X}'.format(
+                job.get_hit_count() - old_count, job.end))
+
+    def on_index_done (self, job):
+        if job.exception:
+            O['console_out']('!indexing {} failed: {}'.format(job.cf.name_in_cache, job.exception))
+        elif not job.cf.complete:
+            O['console_out']('!indexing {} stopped: only its first 0x{:X} bytes can be read'.format(
+                job.cf.name_in_cache, job.cf.size))
+        else:
+            dmsg('indexed {!r}: {} seek points, 0x{:X} bytes', job.cf.name_in_cache,
+                    len(job.cf.points), job.cf.size)
+
+    def check_indexed (self, win, action):
+        '''
+        Returns True unless the stream of win is still being indexed (its
+        end is then only how far decompressing got); tells why action
+        cannot be done yet.
+        '''
+        if not is_being_indexed(win.stream_cache): return True
+        O['console_out']('!{} is still being indexed; {} once that is done'.format(
+            win.stream_uri, action))
+        return False
+
+    def start_save (self, path = None):
+        if self.save_job:
+            O['console_out']('!a save is already running')
+            return
+        win = self.active_stream_win
+        table = win.stream_cache
+        if not hasattr(table, 'replace'):
+            O['console_out']('!{} cannot be saved'.format(win.stream_uri))
+            return
+        if isinstance(table.source, procmem.process_memory):
+            # offsets are addresses: a copy would span the whole address
+            # space, the gaps between regions written as zeros
+            O['console_out']('!{} is the memory of a process; it cannot be saved'.format(win.stream_uri))
+            return
+        if not self.check_indexed(win, 'save'): return
+        source_path = save.get_source_path(table)
+        if path is None:
+            if source_path is None:
+                O['console_out']('!{} is not a local file; use: w FILE'.format(win.stream_uri))
+                return
+            if not table.is_modified():
+                O['console_out']('no changes to write')
+                return
+            path = source_path
+        if source_path is None and not table.can_read():
+            O['console_out']('!{} cannot be read back for saving'.format(win.stream_uri))
+            return
+        self.save_win = win
+        self.save_job = self.jobs.submit(save.save_job(table, path),
+                on_done = self.on_save_done)
+        self.update_job_details()
+
+    def on_save_done (self, job):
+        '''
+        Reports the outcome of a save; the file is opened again if it
+        replaced the one being edited.
+        '''
+        self.save_job = None
+        if job.exception:
+            O['console_out']('!cannot write {}: {}'.format(job.path, job.exception))
+            return
+        if job.is_cancelled() and not job.in_place:
+            O['console_out']('save cancelled: ' + job.path)
+            return
+        if job.in_place:
+            O['console_out']('{}: 0x{:X} bytes written in place in {} ranges'.format(
+                job.path, job.total, len(job.parts)))
+        else:
+            O['console_out']('{}: 0x{:X} bytes written'.format(job.path, job.total))
+        win = self.save_win
+        if job.source_path and save.is_same_file(job.path, job.source_path):
+            if win.stream_cache.state is job.table_state:
+                self.reopen_stream(win)
+            else:
+                O['console_out']('!{} changed while saving; undo history may not match the file'.format(win.stream_uri))
+
+    def open_stream (self, uri):
+        '''
+        Opens a stream with the settings of the app; compressed streams get
+        their index job started.
+        '''
+        sc = open_stream_from_uri(uri, self.server, self.page_pool,
+                load_delay = self.cli.load_delay,
+                notify = self.wakeup,
+                use_mmap = self.cli.mmap,
+                checkpoint_spacing = self.checkpoint_spacing,
+                proc_ttl = self.proc_ttl)
+        if isinstance(getattr(sc, 'stream', None), compressed.compressed_file):
+            self.jobs.submit(compressed.index_job(sc.stream, self.index_dir),
+                    on_done = self.on_index_done)
+        return sc
+
+    def reopen_stream (self, win):
+        old = win.stream_cache.source
+        sc = self.open_stream(win.stream_uri)
+        self.page_pool.drop(old)
+        win.set_stream_cache(edit_buffer.piece_table(sc))
+        if win in self.watchers: self.set_follow(True, win)
+
+    def start_overview (self):
+        '''
+        Maps the active stream in the overview panel.
+        '''
+        win = self.active_stream_win
+        sc = win.stream_cache
+        if not sc.can_read():
+            O['console_out']('!mapping is not supported for ' + win.stream_uri)
+            return
+        if not self.check_indexed(win, 'map it'): return
+        end = sc.get_known_end_offset()
+        if not end:
+            O['console_out']('!{} is empty'.format(win.stream_uri))
+            return
+        self.overview_stream_win = win
+        self.with_index(win, lambda index: self.run_overview(win, index))
+
+    def run_overview (self, win, index):
+        sc = win.stream_cache
+        end = sc.get_known_end_offset()
+        if index is not None and index.key[0] != end: index = None
+        known = index.get_overview() if index else None
+        if self.overview_job: self.overview_job.cancel()
+        self.overview_job = self.jobs.submit(
+                overview.overview_job(sc.read, end, known = known,
+                    sparse = win.get_sparse_map(),
+                    bucket_size = index.get_bucket_size() if index else None),
+                on_done = lambda job: self.on_overview_done(job, win, index))
+        self.overview_win.set_job(self.overview_job)
+        self.body.set_item_visibility(self.overview_win, True)
+        self.update_job_details()
+
+    def on_overview_done (self, job, win, index):
+        if job is self.overview_job: self.overview_job = None
+        self.overview_win.update()
+        if job.exception:
+            O['console_out']('!overview failed: {}'.format(job.exception))
+            return
+        if index is None or job.is_cancelled(): return
+        if index.get_overview() != job.stats:
+            index.set_overview(job.stats)
+            self.store_index(win, index)
+
+    def with_index (self, win, then):
+        '''
+        Calls then(index) with the file_index of the file of a stream
+        window, loading it in the background first if needed; index is
+        None for streams that do not get indexed (not local files, edited,
+        small or with the index cache turned off).
+        '''
+        sc = win.stream_cache
+        path = sc.get_local_path() if self.index_dir and hasattr(sc, 'get_local_path') else None
+        if path is None:
+            then(None)
+            return
+        index = self.indexes.get(win)
+        if index is not None and index.path == path and index.is_fresh():
+            then(index)
+            return
+        def on_load_done (job):
+            if job.is_cancelled(): return
+            if job.exception:
+                O['console_out']('!cannot load the index of {}: {}'.format(path, job.exception))
+            elif job.result is not None:
+                self.indexes[win] = job.result
+            then(job.result)
+        self.jobs.submit(index_cache.load_job(self.index_dir, path, sc.read),
+                on_done = on_load_done)
+
+    def store_index (self, win, index):
+        def on_store_done (job):
+            if job.exception:
+                O['console_out']('!cannot store the index of {}: {}'.format(index.path, job.exception))
+        self.jobs.submit(index_cache.store_job(self.index_dir, index, win.stream_cache.read),
+                on_done = on_store_done)
+
+    def toggle_overview (self):
+        '''
+        Hides the overview panel if it has the focus, otherwise shows and
+        focuses it, mapping the active stream unless it was already.
+        '''
+        if self.overview_win.in_focus:
+            self.body.set_item_visibility(self.overview_win, False)
+            self.root.focus_to(self.active_stream_win)
+            return
+        if self.overview_win.job is None or self.overview_stream_win is not self.active_stream_win:
+            self.start_overview()
+        self.body.set_item_visibility(self.overview_win, True)
+        self.root.focus_to(self.overview_win)
+
+    def goto_overview_offset (self, offset):
+        win = self.overview_stream_win
+        win.move_cursor_to_offset(offset)
+        self.root.focus_to(win)
+
+    def goto_carve_hit (self, offset):
+        win = self.carve_stream_win
+        win.move_cursor_to_offset(offset)
+        self.root.focus_to(win)
+
+    def on_key_repeat (self, key, count):
+        # only navigation keys get merged; none of them is a global shortcut
+        return self.root.on_key_repeat(key, count)
+
     def on_key (self, key):
         dmsg('editor: handle key: {!r}', key)
 
@@ -946,13 +2315,26 @@ class main (tui.application):
         if key in ('F1',):
             self.body.set_item_visibility(self.panel, toggle = True)
             return True
+        if key in ('F2',):
+            self.toggle_overview()
+            return True
 
         # pass to focused window
         if self.root.on_key(key):
             return True
 
         # handle keys not used by the focused window
-        if key in ('q', 'Q', 'Esc'):
+        if key in ('Ctrl-X',):
+            self.kill_job()
+        elif key in ('Esc',) and self.jobs.cancel():
+            self.update_job_details()
+        elif key in ('Esc',) and self.carve_win.in_focus:
+            self.body.set_item_visibility(self.carve_win, False)
+            self.root.focus_to(self.active_stream_win)
+        elif key in ('Esc',) and self.overview_win.in_focus:
+            self.body.set_item_visibility(self.overview_win, False)
+            self.root.focus_to(self.active_stream_win)
+        elif key in ('q', 'Q', 'Esc'):
             if O['status_is_empty']():
                 self.quit()
             else:
@@ -960,4 +2342,8 @@ class main (tui.application):
         elif key in (':',):
             self.root.set_item_visibility(self.console_win, True)
             self.root.focus_to(self.console_win)
+        elif key in ('/', '?'):
+            self.root.set_item_visibility(self.console_win, True)
+            self.root.focus_to(self.console_win)
+            self.console_win.input_win.set_text(key)
 
@@ -0,0 +1,159 @@
+# standard module imports
+import io
+import os
+import struct
+import tarfile
+import zipfile
+
+# internal module imports
+import ebfe.compressed as compressed
+
+# uri schemes of the archive formats: SCHEME://ARCHIVE!MEMBER
+SCHEMES = ('zip', 'tar')
+MEMBER_SEPARATOR = '!'
+
+ZIP_LOCAL_HEADER = struct.Struct('<4s22xHH')
+ZIP_LOCAL_MAGIC = b'PK\x03\x04'
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* split_member_path ********************************************************
+def split_member_path (res):
+    '''
+    Splits ARCHIVE!MEMBER at the first separator that follows the path of
+    an existing file (both parts can contain the separator).
+    '''
+    i = res.find(MEMBER_SEPARATOR)
+    while i >= 0:
+        if os.path.isfile(res[:i]): return res[:i], res[i + 1:]
+        i = res.find(MEMBER_SEPARATOR, i + 1)
+    raise error('expecting ARCHIVE{}MEMBER, got {!r}'.format(MEMBER_SEPARATOR, res))
+
+#* file_region **************************************************************
+class file_region (io.RawIOBase):
+    '''
+    Read-only, seekable file object over size bytes of a file starting at
+    start (a member stored in an archive). mmap_stream maps it through
+    file, the file object of the whole archive.
+    '''
+
+# file_region.__init__()
+    def __init__ (self, f, start, size):
+        io.RawIOBase.__init__(self)
+        self.file = f
+        self.start = start
+        self.size = size
+        self.pos = 0
+
+# file_region.__repr__()
+    def __repr__ (self):
+        return 'file_region({!r}, 0x{:X}, 0x{:X})'.format(self.file, self.start, self.size)
+
+# file_region.close()
+    def close (self):
+        self.file.close()
+        io.RawIOBase.close(self)
+
+# file_region.fileno()
+    def fileno (self):
+        return self.file.fileno()
+
+# file_region.readable()
+    def readable (self):
+        return True
+
+# file_region.seekable()
+    def seekable (self):
+        return True
+
+# file_region.tell()
+    def tell (self):
+        return self.pos
+
+# file_region.seek()
+    def seek (self, offset, whence = os.SEEK_SET):
+        if whence == os.SEEK_CUR: offset += self.pos
+        elif whence == os.SEEK_END: offset += self.size
+        if offset < 0: raise ValueError('negative offset: {}'.format(offset))
+        self.pos = offset
+        return offset
+
+# file_region.read()
+    def read (self, size = -1):
+        end = self.size if size is None or size < 0 else min(self.size, self.pos + size)
+        if self.pos >= end: return b''
+        data = compressed.pread_all(self.fileno(), end - self.pos, self.start + self.pos)
+        self.pos += len(data)
+        return data
+
+# file_region.readinto()
+    def readinto (self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+# class file_region - end
+
+#* open_zip_member **********************************************************
+def open_zip_member (path, name, spacing):
+    try:
+        with zipfile.ZipFile(path) as z:
+            info = z.getinfo(name)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise error('cannot read {}: {}'.format(path, e))
+    except KeyError:
+        raise error('no member {!r} in {}'.format(name, path))
+    if info.flag_bits & 1: raise error('{!r} is encrypted'.format(name))
+    f = open(path, 'rb')
+    try:
+        magic, name_size, extra_size = ZIP_LOCAL_HEADER.unpack(
+                compressed.pread_all(f.fileno(), ZIP_LOCAL_HEADER.size, info.header_offset))
+        if magic != ZIP_LOCAL_MAGIC:
+            raise error('bad local header for {!r} at 0x{:X}'.format(name, info.header_offset))
+        start = info.header_offset + ZIP_LOCAL_HEADER.size + name_size + extra_size
+        if info.compress_type == zipfile.ZIP_STORED:
+            return file_region(f, start, info.file_size)
+        if info.compress_type != zipfile.ZIP_DEFLATED:
+            raise error('{!r} uses compression method {}; only stored and deflated members are supported'.format(
+                name, info.compress_type))
+        # a raw deflate stream: like a gzip file it grows as its index job
+        # adds checkpoints, so that no read has to decompress from far away
+        f.close()
+        return compressed.compressed_file(path, compressed.gzip_format(spacing, raw = True),
+                start, start + info.compress_size,
+                name = os.path.realpath(path) + MEMBER_SEPARATOR + name)
+    except BaseException:
+        f.close()
+        raise
+
+#* open_tar_member **********************************************************
+def open_tar_member (path, name):
+    '''
+    Members of uncompressed tar files are stored as they are; in
+    compressed ones they can only be found by decompressing all before
+    them, so those are not supported.
+    '''
+    try:
+        with tarfile.open(path, 'r:') as t:
+            info = t.getmember(name)
+    except (tarfile.TarError, OSError) as e:
+        raise error('cannot read {} as an uncompressed tar file: {}'.format(path, e))
+    except KeyError:
+        raise error('no member {!r} in {}'.format(name, path))
+    if not info.isreg(): raise error('{!r} is not a regular file'.format(name))
+    if info.sparse is not None: raise error('{!r} is a sparse member'.format(name))
+    return file_region(open(path, 'rb'), info.offset_data, info.size)
+
+#* open_member **************************************************************
+def open_member (scheme, res, spacing = compressed.DEFAULT_CHECKPOINT_SPACING):
+    '''
+    Returns a file object for a member of an archive: a file_region for
+    stored members, a compressed.compressed_file (which needs an
+    index_job to seek quickly) for deflated ones.
+    '''
+    path, name = split_member_path(res)
+    if scheme == 'zip': return open_zip_member(path, name, spacing)
+    return open_tar_member(path, name)
+
@@ -0,0 +1,187 @@
+# standard module imports
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# custom external module imports
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.app
+import ebfe.tui as tui
+import ebfe.tui_mock as tui_mock
+
+# size of the sparse file used by the scenarios
+BENCH_FILE_SIZE = 1 << 30
+
+# the file has data extents of (at least) this size every BENCH_STRIDE bytes
+# with holes in between; the first extent grows to cover all the rows the
+# scenarios walk through
+BENCH_STRIDE = 64 << 20
+BENCH_EXTENT_SIZE = 4 << 20
+
+# page_down goes to the next data extent after this many pages, so that it
+# reaches far offsets (and misses the cache) instead of staying near the
+# start of the file
+BENCH_JUMP_PAGES = 25
+
+# styles showing data still being loaded; the mock driver waits for the
+# loads to finish while any of these is on screen
+LOADING_STYLES = (
+    'active_uncached_item',
+    'active_uncached_char',
+    'inactive_uncached_item',
+    'inactive_uncached_char',
+)
+
+#* scenarios ****************************************************************
+def scenario_page_down (steps):
+    '''page down one screen at a time, jumping across the file now and then'''
+    script = []
+    extent = 0
+    for i in range(steps):
+        if i % BENCH_JUMP_PAGES == BENCH_JUMP_PAGES - 1:
+            extent = extent % (BENCH_FILE_SIZE // BENCH_STRIDE - 1) + 1
+            # offset typed in the status bar then 'g', in one go; a little
+            # past the start of the extent so no hole shows above it
+            offset = extent * BENCH_STRIDE + 0x10000
+            script.append(tuple('0x{:X}'.format(offset)) + ('g', ))
+        else:
+            script.append('Ctrl-F')
+    return script
+
+def scenario_page_down_burst (steps):
+    '''page down with the key held (presses arrive faster than frames)'''
+    return [('Ctrl-F', ) * 8] * (steps // 8)
+
+def scenario_hold_j (steps):
+    '''scroll down one row at a time'''
+    return ['j'] * steps
+
+def scenario_cursor (steps):
+    '''move the cursor around'''
+    cycle = ['Right'] * 20 + ['Down'] * 20 + ['Left'] * 20 + ['Up'] * 20
+    return (cycle * (steps // len(cycle) + 1))[:steps]
+
+def scenario_console (steps):
+    '''run console commands that print to the console'''
+    return [':'] + ['t', 'e', 's', 't', 'Enter'] * (steps // 5)
+
+def scenario_help (steps):
+    '''toggle the help panel'''
+    return ['F1'] * steps
+
+SCENARIOS = (
+    ('page_down', scenario_page_down),
+    ('page_down_burst', scenario_page_down_burst),
+    ('hold_j', scenario_hold_j),
+    ('cursor', scenario_cursor),
+    ('console', scenario_console),
+    ('help', scenario_help),
+)
+
+#* make_sparse_file *********************************************************
+def make_sparse_file (size, head_size = BENCH_EXTENT_SIZE):
+    '''
+    Creates a temporary sparse file of the given size with random data in
+    the first head_size bytes and BENCH_EXTENT_SIZE bytes at the start of
+    every BENCH_STRIDE; returns its path.
+    '''
+    fd, path = tempfile.mkstemp(prefix = 'ebfe-bench-', suffix = '.bin')
+    with os.fdopen(fd, 'wb') as f:
+        f.truncate(size)
+        for o in range(0, size, BENCH_STRIDE):
+            f.seek(o)
+            n = min(max(head_size, BENCH_EXTENT_SIZE) if o == 0 else BENCH_EXTENT_SIZE, size - o)
+            while n > 0:
+                chunk = os.urandom(min(n, 1 << 20))
+                f.write(chunk)
+                n -= len(chunk)
+    return path
+
+#* percentile ***************************************************************
+def percentile (sorted_values, p):
+    if not sorted_values: return 0
+    i = min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))
+    return sorted_values[i]
+
+#* summarize ****************************************************************
+def summarize (frames):
+    '''
+    Computes the stats of a list of tui_mock.frame_stats.
+    '''
+    lat = sorted(f.latency for f in frames)
+    busy = sum(lat)
+    total_bytes = sum(f.bytes for f in frames)
+    return dict(
+            frames = len(frames),
+            fps = len(frames) / busy if busy else 0,
+            p50_ms = percentile(lat, 50) * 1000,
+            p90_ms = percentile(lat, 90) * 1000,
+            p99_ms = percentile(lat, 99) * 1000,
+            max_ms = (lat[-1] if lat else 0) * 1000,
+            bytes = total_bytes,
+            bytes_per_frame = total_bytes / len(frames) if frames else 0,
+            scrolls = sum(f.scrolls for f in frames))
+
+#* format_stats *************************************************************
+def format_stats (name, st):
+    return ('{:<16} {:>6} frames {:>9.1f} fps  p50 {:>7.3f}  p90 {:>7.3f}  '
+            'p99 {:>7.3f}  max {:>7.3f} ms  {:>10} bytes ({:.0f}/frame)').format(
+            name, st['frames'], st['fps'], st['p50_ms'], st['p90_ms'],
+            st['p99_ms'], st['max_ms'], st['bytes'], st['bytes_per_frame'])
+
+#* run_scenario *************************************************************
+def run_scenario (cli, path, name, script):
+    '''
+    Runs the editor on path with a mock driver replaying script.
+    Returns the summary of the rendered frames.
+    '''
+    app_cli = argparse.Namespace(**vars(cli))
+    app_cli.file = [path]
+    app_cli.load_delay = 0
+    app = ebfe.app.main(app_cli)
+    drv = tui_mock.driver(
+            script = script,
+            width = cli.bench_width,
+            height = cli.bench_height,
+            settle_styles = LOADING_STYLES)
+    t0 = time.perf_counter()
+    tui.run(lambda func: tui_mock.run(func, drv), app)
+    st = summarize(drv.frames)
+    st['wall_s'] = time.perf_counter() - t0
+    st['idle_s'] = drv.idle_time
+    dmsg('bench {}: {!r}', name, st)
+    return st
+
+#* main *********************************************************************
+def main (cli):
+    '''
+    Runs the scenarios selected by cli.bench (comma separated names or
+    'all') and prints a line of stats for each one.
+    Returns a dict mapping scenario names to their stats.
+    '''
+    selected = cli.bench.split(',')
+    names = [n for n, f in SCENARIOS]
+    for n in selected:
+        if n != 'all' and n not in names:
+            raise RuntimeError('unknown scenario {!r} (known: {})'.format(n, ', '.join(names)))
+    # a screen never shows more bytes than its cells
+    path = make_sparse_file(BENCH_FILE_SIZE,
+            head_size = cli.bench_steps * cli.bench_width * cli.bench_height)
+    results = {}
+    try:
+        for name, func in SCENARIOS:
+            if 'all' not in selected and name not in selected: continue
+            st = run_scenario(cli, path, name, func(cli.bench_steps))
+            results[name] = st
+            print(format_stats(name, st))
+    finally:
+        os.unlink(path)
+    if cli.bench_json:
+        with open(cli.bench_json, 'w') as f:
+            json.dump(results, f, indent = 2, sort_keys = True)
+    return results
+
@@ -0,0 +1,281 @@
+# standard module imports
+import array
+import bisect
+import hashlib
+import re
+
+# custom external module imports
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.jobs as jobs
+import ebfe.search as search
+
+# size of the chunks read while scanning
+CHUNK_SIZE = 4 << 20
+
+# above this many distinct 2-byte signature prefixes the scan prefilter
+# looks only for first bytes
+MAX_PREFILTER_PREFIXES = 100
+
+# used when there is no signature file
+DEFAULT_SIGNATURES = '''
+# name          pattern (hex bytes, a:ascii or u:utf16 text)
+MZ/PE           4D 5A 90 00
+PE-header       50 45 00 00
+ELF             7F 45 4C 46
+Mach-O-32       FE ED FA CE
+Mach-O-64       FE ED FA CF
+Mach-O-fat      CA FE BA BE
+ZIP-local       50 4B 03 04
+ZIP-central     50 4B 01 02
+ZIP-end         50 4B 05 06
+GZIP            1F 8B 08
+BZIP2           a:BZh
+XZ              FD 37 7A 58 5A 00
+7Z              37 7A BC AF 27 1C
+RAR             52 61 72 21 1A 07
+PNG             89 50 4E 47 0D 0A 1A 0A
+JPEG            FF D8 FF
+GIF87           a:GIF87a
+GIF89           a:GIF89a
+PDF             a:%PDF-
+SQLite          a:SQLite format 3
+OLE2            D0 CF 11 E0 A1 B1 1A E1
+CAB             a:MSCF
+ISO9660         a:CD001
+PEM             a:-----BEGIN
+SHA256-K        42 8A 2F 98
+AES-Sbox        63 7C 77 7B F2 6B 6F C5
+MD5-T           78 A4 6A D7
+'''
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* parse_signatures *********************************************************
+def parse_signatures (text):
+    '''
+    Parses signature definitions: one per line, a name then a pattern
+    without wildcards in the syntax of search.compile_pattern(); empty
+    lines and lines starting with # are skipped. Lines with patterns that
+    cannot be matched literally are skipped too.
+    Returns a list of (name, bytes).
+    '''
+    sigs = []
+    for n, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        parts = line.split(None, 1)
+        if len(parts) != 2:
+            raise error('line {}: expecting a name and a pattern'.format(n))
+        try:
+            sigs.append((parts[0], search.pattern_bytes(parts[1])))
+        except search.error as e:
+            dmsg('signature line {} skipped: {}', n, e)
+    if not sigs:
+        raise error('no signatures')
+    return sigs
+
+#* load_signatures **********************************************************
+def load_signatures (path = None):
+    if path is None: return parse_signatures(DEFAULT_SIGNATURES)
+    try:
+        with open(path, 'r') as f:
+            return parse_signatures(f.read())
+    except OSError as e:
+        raise error('cannot read {}: {}'.format(path, e))
+
+#* automaton ****************************************************************
+class automaton (object):
+    '''
+    Aho-Corasick automaton over a list of (name, bytes) signatures.
+    The transitions are completed with the failure links so that scanning
+    is one dict lookup per byte; transitions back to the root are left out.
+    The scan only runs the automaton from positions holding the first bytes
+    of some signature (found with a regex, in C) until it falls back to the
+    root, which skips quickly over data that cannot start a match.
+    digest identifies the signature list (for cached results).
+    '''
+
+# automaton.__init__()
+    def __init__ (self, signatures):
+        self.names = [name for name, data in signatures]
+        h = hashlib.blake2b(digest_size = 16)
+        for name, data in signatures:
+            h.update(repr((name, data)).encode('utf-8'))
+        self.digest = h.digest()
+        self.matches_zeros = any(not data.strip(b'\0') for name, data in signatures)
+        self.max_len = max(len(data) for name, data in signatures)
+        goto = [{}]
+        out = [[]]
+        for index, (name, data) in enumerate(signatures):
+            s = 0
+            for b in data:
+                t = goto[s].get(b)
+                if t is None:
+                    t = len(goto)
+                    goto[s][b] = t
+                    goto.append({})
+                    out.append([])
+                s = t
+            out[s].append((index, len(data)))
+
+        # breadth first: failure links and completed transitions
+        fail = [0] * len(goto)
+        delta = [dict(goto[0])]
+        delta.extend({} for i in range(1, len(goto)))
+        queue = list(goto[0].values())
+        qi = 0
+        while qi < len(queue):
+            s = queue[qi]
+            qi += 1
+            f = fail[s]
+            out[s].extend(out[f])
+            d = delta[s]
+            for b, t in delta[f].items():
+                if b not in goto[s]: d[b] = t
+            for b, t in goto[s].items():
+                d[b] = t
+                fail[t] = delta[f].get(b, 0)
+                queue.append(t)
+        self.delta = delta
+        self.out = [tuple(o) for o in out]
+        # the regex engine tries the branches of an alternation one by one,
+        # so with many signatures only their first bytes get looked for
+        prefixes = sorted(set(data[:2] for name, data in signatures))
+        if len(prefixes) <= MAX_PREFILTER_PREFIXES:
+            self.prefilter = re.compile(b'|'.join(re.escape(p) for p in prefixes))
+        else:
+            first = bytes(sorted(set(p[0] for p in prefixes)))
+            self.prefilter = re.compile(b'[' + b''.join(re.escape(bytes((b, ))) for b in first) + b']')
+
+# automaton.scan()
+    def scan (self, data, base, limit, hits):
+        '''
+        Appends to hits (offset, signature_index) for the matches in data
+        starting before index limit; base is the offset of data.
+        '''
+        delta = self.delta
+        out = self.out
+        search_first = self.prefilter.search
+        n = len(data)
+        i = 0
+        while True:
+            m = search_first(data, i)
+            if not m: break
+            i = m.start()
+            if i >= limit: break
+            s = 0
+            while i < n:
+                s = delta[s].get(data[i], 0)
+                i += 1
+                if out[s]:
+                    for index, length in out[s]:
+                        st = i - length
+                        if st < limit: hits.append((base + st, index))
+                if not s: break
+
+# class automaton - end
+
+#* carve_job ****************************************************************
+class carve_job (jobs.job):
+    '''
+    Scans [start, end) of a stream for all signatures of an automaton as a
+    background job. Hits are appended in offset order to the arrays
+    offsets and sig_indexes while the scan runs.
+    known lists (start, end, offsets, sig_indexes) spans, in offset order,
+    whose hits are known already (from the index cache); those get copied
+    instead of scanned. The holes in the sparse_map sparse are skipped
+    (unless some signature is all zeros).
+    '''
+
+# carve_job.__init__()
+    def __init__ (self, read, atm, start, end, chunk_size = CHUNK_SIZE, known = (),
+            sparse = None):
+        jobs.job.__init__(self, total = max(0, end - start))
+        self.read = read
+        self.automaton = atm
+        self.start = start
+        self.end = end
+        self.chunk_size = chunk_size
+        self.offsets = array.array('Q')
+        self.sig_indexes = array.array('I')
+        self.known = known
+        self.sparse = None if atm.matches_zeros else sparse
+
+# carve_job.describe()
+    def describe (self):
+        return 'carve ({} hits)'.format(self.get_hit_count())
+
+# carve_job.get_hit_count()
+    def get_hit_count (self):
+        return len(self.sig_indexes)
+
+# carve_job.get_hit()
+    def get_hit (self, index):
+        '''
+        Returns (offset, signature name).
+        '''
+        return self.offsets[index], self.automaton.names[self.sig_indexes[index]]
+
+# carve_job.scan()
+    def scan (self, start, end):
+        '''
+        Scans [start, end); returns False if the stream ended before.
+        '''
+        overlap = self.automaton.max_len - 1
+        o = start
+        while o < end and not self.is_cancelled():
+            n = min(self.chunk_size, end - o)
+            data = self.read(o, n + overlap)
+            hits = []
+            self.automaton.scan(data, o, n, hits)
+            if hits:
+                hits.sort()
+                # offsets first: a reader sizes things by sig_indexes
+                self.offsets.extend(h[0] for h in hits)
+                self.sig_indexes.extend(h[1] for h in hits)
+            o += n
+            self.set_progress(o - self.start)
+            if len(data) < n: return False
+        return True
+
+# carve_job.scan_data()
+    def scan_data (self, start, end):
+        '''
+        Scans the data extents of [start, end) (with enough of the holes
+        before them to find hits ending in data).
+        '''
+        if not self.sparse: return self.scan(start, end)
+        for s, e in self.sparse.get_data_ranges(start, end, self.automaton.max_len - 1):
+            if not self.scan(s, e): return False
+        self.set_progress(end - self.start)
+        return True
+
+# carve_job.work()
+    def work (self):
+        o = self.start
+        for start, end, offsets, sig_indexes in self.known:
+            if not self.scan_data(o, start) or self.is_cancelled(): return
+            self.offsets.extend(offsets)
+            self.sig_indexes.extend(sig_indexes)
+            o = end
+            self.set_progress(o - self.start)
+        self.scan_data(o, self.end)
+
+# class carve_job - end
+
+#* get_growth_spans *********************************************************
+def get_growth_spans (job):
+    '''
+    Returns the known spans for scanning the stream of a finished carve_job
+    again after it grew: its hits, less those starting too close to its old
+    end to rule out a longer signature cut short there; the scan picks
+    those up again along with the new data.
+    '''
+    s = max(job.start, job.end - (job.automaton.max_len - 1))
+    k = bisect.bisect_left(job.offsets, s)
+    return [(job.start, s, job.offsets[:k], job.sig_indexes[:k])]
+
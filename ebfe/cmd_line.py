@@ -21,7 +21,22 @@ def boot_driver_curses (cli):
     return run
 
 def boot_driver_mock (cli):
-    raise RuntimeError('todo: mock driver')
+    import ebfe.tui_mock
+    import ebfe.bench
+    def run (func):
+        drv = ebfe.tui_mock.driver(
+                script = ebfe.tui_mock.parse_script(cli.mock_keys),
+                settle_styles = ebfe.bench.LOADING_STYLES)
+        try:
+            return ebfe.tui_mock.run(func, drv)
+        finally:
+            print(drv.get_screen_text())
+            print(ebfe.bench.format_stats('mock', ebfe.bench.summarize(drv.frames)))
+    return run
+
+def cmd_bench (cli):
+    import ebfe.bench
+    ebfe.bench.main(cli)
 
 def cmd_interactive_edit (cli):
     app = ebfe.app.main(cli)
@@ -41,13 +56,43 @@ def main ():
     ap.add_argument('-d', '--tui-driver', metavar = 'DRIVER',
             dest = 'tui_driver', default = 'curses',
             help = 'select the TUI driver')
-    ap.add_argument('file', nargs = '*', help = 'input file(s)')
+    ap.add_argument('file', nargs = '*',
+            help = 'input file(s); gz://FILE, xz://FILE and bz2://FILE open compressed files '
+            'decompressed, zip://ARCHIVE!MEMBER and tar://ARCHIVE!MEMBER archive members, '
+            'proc://PID the memory of a process')
     ap.add_argument('--load-delay SECONDS', dest = 'load_delay',
             type = float, default = 0,
-            help = 'delay loads from files (for testing)')
+            help = 'delay loads from files (for testing; disables mmap)')
+    ap.add_argument('--no-mmap', dest = 'mmap',
+            action = 'store_false', default = True,
+            help = 'read local files instead of mapping them in memory')
+    ap.add_argument('--follow', dest = 'follow',
+            action = 'store_true', default = False,
+            help = 'follow the files as they grow (like tail -f), '
+                'starting at their end')
+    ap.add_argument('--mock-keys', metavar = 'KEYS', dest = 'mock_keys',
+            default = '',
+            help = 'comma separated keys replayed by the mock driver '
+                '(KEY*N repeats, KEY+N sends N presses at once)')
+    ap.add_argument('--bench', metavar = 'SCENARIOS', dest = 'bench',
+            nargs = '?', const = 'all', default = None,
+            help = 'run rendering benchmarks with the mock driver '
+                '(comma separated scenario names, default: all)')
+    ap.add_argument('--bench-steps', metavar = 'N', dest = 'bench_steps',
+            type = int, default = 500,
+            help = 'number of key presses per benchmark scenario')
+    ap.add_argument('--bench-size', metavar = 'WxH', dest = 'bench_size',
+            default = '120x40',
+            help = 'screen size used by the benchmarks')
+    ap.add_argument('--bench-json', metavar = 'FILE', dest = 'bench_json',
+            default = None,
+            help = 'also write the benchmark results to FILE')
 
     cli = ap.parse_args(args)
     cli.ap = ap
+    if cli.bench:
+        cli.cmd = 'bench'
+        cli.bench_width, cli.bench_height = (int(x) for x in cli.bench_size.split('x'))
 
 
     if cli.verbose: print('argv={!r} cli={!r}'.format(sys.argv, cli))
@@ -0,0 +1,691 @@
+# standard module imports
+import array
+import bisect
+import bz2
+import io
+import lzma
+import os
+import struct
+import tempfile
+import threading
+import zlib
+
+# custom external module imports
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.index_cache as index_cache
+import ebfe.jobs as jobs
+
+# uri schemes of the compressed formats
+SCHEMES = ('gz', 'xz', 'bz2')
+
+# uncompressed bytes between two gzip checkpoints: each one keeps a copy of
+# the zlib state (about 40 KB), seeking decompresses at most this much
+DEFAULT_CHECKPOINT_SPACING = 4 << 20
+
+# compressed bytes read at a time
+READ_SIZE = 1 << 16
+
+# decompressed bytes produced at a time
+OUTPUT_SIZE = 1 << 20
+
+# compressed bytes searched at a time for bzip2 block boundaries
+SCAN_SIZE = 4 << 20
+
+GZIP_MAGIC = b'\x1F\x8B'
+
+XZ_HEADER_MAGIC = b'\xFD7zXZ\x00'
+XZ_FOOTER_MAGIC = b'YZ'
+XZ_HEADER_SIZE = 12
+XZ_FOOTER = struct.Struct('<IIH2s')
+
+# 48-bit markers starting bzip2 blocks and ending bzip2 streams; they are
+# not byte aligned
+BZ2_BLOCK_MAGIC = 0x314159265359
+BZ2_EOS_MAGIC = 0x177245385090
+BZ2_MAGIC_BITS = 48
+
+SEEK_INDEX_MAGIC = b'EBFESEK1'
+SEEK_INDEX_HEADER = struct.Struct('<4sQqQQQQ')
+SEEK_INDEX_SUFFIX = '.seek'
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* pread_all ****************************************************************
+def pread_all (fd, size, offset):
+    '''
+    Reads size bytes (fewer only at the end of the file).
+    '''
+    parts = []
+    while size > 0:
+        data = os.pread(fd, size, offset)
+        if not data: break
+        parts.append(data)
+        size -= len(data)
+        offset += len(data)
+    return b''.join(parts)
+
+#* gzip_cursor **************************************************************
+class gzip_cursor (object):
+    '''
+    Decompresses a gzip file (all its members) or a raw deflate stream
+    ending at compressed offset end from a checkpoint on.
+    u is the uncompressed offset of the next byte read() returns.
+    '''
+
+# gzip_cursor.__init__()
+    def __init__ (self, fd, u, state, end, raw = False):
+        self.fd = fd
+        self.u = u
+        self.c, d = state
+        self.d = d.copy() if d is not None else None
+        self.end = end
+        self.raw = raw
+        self.buf = b''
+
+# gzip_cursor.get_state()
+    def get_state (self):
+        '''
+        Returns the checkpoint state for the current position: the offset
+        of the first compressed byte not fed to zlib yet and a copy of the
+        zlib decompressor (None at the start of a member).
+        '''
+        return self.c - len(self.buf), self.d.copy() if self.d is not None else None
+
+# gzip_cursor.read()
+    def read (self, size):
+        '''
+        Returns up to size decompressed bytes; b'' at the end.
+        '''
+        while True:
+            if not self.buf:
+                self.buf = os.pread(self.fd, min(READ_SIZE, self.end - self.c), self.c)
+                self.c += len(self.buf)
+                if not self.buf: return b''
+            if self.d is None:
+                if self.raw:
+                    self.d = zlib.decompressobj(-zlib.MAX_WBITS)
+                # anything but another member after one is trailing junk
+                elif self.buf[:len(GZIP_MAGIC)] != GZIP_MAGIC[:len(self.buf)]:
+                    return b''
+                else:
+                    self.d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            elif self.d.eof:
+                return b''
+            out = self.d.decompress(self.buf, size)
+            self.buf = self.d.unconsumed_tail
+            if self.d.eof and not self.raw:
+                # the rest of the input is in unused_data; unconsumed_tail
+                # can still hold a stale copy of it
+                self.buf = self.d.unused_data
+                self.d = None
+            if out:
+                self.u += len(out)
+                return out
+
+# class gzip_cursor - end
+
+#* gzip_format **************************************************************
+class gzip_format (object):
+    '''
+    gzip files (or raw deflate streams, as in zip archives): zran-style
+    checkpoints (copies of the zlib state, with its window) taken every
+    spacing bytes while decompressing the whole file once. Python's zlib
+    cannot export that state, so only the starts of the members (which
+    need no window) get stored in the seek index.
+    '''
+
+    name = 'gz'
+
+    # the seek index does not hold all the checkpoints
+    persistent = False
+
+# gzip_format.__init__()
+    def __init__ (self, spacing, raw = False):
+        self.spacing = spacing
+        self.raw = raw
+
+# gzip_format.open_cursor()
+    def open_cursor (self, cf, i):
+        u, state = cf.points[i]
+        return gzip_cursor(cf.fd, u, state, cf.end, self.raw)
+
+# gzip_format.pack_point()
+    def pack_point (self, u, state):
+        c, d = state
+        return (u, c, 0) if d is None else None
+
+# gzip_format.unpack_point()
+    def unpack_point (self, u, a, b):
+        return u, (a, None)
+
+# gzip_format.build()
+    def build (self, cf, job):
+        '''
+        Decompresses the file adding checkpoints; returns False if
+        cancelled.
+        '''
+        cur = gzip_cursor(cf.fd, 0, (cf.start, None), cf.end, self.raw)
+        last = 0
+        while True:
+            if job.is_cancelled(): return False
+            if cur.d is None or cur.u - last >= self.spacing:
+                cf.add_point(cur.u, cur.get_state())
+                last = cur.u
+                cf.extend(cur.u)
+            if not cur.read(OUTPUT_SIZE): break
+            job.set_progress(cur.c - len(cur.buf) - cf.start)
+        cf.extend(cur.u, complete = True)
+        return True
+
+# class gzip_format - end
+
+#* read_varint **************************************************************
+def read_varint (data, o):
+    '''
+    Returns (value, next offset) for an xz variable length integer.
+    '''
+    value = 0
+    shift = 0
+    while True:
+        b = data[o]
+        o += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80: return value, o
+        shift += 7
+        if shift > 63: raise error('bad xz integer')
+
+#* block_cursor *************************************************************
+class block_cursor (object):
+    '''
+    Reads the blocks of a bz2_format file one after another, each one
+    decompressed on its own.
+    '''
+
+# block_cursor.__init__()
+    def __init__ (self, cf, i):
+        self.cf = cf
+        self.i = i
+        self.u = cf.points[i][0]
+        self.data = b''
+
+# block_cursor.read()
+    def read (self, size):
+        while not self.data:
+            with self.cf.lock:
+                if self.i >= len(self.cf.points): return b''
+                u, state = self.cf.points[self.i]
+            self.data = memoryview(self.cf.format.decompress_block(self.cf.fd, state))
+            self.i += 1
+        out = self.data[:size]
+        self.data = self.data[len(out):]
+        self.u += len(out)
+        return bytes(out)
+
+# class block_cursor - end
+
+#* xz_cursor ****************************************************************
+class xz_cursor (object):
+    '''
+    Decompresses the blocks of an xz file from the start of one on, each
+    block fed to its own decompressor after the header of its stream.
+    '''
+
+# xz_cursor.__init__()
+    def __init__ (self, cf, i):
+        self.cf = cf
+        self.i = i
+        self.u = cf.points[i][0]
+        self.d = None
+
+# xz_cursor.read()
+    def read (self, size):
+        while True:
+            if self.d is None:
+                with self.cf.lock:
+                    if self.i >= len(self.cf.points): return b''
+                    u, (header, self.c, self.left, self.block_end) = self.cf.points[self.i]
+                self.block_end += u
+                self.i += 1
+                self.d = lzma.LZMADecompressor(lzma.FORMAT_XZ)
+                self.d.decompress(header)
+            data = b''
+            if self.d.needs_input:
+                data = os.pread(self.cf.fd, min(self.left, READ_SIZE), self.c)
+                if not data: raise error('xz block at 0x{:X} truncated'.format(self.c))
+                self.c += len(data)
+                self.left -= len(data)
+            out = self.d.decompress(data, min(size, self.block_end - self.u))
+            self.u += len(out)
+            if self.u >= self.block_end or (not self.left and self.d.needs_input):
+                if self.u != self.block_end:
+                    raise error('xz block ending at 0x{:X} ended at 0x{:X}'.format(self.block_end, self.u))
+                self.d = None
+            if out: return out
+
+# class xz_cursor - end
+
+#* xz_format ****************************************************************
+class xz_format (object):
+    '''
+    xz files: each block gets decompressed on its own (after a copy of the
+    header of its stream); the block list comes from the indexes at the
+    end of the streams, so nothing needs decompressing upfront. xz only
+    splits its input in blocks when compressing in parallel or when asked
+    to (--block-size); a single block file has to be decompressed from the
+    start and the checkpoint spacing does not apply.
+    '''
+
+    name = 'xz'
+
+    persistent = True
+
+# xz_format.__init__()
+    def __init__ (self, spacing):
+        pass
+
+# xz_format.open_cursor()
+    def open_cursor (self, cf, i):
+        return xz_cursor(cf, i)
+
+# xz_format.pack_point()
+    def pack_point (self, u, state):
+        return None
+
+# xz_format.read_stream_blocks()
+    def read_stream_blocks (self, fd, end):
+        '''
+        Parses the stream ending at end. Returns its start offset and the
+        list of (compressed offset, padded size, uncompressed size) of its
+        blocks.
+        '''
+        if end < 2 * XZ_HEADER_SIZE: raise error('xz stream too short')
+        crc, backward_size, flags, magic = XZ_FOOTER.unpack(pread_all(fd, XZ_FOOTER.size, end - XZ_FOOTER.size))
+        if magic != XZ_FOOTER_MAGIC: raise error('bad xz footer at 0x{:X}'.format(end - XZ_FOOTER.size))
+        index_size = (backward_size + 1) * 4
+        index_start = end - XZ_FOOTER.size - index_size
+        index = pread_all(fd, index_size, index_start)
+        if index[:1] != b'\x00' or zlib.crc32(index[:-4]) != struct.unpack('<I', index[-4:])[0]:
+            raise error('bad xz index at 0x{:X}'.format(index_start))
+        count, o = read_varint(index, 1)
+        records = []
+        for i in range(count):
+            unpadded, o = read_varint(index, o)
+            usize, o = read_varint(index, o)
+            records.append(((unpadded + 3) & ~3, usize))
+        start = index_start - sum(n for n, u in records) - XZ_HEADER_SIZE
+        if start < 0 or pread_all(fd, len(XZ_HEADER_MAGIC), start) != XZ_HEADER_MAGIC:
+            raise error('xz stream header not found for the index at 0x{:X}'.format(index_start))
+        blocks = []
+        c = start + XZ_HEADER_SIZE
+        for n, usize in records:
+            blocks.append((c, n, usize))
+            c += n
+        return start, blocks
+
+# xz_format.build()
+    def build (self, cf, job):
+        '''
+        Collects the blocks of all streams, from the last one back.
+        '''
+        streams = []
+        end = cf.compressed_size
+        while end > 0:
+            if job.is_cancelled(): return False
+            # streams can be followed by padding (multiples of 4 zero bytes)
+            while end >= 4 and pread_all(cf.fd, 4, end - 4) == bytes(4): end -= 4
+            if end <= 0: break
+            start, blocks = self.read_stream_blocks(cf.fd, end)
+            streams.append((pread_all(cf.fd, XZ_HEADER_SIZE, start), blocks))
+            job.set_progress(cf.compressed_size - start)
+            end = start
+        u = 0
+        for header, blocks in reversed(streams):
+            for c, n, usize in blocks:
+                cf.add_point(u, (header, c, n, usize))
+                u += usize
+        cf.extend(u, complete = True)
+        return True
+
+# class xz_format - end
+
+#* find_bit_pattern *********************************************************
+def find_bit_pattern (data, pattern, bits, limit):
+    '''
+    Returns the bit offsets (most significant bit first, as bzip2 lays out
+    its bits) where a pattern of the given bit length starts in data,
+    before byte limit. The bytes the pattern covers fully are searched for
+    at each of the 8 bit alignments, then the partial ones get checked.
+    '''
+    span = (bits + 7 + 7) // 8
+    mask = (1 << bits) - 1
+    hits = []
+    for s in range(8):
+        window = (pattern << (span * 8 - bits - s)).to_bytes(span, 'big')
+        first = 0 if s == 0 else 1
+        key = window[first : (s + bits) // 8]
+        p = data.find(key)
+        while p >= 0:
+            w = p - first
+            if 0 <= w < limit:
+                chunk = data[w : w + span]
+                if len(chunk) == span and (int.from_bytes(chunk, 'big') >> (span * 8 - bits - s)) & mask == pattern:
+                    hits.append(w * 8 + s)
+            p = data.find(key, p + 1)
+    return hits
+
+#* bz2_format ***************************************************************
+class bz2_format (object):
+    '''
+    bzip2 files: each block (at most 900 KB of data) gets decompressed on
+    its own, wrapped as a stream of one block. The block boundaries are
+    found by searching for their bit-aligned markers and their
+    uncompressed sizes by decompressing them once; all of that gets stored
+    in the seek index. The last block decompressed is kept, as moving
+    around in it is common and decompressing a block takes a while.
+    '''
+
+    name = 'bz2'
+
+    persistent = True
+
+# bz2_format.__init__()
+    def __init__ (self, spacing):
+        self.last = None
+
+# bz2_format.open_cursor()
+    def open_cursor (self, cf, i):
+        return block_cursor(cf, i)
+
+# bz2_format.pack_point()
+    def pack_point (self, u, state):
+        return (u, ) + state
+
+# bz2_format.unpack_point()
+    def unpack_point (self, u, a, b):
+        return u, (a, b)
+
+# bz2_format.decompress_block()
+    def decompress_block (self, fd, state):
+        '''
+        Decompresses the block between the given bit offsets: its bits get
+        shifted to a byte boundary after a stream header and followed by
+        an end of stream marker with the CRC of the block (which is the
+        CRC of a stream holding just that block).
+        '''
+        last = self.last
+        if last is not None and last[0] == state: return last[1]
+        start, end = state
+        first = start >> 3
+        data = pread_all(fd, ((end + 7) >> 3) - first, first)
+        n = end - start
+        v = (int.from_bytes(data, 'big') >> (len(data) * 8 - (end - first * 8))) & ((1 << n) - 1)
+        crc = (v >> (n - BZ2_MAGIC_BITS - 32)) & 0xFFFFFFFF
+        v = (((v << BZ2_MAGIC_BITS) | BZ2_EOS_MAGIC) << 32) | crc
+        n += BZ2_MAGIC_BITS + 32
+        pad = -n % 8
+        try:
+            data = bz2.decompress(b'BZh9' + (v << pad).to_bytes((n + pad) // 8, 'big'))
+        except (OSError, ValueError) as e:
+            raise error('bad bzip2 block at bit 0x{:X}: {}'.format(start, e))
+        self.last = state, data
+        return data
+
+# bz2_format.build()
+    def build (self, cf, job):
+        '''
+        Scans the file for block and end of stream markers; a block spans
+        from its marker to the next one.
+        '''
+        overlap = (BZ2_MAGIC_BITS + 14) // 8
+        u = 0
+        block_start = None
+        c = 0
+        while c < cf.compressed_size:
+            if job.is_cancelled(): return False
+            data = pread_all(cf.fd, SCAN_SIZE + overlap, c)
+            limit = min(SCAN_SIZE, len(data))
+            marks = [(b, True) for b in find_bit_pattern(data, BZ2_BLOCK_MAGIC, BZ2_MAGIC_BITS, limit)]
+            marks += [(b, False) for b in find_bit_pattern(data, BZ2_EOS_MAGIC, BZ2_MAGIC_BITS, limit)]
+            for b, is_block in sorted(marks):
+                b += c * 8
+                if block_start is not None:
+                    state = (block_start, b)
+                    n = len(self.decompress_block(cf.fd, state))
+                    cf.add_point(u, state)
+                    u += n
+                    cf.extend(u)
+                block_start = b if is_block else None
+            c += limit
+            job.set_progress(c)
+        if block_start is not None:
+            raise error('bzip2 block at bit 0x{:X} not terminated'.format(block_start))
+        cf.extend(u, complete = True)
+        return True
+
+# class bz2_format - end
+
+FORMATS = dict(gz = gzip_format, xz = xz_format, bz2 = bz2_format)
+
+#* compressed_file **********************************************************
+class compressed_file (io.RawIOBase):
+    '''
+    Read-only, seekable file object giving the decompressed content of a
+    compressed file. The size is what the index job found so far: it grows
+    (through on_extend(size)) while the job runs, until complete.
+    Reads restart decompressing from the closest seek point before them,
+    or go on from where the last read stopped.
+    points lists (uncompressed offset, format specific state) pairs.
+    The compressed data can be a region of the file (a member of an
+    archive, see archive.open_member()), from start to end; name then
+    tells it apart from the other members in the index cache.
+    '''
+
+# compressed_file.__init__()
+    def __init__ (self, path, fmt, start = 0, end = None, name = None):
+        io.RawIOBase.__init__(self)
+        self.path = path
+        self.format = fmt
+        self.name_in_cache = name or path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.start = start
+        self.end = os.fstat(self.fd).st_size if end is None else end
+        self.compressed_size = self.end - start
+        self.lock = threading.Lock()
+        self.points = []
+        self.offsets = []
+        self.size = 0
+        self.complete = False
+        self.pos = 0
+        self.cursor = None
+        self.on_extend = None
+
+# compressed_file.__repr__()
+    def __repr__ (self):
+        return 'compressed_file({!r}, {})'.format(self.name_in_cache, self.format.name)
+
+# compressed_file.close()
+    def close (self):
+        if not self.closed: os.close(self.fd)
+        io.RawIOBase.close(self)
+
+# compressed_file.readable()
+    def readable (self):
+        return True
+
+# compressed_file.seekable()
+    def seekable (self):
+        return True
+
+# compressed_file.tell()
+    def tell (self):
+        return self.pos
+
+# compressed_file.seek()
+    def seek (self, offset, whence = os.SEEK_SET):
+        if whence == os.SEEK_CUR: offset += self.pos
+        elif whence == os.SEEK_END: offset += self.size
+        if offset < 0: raise ValueError('negative offset: {}'.format(offset))
+        self.pos = offset
+        return offset
+
+# compressed_file.add_point()
+    def add_point (self, u, state):
+        with self.lock:
+            i = bisect.bisect_left(self.offsets, u)
+            if i < len(self.offsets) and self.offsets[i] == u: return
+            self.offsets.insert(i, u)
+            self.points.insert(i, (u, state))
+
+# compressed_file.extend()
+    def extend (self, size, complete = False):
+        with self.lock:
+            grown = size > self.size
+            self.size = max(self.size, size)
+            self.complete = self.complete or complete
+        if grown and self.on_extend: self.on_extend(self.size)
+
+# compressed_file.open_cursor()
+    def open_cursor (self, offset):
+        '''
+        Returns a cursor at or before offset, positioned where reading ahead
+        to it costs the least.
+        '''
+        with self.lock:
+            i = bisect.bisect_right(self.offsets, offset) - 1
+            cur = self.cursor
+            if cur is not None and self.offsets[i] <= cur.u <= offset: return cur
+        return self.format.open_cursor(self, i)
+
+# compressed_file.read()
+    def read (self, size = -1):
+        end = self.size if size is None or size < 0 else min(self.size, self.pos + size)
+        if self.pos >= end: return b''
+        cur = self.open_cursor(self.pos)
+        self.cursor = None
+        while cur.u < self.pos:
+            if not cur.read(min(OUTPUT_SIZE, self.pos - cur.u)):
+                raise error('{} ended at 0x{:X}'.format(self.path, cur.u))
+        out = bytearray()
+        while cur.u < end:
+            data = cur.read(min(OUTPUT_SIZE, end - cur.u))
+            if not data: break
+            out += data
+        self.pos += len(out)
+        self.cursor = cur
+        return bytes(out)
+
+# compressed_file.readinto()
+    def readinto (self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+# compressed_file.get_packed_points()
+    def get_packed_points (self):
+        '''
+        Returns the (uncompressed offset, a, b) triples of the seek points
+        worth storing.
+        '''
+        with self.lock: points = list(self.points)
+        packed = (self.format.pack_point(u, state) for u, state in points)
+        return [p for p in packed if p is not None]
+
+# class compressed_file - end
+
+#* open_compressed **********************************************************
+def open_compressed (scheme, path, spacing = DEFAULT_CHECKPOINT_SPACING):
+    '''
+    Returns a compressed_file for one of SCHEMES; it is empty until an
+    index_job runs for it.
+    '''
+    return compressed_file(path, FORMATS[scheme](spacing))
+
+#* load_seek_index **********************************************************
+def load_seek_index (cache_dir, cf):
+    '''
+    Loads the seek points stored for a compressed file if it did not change
+    since. Returns True if they cover the whole file.
+    '''
+    if not hasattr(cf.format, 'unpack_point'): return False
+    path = index_cache.get_index_path(cache_dir, cf.name_in_cache, SEEK_INDEX_SUFFIX)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return False
+    except OSError as e:
+        dmsg('cannot read seek index {!r}: {}', path, e)
+        return False
+    o = len(SEEK_INDEX_MAGIC)
+    try:
+        if data[:o] != SEEK_INDEX_MAGIC: raise error('bad magic')
+        name, size, mtime_ns, ino, dev, usize, count = SEEK_INDEX_HEADER.unpack_from(data, o)
+        a = index_cache.unpack_array('Q', data[o + SEEK_INDEX_HEADER.size:])
+        if len(a) != 3 * count: raise error('truncated')
+    except (error, struct.error, ValueError) as e:
+        dmsg('ignoring bad seek index {!r}: {}', path, e)
+        return False
+    if name.rstrip(b'\0') != cf.format.name.encode('ascii'): return False
+    if (size, mtime_ns, ino, dev) != index_cache.get_file_key(cf.path): return False
+    for i in range(0, len(a), 3):
+        cf.add_point(*cf.format.unpack_point(a[i], a[i + 1], a[i + 2]))
+    cf.extend(usize, complete = True)
+    dmsg('seek index {!r}: {} points, 0x{:X} bytes', path, count, usize)
+    return True
+
+#* store_seek_index *********************************************************
+def store_seek_index (cache_dir, cf):
+    points = cf.get_packed_points()
+    if not points: return
+    a = array.array('Q')
+    for p in points: a.extend(p)
+    data = SEEK_INDEX_MAGIC + SEEK_INDEX_HEADER.pack(cf.format.name.encode('ascii'),
+            *index_cache.get_file_key(cf.path), cf.size, len(points)) + index_cache.pack_array(a)
+    os.makedirs(cache_dir, exist_ok = True)
+    fd, tmp_path = tempfile.mkstemp(dir = cache_dir, suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, index_cache.get_index_path(cache_dir, cf.name_in_cache, SEEK_INDEX_SUFFIX))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+#* index_job ****************************************************************
+class index_job (jobs.job):
+    '''
+    Finds the seek points of a compressed_file, growing it as they get
+    known, as a background job. With a cache_dir the points get loaded from
+    (and then stored to) the seek index kept there; gzip files still get
+    decompressed once for their window checkpoints.
+    '''
+
+    system = True
+
+# index_job.__init__()
+    def __init__ (self, cf, cache_dir = None):
+        jobs.job.__init__(self, total = cf.compressed_size)
+        self.cf = cf
+        self.cache_dir = cache_dir
+
+# index_job.describe()
+    def describe (self):
+        return 'index {} ({})'.format(self.cf.name_in_cache, jobs.format_size(self.cf.size))
+
+# index_job.work()
+    def work (self):
+        cf = self.cf
+        loaded = self.cache_dir is not None and load_seek_index(self.cache_dir, cf)
+        if loaded and cf.format.persistent: return
+        if not cf.format.build(cf, self) or loaded or self.cache_dir is None: return
+        try:
+            store_seek_index(self.cache_dir, cf)
+        except OSError as e:
+            dmsg('cannot store seek index of {!r}: {}', cf.name_in_cache, e)
+
+# class index_job - end
+
@@ -0,0 +1,199 @@
+# standard module imports
+import collections
+import concurrent.futures
+import hashlib
+import zlib
+
+# internal module imports
+import ebfe.jobs as jobs
+
+# size of the chunks hashed at a time
+CHUNK_SIZE = 4 << 20
+
+# size of the leaves of tree hashes
+TREE_LEAF_SIZE = 4 << 20
+
+FLAT_ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512', 'blake2b', 'crc32')
+
+# tree hashes: the algorithm name followed by TREE_SUFFIX
+TREE_SUFFIX = '-tree'
+TREE_ALGORITHMS = ('sha256-tree', 'blake2b-tree')
+
+ALGORITHMS = FLAT_ALGORITHMS + TREE_ALGORITHMS
+
+# hashed in place of the holes of sparse files (untouched, it takes no
+# memory: the pages of a large zeroed allocation are mapped lazily)
+ZERO_CHUNK = memoryview(bytes(CHUNK_SIZE))
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* crc32 ********************************************************************
+class crc32 (object):
+    '''
+    zlib.crc32() behind the interface of the hashlib objects.
+    '''
+
+    name = 'crc32'
+
+# crc32.__init__()
+    def __init__ (self):
+        self.value = 0
+
+# crc32.update()
+    def update (self, data):
+        self.value = zlib.crc32(data, self.value)
+
+# crc32.hexdigest()
+    def hexdigest (self):
+        return '{:08x}'.format(self.value)
+
+# class crc32 - end
+
+#* new_hash *****************************************************************
+def new_hash (algo):
+    if algo == 'crc32': return crc32()
+    return hashlib.new(algo)
+
+#* new_tree_node ************************************************************
+def new_tree_node (algo, index = 0, depth = 0, last = False):
+    '''
+    Returns a hash object for a node of a 2-level tree: the leaves (depth 0)
+    hash TREE_LEAF_SIZE byte chunks of the data and the root (depth 1)
+    hashes the concatenated leaf digests. BLAKE2b uses its own tree mode
+    parameters so that each node is hashed as a distinct object; other
+    algorithms make a plain Merkle tree.
+    '''
+    if algo != 'blake2b': return hashlib.new(algo)
+    return hashlib.blake2b(fanout = 0, depth = 2, leaf_size = TREE_LEAF_SIZE,
+            node_offset = index, node_depth = depth,
+            inner_size = hashlib.blake2b().digest_size, last_node = last)
+
+#* update_hash **************************************************************
+def update_hash (h, read, start, end, sparse = None,
+        progress = None, cancel = None):
+    '''
+    Feeds [start, end) of a stream read through read(offset, size) to a
+    hash object, one chunk after another (hashlib and zlib let other
+    threads run while they work on large buffers, and memory mapped
+    streams hand out views, not copies). The holes in the sparse_map
+    sparse get hashed from ZERO_CHUNK without reading them.
+    Returns False if cancelled; raises error if the stream ends before
+    end.
+    '''
+    o = start
+    while o < end:
+        if cancel and cancel.is_set(): return False
+        n = min(CHUNK_SIZE, end - o)
+        is_data = True
+        if sparse:
+            is_data, run_end = sparse.find(o)
+            n = min(n, run_end - o)
+        data = read(o, n) if is_data else ZERO_CHUNK[:n]
+        if not data:
+            raise error('stream ended at 0x{:X} (0x{:X} expected)'.format(o, end))
+        h.update(data)
+        o += len(data)
+        if progress: progress(o - start)
+    return True
+
+#* hash_flat ****************************************************************
+def hash_flat (read, algo, start, end, sparse = None,
+        progress = None, cancel = None):
+    '''
+    Hashes [start, end) of a stream; returns the hex digest or None if
+    cancelled.
+    '''
+    h = new_hash(algo)
+    if not update_hash(h, read, start, end, sparse, progress, cancel): return None
+    return h.hexdigest()
+
+#* hash_leaf ****************************************************************
+def hash_leaf (read, algo, index, start, end, last, sparse = None):
+    h = new_tree_node(algo, index, 0, last)
+    update_hash(h, read, start, end, sparse)
+    return h.digest()
+
+#* hash_tree ****************************************************************
+def hash_tree (read, algo, start, end, workers = 1, sparse = None,
+        progress = None, cancel = None):
+    '''
+    Computes the tree hash (see new_tree_node()) of [start, end) with the
+    leaves hashed by a pool of threads, in parallel as hashing does not
+    hold the GIL. Returns the hex digest or None if cancelled.
+    In a plain Merkle tree all full leaves of zeros have the same digest,
+    so those lying in holes of sparse get hashed only once.
+    '''
+    leaves = [(i, o, min(end, o + TREE_LEAF_SIZE))
+            for i, o in enumerate(range(start, end, TREE_LEAF_SIZE))] or [(0, start, start)]
+    root = new_tree_node(algo, 0, 1, True)
+    zero_leaf = None
+    pending = collections.deque()
+    next_leaf = 0
+    done = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers = max(1, workers)) as pool:
+        try:
+            while next_leaf < len(leaves) or pending:
+                if cancel and cancel.is_set(): return None
+                while next_leaf < len(leaves) and len(pending) < 2 * workers:
+                    i, o, e = leaves[next_leaf]
+                    last = next_leaf + 1 == len(leaves)
+                    next_leaf += 1
+                    if (sparse and algo != 'blake2b' and e - o == TREE_LEAF_SIZE
+                            and sparse.is_hole(o, e)):
+                        if zero_leaf is None:
+                            zero_leaf = concurrent.futures.Future()
+                            zero_leaf.set_result(hash_leaf(read, algo, i, o, e, last, sparse))
+                        pending.append((e - o, zero_leaf))
+                        continue
+                    pending.append((e - o, pool.submit(hash_leaf, read, algo,
+                        i, o, e, last, sparse)))
+                n, fut = pending.popleft()
+                root.update(fut.result())
+                done += n
+                if progress: progress(done)
+        finally:
+            for n, fut in pending: fut.cancel()
+    return root.hexdigest()
+
+#* hash_job *****************************************************************
+class hash_job (jobs.job):
+    '''
+    Hashes a range of a stream as a background job; the result is the hex
+    digest. Tree algorithms (TREE_ALGORITHMS) hash their leaves with a
+    pool of threads. Holes listed in the sparse_map sparse are not read.
+    '''
+
+# hash_job.__init__()
+    def __init__ (self, read, algo, start, end, workers = 1, sparse = None):
+        if algo not in ALGORITHMS:
+            raise error('unknown algorithm {!r} (known: {})'.format(algo, ', '.join(ALGORITHMS)))
+        jobs.job.__init__(self, total = max(0, end - start))
+        self.read = read
+        self.algo = algo
+        self.start = start
+        self.end = end
+        self.workers = workers
+        self.sparse = sparse
+
+# hash_job.describe()
+    def describe (self):
+        return 'hash {}'.format(self.algo)
+
+# hash_job.work()
+    def work (self):
+        if self.algo.endswith(TREE_SUFFIX):
+            return hash_tree(self.read, self.algo[:-len(TREE_SUFFIX)],
+                    self.start, self.end,
+                    workers = self.workers,
+                    sparse = self.sparse,
+                    progress = self.set_progress,
+                    cancel = self.cancel_event)
+        return hash_flat(self.read, self.algo, self.start, self.end,
+                sparse = self.sparse,
+                progress = self.set_progress,
+                cancel = self.cancel_event)
+
+# class hash_job - end
+
@@ -0,0 +1,458 @@
+# standard module imports
+import collections
+import random
+
+# custom external module imports
+import zlx.io
+import zlx.record
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.streams as streams
+
+# block kind for bytes changed by edits (zlx.io uses 0 to 2)
+SCK_EDITED = 3
+
+# piece sources
+ORIGINAL = 0
+ADDED = 1
+
+# rough memory cost of a journal entry and of a tree node, used to keep the
+# journal within its budget
+JOURNAL_ENTRY_COST = 256
+PIECE_NODE_COST = 128
+
+#* edited_data_block ********************************************************
+class edited_data_block (zlx.record.Record):
+    __slots__ = 'offset data'.split()
+    kind = SCK_EDITED
+    _field_repr = {}
+    def get_size (self): return len(self.data)
+    def desc (x): return 'edited(0x{:X},0x{:X},{!r})'.format(x.offset, len(x.data), bytes(x.data[0:4]))
+    def __repr__ (self): return self.desc()
+
+#* piece ********************************************************************
+class piece (object):
+    '''
+    Node of an implicit treap of pieces: the position of a piece is given by
+    the total length of the pieces before it in the tree, so an edit only
+    changes the nodes on a path from the root.
+    Nodes are never modified once built; edits copy the paths they change,
+    which lets old roots be kept around as snapshots.
+    '''
+    __slots__ = 'prio left right src start length total count'.split()
+
+# piece.__init__()
+    def __init__ (self, prio, left, right, src, start, length):
+        self.prio = prio
+        self.left = left
+        self.right = right
+        self.src = src
+        self.start = start
+        self.length = length
+        self.total = length + (left.total if left else 0) + (right.total if right else 0)
+        self.count = 1 + (left.count if left else 0) + (right.count if right else 0)
+
+# piece.__repr__()
+    def __repr__ (self):
+        return 'piece({}, 0x{:X}, 0x{:X})'.format('AO'[self.src == ORIGINAL], self.start, self.length)
+
+# class piece - end
+
+#* new_piece ****************************************************************
+def new_piece (src, start, length):
+    return piece(random.random(), None, None, src, start, length)
+
+#* tree_size ****************************************************************
+def tree_size (node):
+    return node.total if node else 0
+
+#* split_pieces *************************************************************
+def split_pieces (node, pos):
+    '''
+    Splits a tree into the pieces covering [0, pos) and the rest, cutting
+    the piece that straddles pos in two.
+    '''
+    if node is None: return None, None
+    lt = tree_size(node.left)
+    if pos <= lt:
+        l, r = split_pieces(node.left, pos)
+        return l, piece(node.prio, r, node.right, node.src, node.start, node.length)
+    if pos >= lt + node.length:
+        l, r = split_pieces(node.right, pos - lt - node.length)
+        return piece(node.prio, node.left, l, node.src, node.start, node.length), r
+    cut = pos - lt
+    return (piece(node.prio, node.left, None, node.src, node.start, cut),
+            piece(node.prio, None, node.right, node.src, node.start + cut, node.length - cut))
+
+#* merge_pieces *************************************************************
+def merge_pieces (a, b):
+    '''
+    Returns the tree holding the pieces of a followed by those of b.
+    '''
+    if a is None: return b
+    if b is None: return a
+    if a.prio > b.prio:
+        return piece(a.prio, a.left, merge_pieces(a.right, b), a.src, a.start, a.length)
+    return piece(b.prio, merge_pieces(a, b.left), b.right, b.src, b.start, b.length)
+
+#* last_piece ***************************************************************
+def last_piece (node):
+    while node.right: node = node.right
+    return node
+
+#* extend_last_piece ********************************************************
+def extend_last_piece (node, size):
+    if node.right:
+        return piece(node.prio, node.left, extend_last_piece(node.right, size), node.src, node.start, node.length)
+    return piece(node.prio, node.left, None, node.src, node.start, node.length + size)
+
+#* collect_pieces ***********************************************************
+def collect_pieces (node, pos, start, end, out):
+    '''
+    Appends to out (position, piece) for the pieces overlapping [start, end);
+    pos is the position of the first piece of the tree.
+    '''
+    while node:
+        npos = pos + tree_size(node.left)
+        if start < npos: collect_pieces(node.left, pos, start, end, out)
+        if start < npos + node.length and npos < end: out.append((npos, node))
+        pos = npos + node.length
+        if end <= pos: return
+        node = node.right
+
+#* rebase_block *************************************************************
+def rebase_block (blk, offset):
+    '''
+    Returns a copy of a block of the original stream placed at offset.
+    '''
+    if blk.kind == zlx.io.SCK_CACHED: return zlx.io.cached_data_block(offset, blk.data)
+    if blk.kind == zlx.io.SCK_UNCACHED: return zlx.io.uncached_data_block(offset, blk.size)
+    return zlx.io.hole_block(offset, blk.size)
+
+#* piece_table **************************************************************
+class piece_table (streams.block_source):
+    '''
+    Edit layer over a stream source: the edited content is described by a
+    sequence of pieces, each one either a range of the original stream or a
+    range of an append-only buffer holding all bytes ever typed.
+    The sequence covers the first base bytes of the original; whatever the
+    original has past base follows the last piece unchanged (so a growing
+    source keeps growing). The (root, base) pair is kept in self.state and
+    replaced as a whole, so readers in other threads always see a
+    consistent snapshot.
+    Edits cost O(log(number of pieces)), independent of the stream size,
+    and never touch the original. Queries go through the same interface as
+    the source; bytes coming from edits are reported as edited_data_block.
+    '''
+
+# piece_table.__init__()
+    def __init__ (self, source):
+        self.source = source
+        self.added = bytearray()
+        base = max(0, source.get_known_end_offset())
+        self.state = (new_piece(ORIGINAL, 0, base) if base else None, base)
+        self.orig_state = self.state
+
+# piece_table.__repr__()
+    def __repr__ (self):
+        return 'piece_table({!r})'.format(self.source)
+
+# piece_table.is_modified()
+    def is_modified (self):
+        return self.state is not self.orig_state
+
+# piece_table.get_piece_count()
+    def get_piece_count (self):
+        root = self.state[0]
+        return root.count if root else 0
+
+# piece_table.map_range()
+    def map_range (self, offset, size):
+        '''
+        Returns a list of (offset, src, src_offset, size) describing where
+        the bytes of [offset, offset + size) come from; offset >= 0.
+        '''
+        root, base = self.state
+        total = tree_size(root)
+        end = offset + size
+        parts = []
+        if offset < total:
+            pl = []
+            collect_pieces(root, 0, offset, end, pl)
+            for pos, p in pl:
+                o = max(offset, pos)
+                e = min(end, pos + p.length)
+                parts.append((o, p.src, p.start + o - pos, e - o))
+        if end > total:
+            o = max(offset, total)
+            parts.append((o, ORIGINAL, o - total + base, end - o))
+        return parts
+
+# piece_table.get_part()
+    def get_part (self, offset, size):
+        if not self.is_modified():
+            return self.source.get_part(offset, size)
+        if size < 0:
+            raise ValueError('negative size: {}'.format(size))
+        if offset < 0:
+            return zlx.io.hole_block(offset, min(size, -offset))
+        o, src, so, n = self.map_range(offset, size)[0]
+        if src == ADDED:
+            return edited_data_block(offset, bytes(self.added[so : so + n]))
+        blk = self.source.get_part(so, n)
+        if blk.kind == zlx.io.SCK_HOLE and blk.size == 0 and o < tree_size(self.state[0]):
+            # the original got shorter than it was when opened
+            return zlx.io.hole_block(offset, n)
+        return rebase_block(blk, offset)
+
+# piece_table.get_known_end_offset()
+    def get_known_end_offset (self):
+        root, base = self.state
+        return tree_size(root) + max(0, self.source.get_known_end_offset() - base)
+
+# piece_table.get_data_version()
+    def get_data_version (self, offset, size):
+        '''
+        Returns the source version for an unmodified stream; otherwise a
+        tuple describing the pieces of the range and the versions of their
+        original parts. Added bytes never change so they need no version.
+        '''
+        if not self.is_modified() or offset + size <= 0:
+            return self.source.get_data_version(offset, size)
+        if offset < 0:
+            size += offset
+            offset = 0
+        v = []
+        for o, src, so, n in self.map_range(offset, size):
+            v.append(src)
+            v.append(so)
+            v.append(n)
+            if src == ORIGINAL: v.append(self.source.get_data_version(so, n))
+        return tuple(v)
+
+# piece_table.can_read()
+    def can_read (self):
+        '''
+        Tells if read() works: the source can be read synchronously (not
+        all can; read() then raises).
+        '''
+        return hasattr(self.source, 'read')
+
+# piece_table.read()
+    def read (self, offset, size):
+        if not self.can_read():
+            raise RuntimeError('reading not supported by {!r}'.format(self.source))
+        if not self.is_modified():
+            return self.source.read(offset, size)
+        offset = max(0, offset)
+        l = []
+        for o, src, so, n in self.map_range(offset, size):
+            if src == ADDED:
+                l.append(self.added[so : so + n])
+                continue
+            data = self.source.read(so, n)
+            l.append(data)
+            if len(data) < n: break
+        return b''.join(l)
+
+# piece_table.get_local_path()
+    def get_local_path (self):
+        if self.is_modified(): return None
+        return self.source.get_local_path() if hasattr(self.source, 'get_local_path') else None
+
+# piece_table.get_sparse_map()
+    def get_sparse_map (self):
+        # edits move offsets around; the holes only describe the original
+        if self.is_modified(): return None
+        return self.source.get_sparse_map() if hasattr(self.source, 'get_sparse_map') else None
+
+# piece_table.prefetch()
+    def prefetch (self, ranges):
+        if self.is_modified():
+            mapped = []
+            for offset, size in ranges:
+                if offset < 0:
+                    size += offset
+                    offset = 0
+                if size <= 0: continue
+                for o, src, so, n in self.map_range(offset, size):
+                    if src == ORIGINAL: mapped.append((so, n))
+            ranges = mapped
+        self.source.prefetch(ranges)
+
+# piece_table.reset_updated()
+    def reset_updated (self):
+        return self.source.reset_updated()
+
+# piece_table.get_refresh_interval()
+    def get_refresh_interval (self):
+        if not hasattr(self.source, 'get_refresh_interval'): return None
+        return self.source.get_refresh_interval()
+
+# piece_table.get_byte()
+    def get_byte (self, offset):
+        '''
+        Returns the byte at the given offset if it is available right away
+        or None.
+        '''
+        blk = self.get_part(offset, 1)
+        if blk.kind in (zlx.io.SCK_CACHED, SCK_EDITED) and len(blk.data):
+            return blk.data[0]
+        return None
+
+# piece_table.replace()
+    def replace (self, offset, size, data = b''):
+        '''
+        Replaces the size bytes at offset with data; this is the primitive
+        behind overwriting, inserting and deleting.
+        Offsets past the known end are clamped to it.
+        '''
+        end = self.get_known_end_offset()
+        offset = max(0, min(offset, end))
+        size = max(0, min(size, end - offset))
+        root, base = self.state
+        total = tree_size(root)
+        if offset + size > total:
+            # bring the part of the original past base into the table
+            n = offset + size - total
+            root = merge_pieces(root, new_piece(ORIGINAL, base, n))
+            base += n
+        left, rest = split_pieces(root, offset)
+        mid, right = split_pieces(rest, size)
+        if data:
+            a = len(self.added)
+            self.added += data
+            if left and last_piece(left).src == ADDED and \
+                    last_piece(left).start + last_piece(left).length == a:
+                # typing along: grow the piece of the previous keystroke
+                left = extend_last_piece(left, len(data))
+            else:
+                left = merge_pieces(left, new_piece(ADDED, a, len(data)))
+        self.state = (merge_pieces(left, right), base)
+        dmsg('replace o=0x{:X} s=0x{:X} with 0x{:X} bytes', offset, size, len(data))
+
+# piece_table.overwrite()
+    def overwrite (self, offset, data):
+        self.replace(offset, len(data), data)
+
+# piece_table.insert()
+    def insert (self, offset, data):
+        self.replace(offset, 0, data)
+
+# piece_table.delete()
+    def delete (self, offset, size):
+        self.replace(offset, size)
+
+# class piece_table - end
+
+#* journal_entry ************************************************************
+journal_entry = zlx.record.make('edit_buffer.journal_entry',
+        'kind before after cursor_before cursor_after start end cost')
+
+#* edit_journal *************************************************************
+class edit_journal (object):
+    '''
+    Undo/redo journal of a piece_table. Entries keep references to the
+    table states (piece tree roots) before and after each operation instead
+    of the bytes involved: as trees share all the nodes an edit did not
+    touch, an entry costs O(log(number of pieces)) memory however many
+    bytes the operation changed.
+    Consecutive edits of the same kind next to each other (typing a run of
+    bytes, holding Backspace) coalesce into one entry until seal() gets
+    called. The oldest entries get dropped to keep the estimated memory
+    cost within budget bytes.
+    '''
+
+# edit_journal.__init__()
+    def __init__ (self, table, budget = 64 << 20):
+        self.table = table
+        self.budget = budget
+        self.undo_entries = collections.deque()
+        self.redo_entries = []
+        self.cost = 0
+        self.open_entry = None
+
+# edit_journal.estimate_cost()
+    def estimate_cost (self):
+        '''
+        Estimates the memory held by an entry: the nodes on the paths an
+        edit copies, about three times the depth of the tree.
+        '''
+        return JOURNAL_ENTRY_COST + PIECE_NODE_COST * 6 * max(1, self.table.get_piece_count().bit_length())
+
+# edit_journal.replace()
+    def replace (self, kind, offset, size, data, cursor_before, cursor_after):
+        '''
+        Runs table.replace() and records it.
+        kind names the operation ('overwrite', 'insert', 'delete', ...);
+        the cursor offsets get restored by undo() and redo().
+        '''
+        t = self.table
+        before = t.state
+        t.replace(offset, size, data)
+        e = self.open_entry
+        if e and e.kind == kind and e.after is before and \
+                e.start - max(size, 1) <= offset <= e.end:
+            e.after = t.state
+            e.cursor_after = cursor_after
+            e.start = min(e.start, offset)
+            e.end = offset + len(data) if data else offset
+        else:
+            e = journal_entry(kind, before, t.state, cursor_before, cursor_after,
+                    offset, offset + len(data), self.estimate_cost())
+            self.undo_entries.append(e)
+            self.cost += e.cost
+            self.open_entry = e
+        self.drop_redo()
+        self.trim()
+
+# edit_journal.seal()
+    def seal (self):
+        '''
+        Ends coalescing: the next edit starts a new entry.
+        '''
+        self.open_entry = None
+
+# edit_journal.drop_redo()
+    def drop_redo (self):
+        for e in self.redo_entries: self.cost -= e.cost
+        self.redo_entries = []
+
+# edit_journal.trim()
+    def trim (self):
+        while self.cost > self.budget and len(self.undo_entries) > 1:
+            e = self.undo_entries.popleft()
+            self.cost -= e.cost
+            dmsg('journal over budget: dropped {} entry', e.kind)
+
+# edit_journal.can_undo()
+    def can_undo (self):
+        return len(self.undo_entries) > 0
+
+# edit_journal.can_redo()
+    def can_redo (self):
+        return len(self.redo_entries) > 0
+
+# edit_journal.undo()
+    def undo (self):
+        '''
+        Reverts the last entry; returns it or None if there is nothing to undo.
+        '''
+        if not self.undo_entries: return None
+        e = self.undo_entries.pop()
+        self.table.state = e.before
+        self.redo_entries.append(e)
+        self.open_entry = None
+        return e
+
+# edit_journal.redo()
+    def redo (self):
+        if not self.redo_entries: return None
+        e = self.redo_entries.pop()
+        self.table.state = e.after
+        self.undo_entries.append(e)
+        self.open_entry = None
+        return e
+
+# class edit_journal - end
@@ -0,0 +1,167 @@
+# standard module imports
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+
+# custom external module imports
+from zlx.io import dmsg
+
+# inotify constants (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# without inotify the size gets polled, waiting longer while it stays the
+# same
+MIN_POLL_DELAY = 0.05
+MAX_POLL_DELAY = 2.0
+
+# after a change the size is checked again only this much later, so that
+# bursts of appends make one update
+SETTLE_DELAY = 0.05
+
+#* load_inotify *************************************************************
+def load_inotify ():
+    '''
+    Returns the C library if it has inotify (Linux), otherwise None.
+    '''
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError) as e:
+        dmsg('no inotify: {}', e)
+        return None
+
+libc = load_inotify()
+
+#* file_watcher *************************************************************
+class file_watcher (object):
+    '''
+    Watches a file that gets appended to (a log, a capture being written):
+    on_grow(size) gets called from the watcher thread whenever its size
+    went past the last one reported. Changes are waited for with inotify
+    where available; elsewhere (or if the watch cannot be added) the size
+    is polled every min_delay seconds, backing off up to max_delay while
+    nothing happens. Files that got shorter are not followed back.
+    The thread owns the read end of the stop pipe and stop() the write
+    end: each closes its own, so neither touches a descriptor the other
+    closed (and the system may have reused).
+    '''
+
+# file_watcher.__init__()
+    def __init__ (self, path, size, on_grow,
+            min_delay = MIN_POLL_DELAY, max_delay = MAX_POLL_DELAY):
+        self.path = path
+        self.size = size
+        self.on_grow = on_grow
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.stop_read, self.stop_write = os.pipe()
+        self.stopped = False
+        self.thread = threading.Thread(target = self.run, daemon = True,
+                name = 'follow {}'.format(path))
+
+# file_watcher.__repr__()
+    def __repr__ (self):
+        return 'file_watcher({!r}, size=0x{:X})'.format(self.path, self.size)
+
+# file_watcher.start()
+    def start (self):
+        self.thread.start()
+        return self
+
+# file_watcher.stop()
+    def stop (self):
+        if self.stopped: return
+        self.stopped = True
+        try:
+            os.write(self.stop_write, b'x')
+        except OSError:
+            # the thread ended already (and closed the read end)
+            pass
+        os.close(self.stop_write)
+        if self.thread.ident is None: os.close(self.stop_read)
+
+# file_watcher.check()
+    def check (self):
+        '''
+        Reports the size of the file if it grew.
+        '''
+        try:
+            size = os.stat(self.path).st_size
+        except OSError as e:
+            dmsg('cannot stat {!r}: {}', self.path, e)
+            return False
+        if size <= self.size:
+            if size < self.size: dmsg('{!r} got shorter: 0x{:X}', self.path, size)
+            return False
+        self.size = size
+        try:
+            self.on_grow(size)
+        except Exception as e:
+            # keep following: the next growth gets reported all the same
+            dmsg('{!r}: on_grow(0x{:X}) failed: {!r}', self.path, size, e)
+        return True
+
+# file_watcher.wait()
+    def wait (self, fds, timeout):
+        '''
+        Waits for one of fds to be readable (or timeout seconds); returns
+        False once stopped.
+        '''
+        r, w, x = select.select([self.stop_read] + fds, [], [], timeout)
+        return self.stop_read not in r
+
+# file_watcher.add_watch()
+    def add_watch (self):
+        '''
+        Returns an inotify descriptor watching the file or None.
+        '''
+        if libc is None: return None
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            dmsg('inotify_init1 failed: {}', os.strerror(ctypes.get_errno()))
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(self.path), IN_MODIFY) < 0:
+            dmsg('cannot watch {!r}: {}', self.path, os.strerror(ctypes.get_errno()))
+            os.close(fd)
+            return None
+        return fd
+
+# file_watcher.run()
+    def run (self):
+        fd = self.add_watch()
+        try:
+            if fd is not None: self.run_inotify(fd)
+            else: self.run_polling()
+        finally:
+            if fd is not None: os.close(fd)
+            os.close(self.stop_read)
+
+# file_watcher.run_inotify()
+    def run_inotify (self, fd):
+        dmsg('following {!r} with inotify', self.path)
+        # appends made before the watch got added
+        self.check()
+        while self.wait([fd], None):
+            try:
+                while os.read(fd, 4096): pass
+            except BlockingIOError:
+                pass
+            if not self.wait([], SETTLE_DELAY): break
+            self.check()
+
+# file_watcher.run_polling()
+    def run_polling (self):
+        dmsg('following {!r} by polling', self.path)
+        delay = self.min_delay
+        while self.wait([], delay):
+            if self.check(): delay = self.min_delay
+            else: delay = min(self.max_delay, delay * 2)
+
+# class file_watcher - end
+
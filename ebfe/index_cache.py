@@ -0,0 +1,393 @@
+# standard module imports
+import array
+import bisect
+import hashlib
+import math
+import os
+import struct
+import sys
+import tempfile
+
+# custom external module imports
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.jobs as jobs
+import ebfe.overview as overview
+
+MAGIC = b'EBFEIDX1'
+
+# smaller files get mapped quickly enough without an index
+MIN_FILE_SIZE = 16 << 20
+
+# bytes hashed at the start, middle and end of each region
+SAMPLE_SIZE = 4096
+
+HASH_SIZE = 8
+
+SECTION_HEADER = struct.Struct('<4sQ')
+FILE_SECTION = struct.Struct('<QqQQQI')
+OVERVIEW_SECTION = struct.Struct('<QI')
+CARVE_SECTION = struct.Struct('<16sQ')
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* get_index_path ***********************************************************
+def get_index_path (cache_dir, path, suffix = '.idx'):
+    '''
+    Returns the path of the index of a file in cache_dir.
+    '''
+    key = os.path.realpath(path).encode('utf-8', 'surrogateescape')
+    return os.path.join(cache_dir, hashlib.sha1(key).hexdigest() + suffix)
+
+#* get_file_key *************************************************************
+def get_file_key (path):
+    '''
+    Returns (size, mtime_ns, inode, device) of a file.
+    '''
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, st.st_ino, st.st_dev
+
+#* hash_regions *************************************************************
+def hash_regions (read, size, region_size, region_count, cancel = None):
+    '''
+    Returns the concatenated HASH_SIZE byte hashes of samples taken from
+    the start, middle and end of each region of a stream, or None if
+    cancel (a threading.Event) got set.
+    Changes that miss all samples of a region go unnoticed; the hashes only
+    back up the size and time stamp checks when those do not match.
+    '''
+    hashes = []
+    for i in range(region_count):
+        if cancel and cancel.is_set(): return None
+        start = i * region_size
+        end = min(size, start + region_size)
+        h = hashlib.blake2b(digest_size = HASH_SIZE)
+        for o in sorted(set((start, (start + end - SAMPLE_SIZE) // 2, end - SAMPLE_SIZE))):
+            o = max(start, o)
+            h.update(read(o, min(SAMPLE_SIZE, end - o)))
+        hashes.append(h.digest())
+    return b''.join(hashes)
+
+#* pack_array ***************************************************************
+def pack_array (a):
+    if sys.byteorder == 'big':
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+#* unpack_array *************************************************************
+def unpack_array (typecode, data):
+    a = array.array(typecode)
+    a.frombytes(data)
+    if sys.byteorder == 'big': a.byteswap()
+    return a
+
+#* file_index ***************************************************************
+class file_index (object):
+    '''
+    Results computed for a file, kept between runs: the overview bucket
+    stats and the hits of the last carving scan (as a (signature digest,
+    offsets, sig_indexes) tuple), for the regions of the file (laid out
+    like the overview buckets; after the file grew, the regions of its
+    index may keep their size, see follow_layout()).
+    overview_valid and carve_valid tell which regions of the file still
+    have the content the results were computed for; the rest need
+    recomputing. region_hashes are those of the file as it is now (None
+    until computed).
+    Results get replaced, never changed in place, so that a store_job can
+    pack them while the UI thread sets new ones.
+    '''
+
+# file_index.__init__()
+    def __init__ (self, path, key):
+        self.path = path
+        self.key = key
+        self.region_count, self.region_size = overview.get_bucket_layout(key[0])
+        self.region_hashes = None
+        self.overview = None
+        self.overview_valid = [False] * self.region_count
+        self.carve = None
+        self.carve_valid = [False] * self.region_count
+
+# file_index.follow_layout()
+    def follow_layout (self, size, region_size, region_count):
+        '''
+        Takes the region layout of an index stored when the file had the
+        given size, if the file did not shrink since; after it grew, the
+        regions keep their size as long as they do not get more than twice
+        overview.MAX_BUCKETS (as overview.get_growth_layout() allows), so
+        that the regions complete back then can keep their results.
+        Returns True if the layout got taken.
+        '''
+        if size > self.key[0] or region_size < 1: return False
+        count = region_count if size == self.key[0] else -(-self.key[0] // region_size)
+        if count * region_size < self.key[0] or count > 2 * overview.MAX_BUCKETS: return False
+        self.region_count, self.region_size = count, region_size
+        self.set_valid([False] * count)
+        return True
+
+# file_index.get_bucket_size()
+    def get_bucket_size (self):
+        '''
+        Returns the bucket_size overview_job needs for buckets laid out like
+        the regions, None for the default layout.
+        '''
+        if (self.region_count, self.region_size) == overview.get_bucket_layout(self.key[0]): return None
+        return self.region_size
+
+# file_index.set_valid()
+    def set_valid (self, valid):
+        valid = list(valid)
+        self.overview_valid = valid
+        self.carve_valid = list(valid)
+
+# file_index.is_fresh()
+    def is_fresh (self):
+        '''
+        Returns True if the file did not change since the index got loaded.
+        '''
+        try:
+            return get_file_key(self.path) == self.key
+        except OSError:
+            return False
+
+# file_index.get_overview()
+    def get_overview (self):
+        '''
+        Returns the overview stats of the valid regions (None for the rest)
+        or None if there are none.
+        '''
+        stats = self.overview
+        if stats is None: return None
+        return [stats[i] if v and i < len(stats) else None
+                for i, v in enumerate(self.overview_valid)]
+
+# file_index.set_overview()
+    def set_overview (self, stats):
+        self.overview_valid = [s is not None for s in stats]
+        self.overview = list(stats)
+
+# file_index.get_carve_reuse()
+    def get_carve_reuse (self, digest):
+        '''
+        Returns the flags telling which regions can keep their carve hits
+        for the signatures with the given digest (a hit starting in a
+        region can end in the next one, so both must be valid) or None.
+        '''
+        if self.carve is None or self.carve[0] != digest: return None
+        v = self.carve_valid
+        reuse = [v[i] and (i + 1 == len(v) or v[i + 1]) for i in range(len(v))]
+        return reuse if any(reuse) else None
+
+# file_index.get_carve_spans()
+    def get_carve_spans (self, digest):
+        '''
+        Returns the (start, end, offsets, sig_indexes) spans of the file
+        whose carve hits for the signatures with the given digest are known,
+        as carve_job() takes them.
+        '''
+        reuse = self.get_carve_reuse(digest)
+        if reuse is None: return []
+        digest, offsets, sig_indexes = self.carve
+        spans = []
+        i = 0
+        while i < self.region_count:
+            if not reuse[i]:
+                i += 1
+                continue
+            j = i
+            while j < self.region_count and reuse[j]: j += 1
+            start = i * self.region_size
+            end = min(self.key[0], j * self.region_size)
+            a = bisect.bisect_left(offsets, start)
+            b = bisect.bisect_left(offsets, end)
+            spans.append((start, end, offsets[a : b], sig_indexes[a : b]))
+            i = j
+        return spans
+
+# file_index.set_carve_hits()
+    def set_carve_hits (self, digest, offsets, sig_indexes):
+        self.carve_valid = [True] * self.region_count
+        self.carve = digest, array.array('Q', offsets), array.array('I', sig_indexes)
+
+# file_index.pack()
+    def pack (self):
+        '''
+        Returns the content of the index file; region_hashes must be set.
+        Carve hits get left out unless valid for the whole file.
+        '''
+        sections = []
+        size, mtime_ns, ino, dev = self.key
+        sections.append((b'FILE', FILE_SECTION.pack(size, mtime_ns, ino, dev,
+            self.region_size, self.region_count) + self.region_hashes))
+        stats = self.get_overview()
+        if stats is not None:
+            a = array.array('f')
+            for s in stats:
+                a.extend((math.nan, ) * 4 if s is None else (s.entropy, s.zero, s.text, s.high))
+            sections.append((b'OVER', OVERVIEW_SECTION.pack(
+                self.region_size, self.region_count) + pack_array(a)))
+        carve = self.carve
+        if carve is not None and all(self.carve_valid):
+            digest, offsets, sig_indexes = carve
+            sections.append((b'CARV', CARVE_SECTION.pack(digest, len(offsets))
+                + pack_array(offsets) + pack_array(sig_indexes)))
+        return MAGIC + b''.join(SECTION_HEADER.pack(tag, len(data)) + data
+                for tag, data in sections)
+
+# file_index.unpack()
+    def unpack (self, data):
+        '''
+        Loads the sections of an index file; returns the FILE section
+        fields (size, mtime_ns, inode, device, region_size, region_count)
+        and the region hashes stored. The region layout stored gets taken
+        if the file only grew (see follow_layout()); the results get loaded
+        only if their region size matches that of this index.
+        '''
+        if data[:len(MAGIC)] != MAGIC: raise error('bad magic')
+        o = len(MAGIC)
+        header = None
+        while o < len(data):
+            tag, n = SECTION_HEADER.unpack_from(data, o)
+            o += SECTION_HEADER.size
+            body = data[o : o + n]
+            o += n
+            if len(body) != n: raise error('truncated section {!r}'.format(tag))
+            if tag == b'FILE':
+                fields = FILE_SECTION.unpack_from(body)
+                header = fields, body[FILE_SECTION.size:]
+                self.follow_layout(fields[0], fields[4], fields[5])
+            elif header is None:
+                raise error('FILE section missing')
+            elif header[0][4] != self.region_size:
+                continue
+            elif tag == b'OVER':
+                a = unpack_array('f', body[OVERVIEW_SECTION.size:])
+                self.overview = [None if math.isnan(a[i]) else
+                        overview.bucket_stats(*a[i : i + 4]) for i in range(0, len(a), 4)]
+            elif tag == b'CARV':
+                digest, count = CARVE_SECTION.unpack_from(body)
+                p = CARVE_SECTION.size
+                self.carve = (digest, unpack_array('Q', body[p : p + count * 8]),
+                        unpack_array('I', body[p + count * 8:]))
+        if header is None: raise error('FILE section missing')
+        return header
+
+# class file_index - end
+
+#* load_index ***************************************************************
+def load_index (cache_dir, path, read, cancel = None):
+    '''
+    Returns the file_index of a local file: what got stored for it, with
+    all regions valid if the file kept its size, time stamp and inode, or
+    just the regions whose sample hashes still match if the size is the
+    same or the file grew (then only the regions that were complete before
+    are kept: the last one changed its extent). A file that grew so much
+    that its regions would be too many, or that shrank, starts over.
+    Returns None for files too small to be worth indexing.
+    '''
+    key = get_file_key(path)
+    if key[0] < MIN_FILE_SIZE: return None
+    index = file_index(path, key)
+    index_path = get_index_path(cache_dir, path)
+    try:
+        with open(index_path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return index
+    except OSError as e:
+        dmsg('cannot read index {!r}: {}', index_path, e)
+        return index
+    try:
+        fields, hashes = index.unpack(data)
+    except (error, struct.error, ValueError) as e:
+        dmsg('ignoring bad index {!r}: {}', index_path, e)
+        return file_index(path, key)
+    if fields[:4] == key:
+        index.region_hashes = hashes
+        index.set_valid([True] * index.region_count)
+    elif (fields[0] <= key[0] and fields[4] == index.region_size
+            and len(hashes) == fields[5] * HASH_SIZE):
+        index.region_hashes = hash_regions(read, key[0], index.region_size,
+                index.region_count, cancel)
+        if index.region_hashes is None: return file_index(path, key)
+        complete = fields[5] if fields[0] == key[0] else fields[0] // index.region_size
+        index.set_valid(i < complete and hashes[i * HASH_SIZE : (i + 1) * HASH_SIZE]
+                == index.region_hashes[i * HASH_SIZE : (i + 1) * HASH_SIZE]
+                for i in range(index.region_count))
+    dmsg('index {!r} for {!r}: {}/{} regions valid', index_path, path,
+            sum(index.overview_valid), index.region_count)
+    return index
+
+#* store_index **************************************************************
+def store_index (cache_dir, index, read, cancel = None):
+    '''
+    Writes an index file (through a temporary file, so that readers never
+    see it half written). Returns False if cancelled.
+    '''
+    if index.region_hashes is None:
+        hashes = hash_regions(read, index.key[0], index.region_size,
+                index.region_count, cancel)
+        if hashes is None: return False
+        index.region_hashes = hashes
+    data = index.pack()
+    os.makedirs(cache_dir, exist_ok = True)
+    fd, tmp_path = tempfile.mkstemp(dir = cache_dir, suffix = '.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, get_index_path(cache_dir, index.path))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+#* load_job *****************************************************************
+class load_job (jobs.job):
+    '''
+    Runs load_index() as a background job; the result is the file_index.
+    '''
+
+# load_job.__init__()
+    def __init__ (self, cache_dir, path, read):
+        jobs.job.__init__(self)
+        self.cache_dir = cache_dir
+        self.path = path
+        self.read = read
+
+# load_job.describe()
+    def describe (self):
+        return 'load index of {}'.format(self.path)
+
+# load_job.work()
+    def work (self):
+        return load_index(self.cache_dir, self.path, self.read, self.cancel_event)
+
+# class load_job - end
+
+#* store_job ****************************************************************
+class store_job (jobs.job):
+    '''
+    Runs store_index() as a background job.
+    '''
+
+# store_job.__init__()
+    def __init__ (self, cache_dir, index, read):
+        jobs.job.__init__(self)
+        self.cache_dir = cache_dir
+        self.index = index
+        self.read = read
+
+# store_job.describe()
+    def describe (self):
+        return 'store index of {}'.format(self.index.path)
+
+# store_job.work()
+    def work (self):
+        return store_index(self.cache_dir, self.index, self.read, self.cancel_event)
+
+# class store_job - end
+
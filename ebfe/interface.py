@@ -16,6 +16,29 @@ O = {
     'status_empty': lambda: None,
     'status_get': lambda: None,
     'status_is_empty': lambda: None,
+    # Shows the edit mode (text) on the right side of the status bar
+    'status_mode': lambda text: None,
     'hexedit_goto': lambda a: None,
+    # Returns the lines describing the state of the block cache
+    'cache_stats': lambda: [],
+    # Start a search / repeat the last one: (pattern_text, backward), (backward)
+    'search': lambda text, backward: None,
+    'search_next': lambda backward: None,
+    # Start a carving scan with the signatures from a file (None: built-in)
+    'carve': lambda path: None,
+    # Write the active stream to a file (None: the file being edited)
+    'save': lambda path: None,
+    # Map the active stream in the overview panel
+    'overview': lambda: None,
+    # Hash a range of the active stream: (algorithm, start, end)
+    'hash': lambda algo, start = 0, end = None: None,
+    # Returns the lines describing the background jobs
+    'jobs': lambda: [],
+    # Cancel a background job by id (None: the newest one, 'all': all)
+    'kill': lambda job_id: None,
+    # List the memory regions of the active stream (None) or go to one
+    'maps': lambda index: None,
+    # Follow the file of the active stream as it grows (None: toggle)
+    'follow': lambda enable: None,
 }
 
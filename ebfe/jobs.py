@@ -0,0 +1,314 @@
+# standard module imports
+import collections
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+
+# custom external module imports
+from zlx.io import dmsg
+
+#* format_size **************************************************************
+def format_size (n):
+    '''
+    Returns a short human readable size (1023B, 1.5KB, 12.0MB, ...).
+    '''
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if n < 1024 or unit == 'TB':
+            return '{}{}'.format(int(n), unit) if unit == 'B' else '{:.1f}{}'.format(n, unit)
+        n /= 1024
+
+#* format_duration **********************************************************
+def format_duration (seconds):
+    seconds = int(seconds)
+    if seconds < 60: return '{}s'.format(seconds)
+    if seconds < 3600: return '{}m{:02}s'.format(seconds // 60, seconds % 60)
+    return '{}h{:02}m'.format(seconds // 3600, seconds // 60 % 60)
+
+#* job **********************************************************************
+class job (object):
+    '''
+    Base for background jobs run by a scheduler.
+    Derive and implement work(), calling set_progress() as bytes get
+    processed and returning early when is_cancelled() turns True; whatever
+    it returns ends up in result and exceptions in exception.
+    on_done(job) gets called from the UI thread (see scheduler.poll()) once
+    the job ended, whether it completed, got cancelled or failed.
+    system jobs are those the app starts on its own (not on a command);
+    cancelling the newest job leaves them alone.
+    '''
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+
+    system = False
+
+# job.__init__()
+    def __init__ (self, total = 0, progress_interval = 0.1):
+        self.id = None
+        self.total = total
+        self.bytes_done = 0
+        self.progress_interval = progress_interval
+        self.state = job.PENDING
+        self.result = None
+        self.exception = None
+        self.done = False
+        self.cancel_event = threading.Event()
+        self.end_event = threading.Event()
+        self.start_time = None
+        self.end_time = None
+        self.last_notify = 0
+        self.notify = lambda: None
+        self.on_done = None
+        self.scheduler = None
+
+# job.describe()
+    def describe (self):
+        '''
+        Returns a short description of the job for the UI.
+        '''
+        return self.__class__.__name__
+
+# job.work()
+    def work (self):
+        raise RuntimeError('must be implemented in derived class')
+
+# job.get_process_pool()
+    def get_process_pool (self):
+        '''
+        Returns the process pool of the scheduler running the job or None
+        (run outside a scheduler).
+        '''
+        return self.scheduler.get_process_pool() if self.scheduler else None
+
+# job.run()
+    def run (self):
+        '''
+        Runs the job in the calling thread.
+        '''
+        self.state = job.RUNNING
+        self.start_time = time.monotonic()
+        try:
+            if not self.is_cancelled(): self.result = self.work()
+        except Exception as e:
+            dmsg('{} failed: {!r}', self.describe(), e)
+            self.exception = e
+        self.end_time = time.monotonic()
+        self.state = job.DONE
+        self.done = True
+        self.end_event.set()
+
+# job.wait()
+    def wait (self, timeout = None):
+        '''
+        Waits for the job to end; returns True if it did.
+        '''
+        return self.end_event.wait(timeout)
+
+# job.cancel()
+    def cancel (self):
+        self.cancel_event.set()
+
+# job.is_cancelled()
+    def is_cancelled (self):
+        return self.cancel_event.is_set()
+
+# job.set_progress()
+    def set_progress (self, bytes_done):
+        '''
+        Records progress and wakes up the UI at most every progress_interval
+        seconds.
+        '''
+        self.bytes_done = bytes_done
+        now = time.monotonic()
+        if now - self.last_notify >= self.progress_interval:
+            self.last_notify = now
+            self.notify()
+
+# job.get_progress()
+    def get_progress (self):
+        '''
+        Returns the completed fraction (0 to 1).
+        '''
+        return min(1.0, self.bytes_done / self.total) if self.total else 1.0
+
+# job.get_elapsed()
+    def get_elapsed (self):
+        if self.start_time is None: return 0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+# job.get_rate()
+    def get_rate (self):
+        '''
+        Returns the throughput in bytes per second.
+        '''
+        t = self.get_elapsed()
+        return self.bytes_done / t if t > 0 else 0
+
+# job.get_eta()
+    def get_eta (self):
+        '''
+        Returns the estimated seconds left or None if unknown.
+        '''
+        rate = self.get_rate()
+        if not rate or not self.total: return None
+        return max(0, self.total - self.bytes_done) / rate
+
+# job.format_status()
+    def format_status (self):
+        '''
+        Returns a line describing the state of the job.
+        '''
+        if self.state == job.PENDING:
+            return '{} (queued)'.format(self.describe())
+        s = '{}: {:.0f}%'.format(self.describe(), self.get_progress() * 100)
+        if self.bytes_done:
+            s += ', {}/s'.format(format_size(self.get_rate()))
+            eta = self.get_eta()
+            if eta is not None and not self.done: s += ', ETA ' + format_duration(eta)
+        if self.is_cancelled() and not self.done: s += ' (cancelling)'
+        return s
+
+# class job - end
+
+#* scheduler ****************************************************************
+class scheduler (object):
+    '''
+    Runs jobs in background threads, at most max_running at a time (the
+    rest wait in submission order) so that the UI thread keeps getting its
+    share of the interpreter.
+    Jobs hand CPU-bound parts of their work to a process pool of at most
+    max_processes workers (see job.get_process_pool()). The pool is shared,
+    so all those parts stay within that limit together.
+    notify() gets called from the job threads when the UI should look at
+    the jobs again (progress or completion); the UI then calls poll() from
+    its own thread, which delivers the ended jobs to their on_done().
+    '''
+
+# scheduler.__init__()
+    def __init__ (self, notify = None, max_running = 2, max_processes = None):
+        self.notify = notify or (lambda: None)
+        self.max_running = max(1, max_running)
+        self.max_processes = max(1, max_processes or os.cpu_count() or 1)
+        self.process_pool = None
+        self.lock = threading.Lock()
+        self.id_seq = itertools.count(1)
+        self.jobs = []
+        self.pending = collections.deque()
+        self.running = 0
+        self.ended = []
+        self.threads = {}
+
+# scheduler.submit()
+    def submit (self, j, on_done = None):
+        '''
+        Queues a job; returns it.
+        '''
+        j.id = next(self.id_seq)
+        j.notify = self.notify
+        j.scheduler = self
+        if on_done: j.on_done = on_done
+        with self.lock:
+            self.jobs.append(j)
+            self.pending.append(j)
+            self.start_pending_()
+        dmsg('job {} submitted: {}', j.id, j.describe())
+        return j
+
+# scheduler.start_pending_()
+    def start_pending_ (self):
+        # called with the lock held
+        while self.pending and self.running < self.max_running:
+            j = self.pending.popleft()
+            self.running += 1
+            t = threading.Thread(target = self.run_job_, args = (j, ), daemon = True)
+            self.threads[j.id] = t
+            t.start()
+
+# scheduler.run_job_()
+    def run_job_ (self, j):
+        j.run()
+        with self.lock:
+            self.running -= 1
+            self.ended.append(j)
+            del self.threads[j.id]
+            self.start_pending_()
+        self.notify()
+
+# scheduler.poll()
+    def poll (self):
+        '''
+        Delivers the jobs that ended since the last call to their on_done()
+        (in the calling thread); returns them.
+        '''
+        with self.lock:
+            ended = self.ended
+            self.ended = []
+            for j in ended: self.jobs.remove(j)
+        for j in ended:
+            dmsg('job {} ended: {}', j.id, j.format_status())
+            if j.on_done: j.on_done(j)
+        return ended
+
+# scheduler.get_jobs()
+    def get_jobs (self):
+        '''
+        Returns the jobs queued or running (or ended but not polled yet).
+        '''
+        with self.lock:
+            return list(self.jobs)
+
+# scheduler.get_process_pool()
+    def get_process_pool (self):
+        '''
+        Returns the process pool, starting it on first use. Processes get
+        spawned rather than forked as the editor runs threads and owns the
+        terminal.
+        '''
+        with self.lock:
+            if self.process_pool is None:
+                self.process_pool = concurrent.futures.ProcessPoolExecutor(
+                        max_workers = self.max_processes,
+                        mp_context = multiprocessing.get_context('spawn'))
+            return self.process_pool
+
+# scheduler.find()
+    def find (self, job_id):
+        for j in self.get_jobs():
+            if j.id == job_id: return j
+        return None
+
+# scheduler.cancel()
+    def cancel (self, job_id = None):
+        '''
+        Cancels the given job or, with no id, the most recently submitted
+        one still running or queued that is not a system job. Returns the
+        job cancelled or None.
+        '''
+        for j in reversed(self.get_jobs()):
+            if j.done or j.is_cancelled(): continue
+            if (job_id is None and not j.system) or j.id == job_id:
+                j.cancel()
+                return j
+        return None
+
+# scheduler.shutdown()
+    def shutdown (self, timeout = 5):
+        '''
+        Cancels all jobs and waits a while for the running ones to stop;
+        the process pool gets dropped without waiting.
+        '''
+        for j in self.get_jobs(): j.cancel()
+        with self.lock:
+            threads = list(self.threads.values())
+            pool, self.process_pool = self.process_pool, None
+        if pool is not None: pool.shutdown(wait = False, cancel_futures = True)
+        deadline = time.monotonic() + timeout
+        for t in threads:
+            t.join(max(0, deadline - time.monotonic()))
+
+# class scheduler - end
+
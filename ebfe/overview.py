@@ -0,0 +1,217 @@
+# standard module imports
+import collections
+import math
+
+# custom external module imports
+import zlx.record
+from zlx.io import dmsg
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# internal module imports
+import ebfe.jobs as jobs
+
+# size of the chunks read while mapping
+CHUNK_SIZE = 4 << 20
+
+# the file gets split in at most this many buckets (a power of two)...
+MAX_BUCKETS = 1 << 12
+
+# ... of at least this many bytes
+MIN_BUCKET_SIZE = 1 << 16
+
+# without numpy histograms are taken from the first SAMPLE_SIZE bytes of
+# every SAMPLE_STRIDE bytes (whole runs, so that periodic data does not
+# alias)
+SAMPLE_SIZE = 4096
+SAMPLE_STRIDE = 16 * SAMPLE_SIZE
+
+# bytes counted as text
+TEXT_BYTES = frozenset(range(0x20, 0x7F)) | frozenset(b'\t\n\r')
+
+#* bucket_stats *************************************************************
+bucket_stats = zlx.record.make('overview.bucket_stats', 'entropy zero text high')
+
+#* add_histogram ************************************************************
+def add_histogram (hist, data):
+    '''
+    Adds the byte counts of data to hist (a list of 256 counts).
+    With numpy the bytes are counted in pairs (65536 bins), which takes
+    half the passes of counting them one by one; without it only a sample
+    of the data gets counted, which is enough for the ratios computed
+    from the histogram.
+    '''
+    if numpy is not None:
+        h = numpy.bincount(numpy.frombuffer(data, numpy.uint16, len(data) >> 1),
+                minlength = 1 << 16).reshape(256, 256)
+        h = h.sum(0) + h.sum(1)
+        if len(data) & 1: h[data[-1]] += 1
+        for b, n in enumerate(h.tolist()): hist[b] += n
+    else:
+        c = collections.Counter()
+        mv = memoryview(data)
+        for o in range(0, len(data), SAMPLE_STRIDE): c.update(mv[o : o + SAMPLE_SIZE])
+        for b, n in c.items(): hist[b] += n
+
+#* add_zeros ****************************************************************
+def add_zeros (hist, n):
+    '''
+    Counts n zero bytes (from holes, not read) in hist, in the proportion
+    add_histogram() would.
+    '''
+    hist[0] += n if numpy is not None else n * SAMPLE_SIZE // SAMPLE_STRIDE
+
+#* get_stats ****************************************************************
+def get_stats (hist):
+    '''
+    Returns the bucket_stats of a histogram: Shannon entropy in bits per
+    byte (0 to 8) and the ratios of zero, text and high (0x80-0xFF) bytes.
+    '''
+    total = sum(hist)
+    if not total: return bucket_stats(0.0, 0.0, 0.0, 0.0)
+    entropy = math.log2(total) - sum(n * math.log2(n) for n in hist if n) / total
+    return bucket_stats(
+            max(0.0, entropy),
+            hist[0] / total,
+            sum(hist[b] for b in TEXT_BYTES) / total,
+            sum(hist[0x80:]) / total)
+
+#* merge_stats **************************************************************
+def merge_stats (stats):
+    '''
+    Returns the average of a list of bucket_stats.
+    '''
+    n = len(stats)
+    return bucket_stats(
+            sum(s.entropy for s in stats) / n,
+            sum(s.zero for s in stats) / n,
+            sum(s.text for s in stats) / n,
+            sum(s.high for s in stats) / n)
+
+#* bit_reverse **************************************************************
+def bit_reverse (value, bits):
+    r = 0
+    for i in range(bits):
+        r = (r << 1) | (value & 1)
+        value >>= 1
+    return r
+
+#* get_bucket_layout ********************************************************
+def get_bucket_layout (size, max_buckets = MAX_BUCKETS, min_bucket_size = MIN_BUCKET_SIZE):
+    '''
+    Returns (bucket_count, bucket_size) for a stream of the given size;
+    the count is a power of two.
+    '''
+    count = 1
+    while count * 2 <= min(max_buckets, size // min_bucket_size): count *= 2
+    return count, max(1, -(-size // count))
+
+#* get_growth_layout ********************************************************
+def get_growth_layout (job, end, max_buckets = MAX_BUCKETS):
+    '''
+    Returns (known, bucket_size) for mapping [0, end) after the stream
+    mapped by job grew: the buckets complete before keep their stats as
+    long as their size makes at most twice max_buckets buckets (which
+    lets the count double before a new layout is needed, so mapping a
+    growing stream reads each byte about twice at most). Returns
+    (None, None) if a new layout is needed.
+    '''
+    bs = job.bucket_size
+    if end <= job.end or -(-end // bs) > 2 * max_buckets: return None, None
+    complete = job.end // bs
+    known = job.stats[:complete]
+    return known + [None] * (-(-end // bs) - len(known)), bs
+
+#* overview_job *************************************************************
+class overview_job (jobs.job):
+    '''
+    Computes the bucket_stats of the buckets of [0, end) as a background
+    job. Buckets are processed in bit-reversed index order: after each
+    power of two of them the ones done are evenly spread over the stream,
+    so a coarse map is available early and gets refined as the job runs.
+    stats has one entry per bucket, None until it gets computed; it can
+    start with the stats known already (from the index cache).
+    The holes in the sparse_map sparse count as zeros without being read.
+    bucket_size replaces the default layout (see get_growth_layout()); the
+    bucket count is then not a power of two and the bit-reversed indexes
+    past it get skipped.
+    '''
+
+# overview_job.__init__()
+    def __init__ (self, read, end, chunk_size = CHUNK_SIZE, known = None, sparse = None,
+            bucket_size = None):
+        jobs.job.__init__(self, total = end)
+        self.read = read
+        self.end = end
+        self.chunk_size = chunk_size
+        self.sparse = sparse
+        if bucket_size is None:
+            self.bucket_count, self.bucket_size = get_bucket_layout(end)
+        else:
+            self.bucket_count, self.bucket_size = max(1, -(-end // bucket_size)), bucket_size
+        self.bits = (self.bucket_count - 1).bit_length()
+        if known is not None and len(known) == self.bucket_count:
+            self.stats = list(known)
+        else:
+            self.stats = [None] * self.bucket_count
+        self.done_count = 0
+
+# overview_job.describe()
+    def describe (self):
+        return 'overview ({}/{} buckets)'.format(self.done_count, self.bucket_count)
+
+# overview_job.get_bucket_offset()
+    def get_bucket_offset (self, index):
+        return index * self.bucket_size
+
+# overview_job.get_range_stats()
+    def get_range_stats (self, first, last):
+        '''
+        Returns (stats, exact) for the buckets [first, last): the average of
+        those computed already or, when none is, the stats of the closest
+        computed bucket before them (exact is then False). Returns
+        (None, False) before the first bucket is done.
+        '''
+        l = [s for s in self.stats[first:last] if s is not None]
+        if l: return merge_stats(l), True
+        for i in range(first - 1, -1, -1):
+            if self.stats[i] is not None: return self.stats[i], False
+        return None, False
+
+# overview_job.work()
+    def work (self):
+        done = 0
+        for i in range(1 << self.bits):
+            index = bit_reverse(i, self.bits)
+            if index >= self.bucket_count: continue
+            o = self.get_bucket_offset(index)
+            end = min(self.end, o + self.bucket_size)
+            if self.stats[index] is not None:
+                done += max(0, end - o)
+                self.done_count += 1
+                continue
+            hist = [0] * 256
+            ranges = [(o, end)]
+            if self.sparse:
+                ranges = self.sparse.get_data_ranges(o, end)
+                holes = end - o - sum(e - s for s, e in ranges)
+                add_zeros(hist, holes)
+                done += holes
+            for o, end in ranges:
+                while o < end:
+                    if self.is_cancelled(): return
+                    data = self.read(o, min(self.chunk_size, end - o))
+                    if not data: break
+                    add_histogram(hist, data)
+                    o += len(data)
+                    done += len(data)
+                    self.set_progress(done)
+            self.stats[index] = get_stats(hist)
+            self.done_count += 1
+        dmsg('overview: {} buckets of 0x{:X} bytes', self.bucket_count, self.bucket_size)
+
+# class overview_job - end
+
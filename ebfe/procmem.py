@@ -0,0 +1,249 @@
+# standard module imports
+import bisect
+import os
+import threading
+import time
+
+# custom external module imports
+import zlx.io
+import zlx.record
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.streams as streams
+
+SCHEME = 'proc'
+
+# how long memory read from the process is shown before reading it again
+DEFAULT_TTL = 1.0
+
+# reads are done in aligned batches of this size, clipped to their region
+BATCH_SHIFT = 16
+BATCH_SIZE = 1 << BATCH_SHIFT
+
+# batches kept at most (the oldest half gets dropped past this)
+MAX_BATCHES = 256
+
+# regions that /proc/PID/mem cannot read, far above the rest of the
+# address space
+SKIPPED_REGIONS = frozenset(('[vsyscall]', ))
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* region *******************************************************************
+region = zlx.record.make('procmem.region', 'start end perms offset path')
+
+#* parse_maps ***************************************************************
+def parse_maps (text):
+    '''
+    Returns the regions listed in the content of /proc/PID/maps, in
+    address order.
+    '''
+    regions = []
+    for line in text.splitlines():
+        parts = line.split(None, 5)
+        if len(parts) < 5: continue
+        start, end = (int(x, 16) for x in parts[0].split('-'))
+        path = parts[5].strip() if len(parts) > 5 else ''
+        if path in SKIPPED_REGIONS: continue
+        regions.append(region(start, end, parts[1], int(parts[2], 16), path))
+    regions.sort(key = lambda r: r.start)
+    return regions
+
+#* load_regions *************************************************************
+def load_regions (pid):
+    try:
+        with open('/proc/{}/maps'.format(pid), 'r') as f:
+            return parse_maps(f.read())
+    except OSError as e:
+        raise error('cannot read the memory map of process {}: {}'.format(pid, e))
+
+#* process_memory ***********************************************************
+class process_memory (streams.block_source):
+    '''
+    Stream source for the memory of a live process: offsets are virtual
+    addresses, read from /proc/PID/mem. The unmapped ranges between the
+    regions of /proc/PID/maps are holes (get_sparse_map() lists the
+    regions, which also makes ] / [ jump between them and keeps scans off
+    the holes); so are regions the kernel refuses to read.
+    Data is read in batches that do not cross regions and is kept for ttl
+    seconds only, as the process keeps changing it; reset_updated() asks
+    for a refresh once that long passed, so the view follows the process.
+    The region list is read once, when opening.
+    '''
+
+# process_memory.__init__()
+    def __init__ (self, pid, ttl = DEFAULT_TTL):
+        self.pid = pid
+        self.ttl = ttl
+        self.regions = load_regions(pid)
+        if not self.regions: raise error('process {} has no memory regions'.format(pid))
+        self.starts = [r.start for r in self.regions]
+        self.size = self.regions[-1].end
+        self.sparse = streams.sparse_map([(r.start, r.end) for r in self.regions], self.size)
+        try:
+            self.fd = os.open('/proc/{}/mem'.format(pid), os.O_RDONLY)
+        except OSError as e:
+            raise error('cannot open the memory of process {}: {}'.format(pid, e))
+        self.lock = threading.Lock()
+        # batch index -> (load time, data, version); data is None for
+        # batches that cannot be read
+        self.batches = {}
+        self.unreadable = set()
+        self.data_version = 0
+        self.last_refresh = time.monotonic()
+
+# process_memory.__repr__()
+    def __repr__ (self):
+        return 'process_memory(pid={}, {} regions)'.format(self.pid, len(self.regions))
+
+# process_memory.get_regions()
+    def get_regions (self):
+        return self.regions
+
+# process_memory.find_region()
+    def find_region (self, offset):
+        '''
+        Returns the index of the region holding offset or None.
+        '''
+        i = bisect.bisect_right(self.starts, offset) - 1
+        if i >= 0 and offset < self.regions[i].end: return i
+        return None
+
+# process_memory.read_region()
+    def read_region (self, i, offset, size):
+        '''
+        Reads from region i; returns None if the kernel refuses to (guard
+        pages, device mappings, process gone).
+        '''
+        if i in self.unreadable: return None
+        try:
+            return os.pread(self.fd, size, offset)
+        except OSError as e:
+            dmsg('cannot read region {} of process {} at 0x{:X}: {}', i, self.pid, offset, e)
+            self.unreadable.add(i)
+            return None
+
+# process_memory.get_batch()
+    def get_batch (self, index, i):
+        '''
+        Returns (start, data, version) for a batch of region i, reading it
+        again if older than ttl.
+        '''
+        r = self.regions[i]
+        start = max(r.start, index << BATCH_SHIFT)
+        now = time.monotonic()
+        key = (index, i)
+        with self.lock:
+            b = self.batches.get(key)
+        if b is not None and now - b[0] < self.ttl: return start, b[1], b[2]
+        data = self.read_region(i, start, min(r.end, (index + 1) << BATCH_SHIFT) - start)
+        with self.lock:
+            self.data_version += 1
+            version = self.data_version
+            if len(self.batches) >= MAX_BATCHES:
+                for k in list(self.batches)[:MAX_BATCHES // 2]: del self.batches[k]
+            self.batches.pop(key, None)
+            self.batches[key] = (now, data, version)
+        return start, data, version
+
+# process_memory.get_part()
+    def get_part (self, offset, size):
+        if size < 0:
+            raise ValueError('negative size: {}'.format(size))
+        if offset < 0:
+            return zlx.io.hole_block(offset, min(size, -offset))
+        if offset >= self.size:
+            return zlx.io.hole_block(offset, 0)
+        i = self.find_region(offset)
+        if i is None:
+            is_data, run_end = self.sparse.find(offset)
+            return zlx.io.hole_block(offset, min(size, run_end - offset))
+        start, data, version = self.get_batch(offset >> BATCH_SHIFT, i)
+        o = offset - start
+        if data is None or o >= len(data):
+            end = min(self.regions[i].end, ((offset >> BATCH_SHIFT) + 1) << BATCH_SHIFT)
+            return zlx.io.hole_block(offset, min(size, end - offset))
+        return zlx.io.cached_data_block(offset, memoryview(data)[o : o + size])
+
+# process_memory.get_known_end_offset()
+    def get_known_end_offset (self):
+        return self.size
+
+# process_memory.get_sparse_map()
+    def get_sparse_map (self):
+        return self.sparse
+
+# process_memory.get_data_version()
+    def get_data_version (self, offset, size):
+        '''
+        Returns the newest version of the batches in the range, reloading
+        those past their ttl so that rows rendered from them get redone.
+        '''
+        version = 0
+        end = min(self.size, offset + size)
+        offset = max(0, offset)
+        while offset < end:
+            i = self.find_region(offset)
+            if i is None:
+                is_data, offset = self.sparse.find(offset)
+                continue
+            start, data, v = self.get_batch(offset >> BATCH_SHIFT, i)
+            version = max(version, v)
+            offset = min(self.regions[i].end, ((offset >> BATCH_SHIFT) + 1) << BATCH_SHIFT)
+        return version
+
+# process_memory.read()
+    def read (self, offset, size):
+        '''
+        Reads straight from the process (nothing gets cached), a region at a
+        time; holes and unreadable regions read as zeros.
+        '''
+        offset = max(0, offset)
+        end = min(self.size, offset + size)
+        out = bytearray()
+        while offset < end:
+            i = self.find_region(offset)
+            if i is None:
+                is_data, run_end = self.sparse.find(offset)
+                run_end = min(end, run_end)
+                out += bytes(run_end - offset)
+                offset = run_end
+                continue
+            run_end = min(end, self.regions[i].end)
+            data = self.read_region(i, offset, run_end - offset)
+            if not data: data = bytes(run_end - offset)
+            out += data
+            offset += len(data)
+        return out
+
+# process_memory.get_refresh_interval()
+    def get_refresh_interval (self):
+        '''
+        Returns how often the view should check reset_updated() (the ttl);
+        nothing else wakes up an idle view.
+        '''
+        return self.ttl
+
+# process_memory.reset_updated()
+    def reset_updated (self):
+        now = time.monotonic()
+        if now - self.last_refresh < self.ttl: return False
+        self.last_refresh = now
+        return True
+
+# class process_memory - end
+
+#* open_process *************************************************************
+def open_process (res, ttl = DEFAULT_TTL):
+    '''
+    Returns the process_memory for the PID in a proc:// uri.
+    '''
+    try:
+        pid = int(res)
+    except ValueError:
+        raise error('expecting {}://PID, got {!r}'.format(SCHEME, res))
+    return process_memory(pid, ttl)
+
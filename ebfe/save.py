@@ -0,0 +1,225 @@
+# standard module imports
+import errno
+import os
+import shutil
+
+# internal module imports
+import ebfe.edit_buffer as edit_buffer
+import ebfe.jobs as jobs
+
+# largest span handed to a single copy / write call
+COPY_CHUNK_SIZE = 16 << 20
+
+# errors meaning copy_file_range() / sendfile() cannot be used for a pair of
+# files (other file systems, old kernels, unsupported file types)
+COPY_FALLBACK_ERRNOS = frozenset((errno.ENOSYS, errno.EXDEV, errno.EINVAL,
+    errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSUP))
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* get_source_path **********************************************************
+def get_source_path (table):
+    '''
+    Returns the path of the local file under a piece_table or None.
+    '''
+    src = table.source
+    return src.get_local_path() if hasattr(src, 'get_local_path') else None
+
+#* is_same_file *************************************************************
+def is_same_file (a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+#* get_layout ***************************************************************
+def get_layout (table):
+    '''
+    Returns the (offset, src, src_offset, size) parts of the whole content
+    of a piece_table.
+    '''
+    return table.map_range(0, table.get_known_end_offset())
+
+#* is_overwrite_only ********************************************************
+def is_overwrite_only (table, parts):
+    '''
+    Returns True if the content has the size of the original and every
+    original byte kept its offset, so that writing the added parts over
+    the original gives the new content.
+    '''
+    if parts and parts[-1][0] + parts[-1][3] != table.source.get_known_end_offset():
+        return False
+    for o, src, so, n in parts:
+        if src == edit_buffer.ORIGINAL and so != o: return False
+    return True
+
+#* get_dirty_ranges *********************************************************
+def get_dirty_ranges (parts):
+    '''
+    Groups the added parts of a layout that follow each other in the file.
+    Returns a list of (offset, [(added_offset, size), ...]).
+    '''
+    ranges = []
+    end = None
+    for o, src, so, n in parts:
+        if src != edit_buffer.ADDED: continue
+        if o == end: ranges[-1][1].append((so, n))
+        else: ranges.append((o, [(so, n)]))
+        end = o + n
+    return ranges
+
+#* pwrite_all ***************************************************************
+def pwrite_all (fd, data, offset):
+    data = memoryview(data)
+    while data:
+        n = os.pwrite(fd, data, offset)
+        data = data[n:]
+        offset += n
+
+#* create_temp_file *********************************************************
+def create_temp_file (path):
+    '''
+    Creates a new, uniquely named file next to path for writing what will
+    replace it. Unlike mkstemp() it asks for mode 0o666 and lets the
+    kernel apply the umask, as for any new file (reading the umask would
+    change it for a moment under the other threads).
+    Returns (fd, temp_path).
+    '''
+    dir_name, base_name = os.path.split(os.path.abspath(path))
+    while True:
+        tmp_path = os.path.join(dir_name, '.{}.{}.tmp'.format(base_name, os.urandom(6).hex()))
+        try:
+            return os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, 'O_CLOEXEC', 0), 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+#* copy_span ****************************************************************
+def copy_span (src_fd, src_offset, dst_fd, dst_offset, size):
+    '''
+    Copies size bytes between two files, letting the kernel do it (and
+    share extents where the file system can) with copy_file_range() and
+    falling back to sendfile() or plain reads and writes.
+    Returns the number of bytes copied in this call (at most
+    COPY_CHUNK_SIZE), 0 at the end of the source.
+    '''
+    size = min(size, COPY_CHUNK_SIZE)
+    if hasattr(os, 'copy_file_range'):
+        try:
+            return os.copy_file_range(src_fd, dst_fd, size, src_offset, dst_offset)
+        except OSError as e:
+            if e.errno not in COPY_FALLBACK_ERRNOS: raise
+    if hasattr(os, 'sendfile'):
+        try:
+            os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+            return os.sendfile(dst_fd, src_fd, src_offset, size)
+        except OSError as e:
+            if e.errno not in COPY_FALLBACK_ERRNOS: raise
+    data = os.pread(src_fd, size, src_offset)
+    pwrite_all(dst_fd, data, dst_offset)
+    return len(data)
+
+#* save_job *****************************************************************
+class save_job (jobs.job):
+    '''
+    Writes the content of a piece_table to path as a background job.
+    When path is the original file and only overwrites happened the
+    changed ranges are written in place; otherwise the file is rebuilt in a
+    temporary file next to it (unchanged spans copied by the kernel) which
+    then atomically replaces it.
+    The content saved is the state of the table when the job got created.
+    '''
+
+# save_job.__init__()
+    def __init__ (self, table, path):
+        jobs.job.__init__(self)
+        self.table = table
+        self.path = path
+        self.table_state = table.state
+        layout = get_layout(table)
+        self.source_path = get_source_path(table)
+        self.in_place = (self.source_path is not None
+                and is_same_file(path, self.source_path)
+                and is_overwrite_only(table, layout))
+        if self.in_place:
+            self.parts = get_dirty_ranges(layout)
+            self.total = sum(n for o, pl in self.parts for so, n in pl)
+        else:
+            self.parts = layout
+            self.total = sum(n for o, src, so, n in layout)
+
+# save_job.describe()
+    def describe (self):
+        return 'save {}{}'.format(self.path, ' (in place)' if self.in_place else '')
+
+# save_job.add_progress()
+    def add_progress (self, n):
+        self.set_progress(self.bytes_done + n)
+
+# save_job.write_in_place()
+    def write_in_place (self):
+        added = self.table.added
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+            for o, pl in self.parts:
+                data = b''.join(added[so : so + n] for so, n in pl)
+                pwrite_all(fd, data, o)
+                self.add_progress(len(data))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+# save_job.copy_original()
+    def copy_original (self, src_fd, src_offset, dst_fd, dst_offset, size):
+        while size:
+            if self.is_cancelled(): return
+            if src_fd is not None:
+                n = copy_span(src_fd, src_offset, dst_fd, dst_offset, size)
+            else:
+                data = self.table.source.read(src_offset, min(size, COPY_CHUNK_SIZE))
+                pwrite_all(dst_fd, data, dst_offset)
+                n = len(data)
+            if n == 0:
+                raise error('original ended at 0x{:X}, 0x{:X} bytes short'.format(src_offset, size))
+            src_offset += n
+            dst_offset += n
+            size -= n
+            self.add_progress(n)
+
+# save_job.rebuild()
+    def rebuild (self):
+        fd, tmp_path = create_temp_file(self.path)
+        src_fd = os.open(self.source_path, os.O_RDONLY) if self.source_path else None
+        try:
+            added = self.table.added
+            for o, src, so, n in self.parts:
+                if self.is_cancelled(): break
+                if src == edit_buffer.ADDED:
+                    pwrite_all(fd, added[so : so + n], o)
+                    self.add_progress(n)
+                else:
+                    self.copy_original(src_fd, so, fd, o, n)
+            if self.is_cancelled():
+                os.unlink(tmp_path)
+                return
+            os.ftruncate(fd, self.total)
+            os.fsync(fd)
+            if os.path.exists(self.path): shutil.copymode(self.path, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            os.close(fd)
+            if src_fd is not None: os.close(src_fd)
+
+# save_job.work()
+    def work (self):
+        # writes in place are short and run to the end once started;
+        # a rebuild stops on cancel leaving the file untouched
+        if self.in_place: self.write_in_place()
+        else: self.rebuild()
+
+# class save_job - end
+
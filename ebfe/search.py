@@ -0,0 +1,296 @@
+# standard module imports
+import collections
+import concurrent.futures
+import mmap
+import os
+import re
+
+# custom external module imports
+import zlx.record
+
+# internal module imports
+import ebfe.jobs as jobs
+
+# size of the chunks read while searching
+CHUNK_SIZE = 4 << 20
+
+# chunk overlap for regular expressions (their match length is unknown)
+REGEX_OVERLAP = 4096
+
+# size of the parts of a file scanned by each process of the pool
+SHARD_SIZE = 64 << 20
+
+HEX_PATTERN_RE = re.compile(r'^(?:[0-9A-Fa-f]{2}|\?\?)(?:\s*(?:[0-9A-Fa-f]{2}|\?\?))*$')
+
+#* error ********************************************************************
+class error (RuntimeError):
+    pass
+
+#* pattern ******************************************************************
+pattern = zlx.record.make('search.pattern', 'text regex max_len')
+
+#* split_pattern ************************************************************
+def split_pattern (text):
+    '''
+    Returns (kind, body) for a pattern text; see compile_pattern().
+    '''
+    if len(text) > 2 and text[1] == ':' and text[0] in 'xaur':
+        return text[0], text[2:]
+    if HEX_PATTERN_RE.match(text.strip()):
+        return 'x', text
+    return 'a', text
+
+#* encode_literal ***********************************************************
+def encode_literal (kind, body):
+    '''
+    Returns the bytes of an ASCII (a) or UTF-16LE (u) text pattern.
+    '''
+    try:
+        return body.encode('utf-16-le' if kind == 'u' else 'ascii')
+    except UnicodeEncodeError as e:
+        raise error('cannot encode pattern: {}'.format(e))
+
+#* pattern_bytes ************************************************************
+def pattern_bytes (text):
+    '''
+    Returns the bytes matched by a pattern without wildcards (hex, ASCII
+    or UTF-16 text); raises error for anything else.
+    '''
+    kind, body = split_pattern(text)
+    if not body:
+        raise error('empty pattern')
+    if kind == 'r':
+        raise error('regular expressions not allowed here: {!r}'.format(text))
+    if kind == 'x':
+        body = ''.join(body.split())
+        if '?' in body:
+            raise error('wildcards not allowed here: {!r}'.format(text))
+        try:
+            return bytes.fromhex(body)
+        except ValueError:
+            raise error('bad hex pattern: {!r}'.format(body))
+    return encode_literal(kind, body)
+
+#* compile_pattern **********************************************************
+def compile_pattern (text):
+    '''
+    Compiles a search pattern:
+        x:DE AD ?? EF   hex bytes, ?? matches any byte
+        a:text          ASCII text
+        u:text          UTF-16LE text
+        r:regex         Python regular expression over bytes
+    Without a prefix hex is assumed if the text looks like hex bytes,
+    ASCII otherwise.
+    '''
+    kind, body = split_pattern(text)
+    if not body:
+        raise error('empty pattern')
+
+    if kind == 'x':
+        body = ''.join(body.split())
+        if len(body) & 1 or not HEX_PATTERN_RE.match(body):
+            raise error('bad hex pattern: {!r}'.format(body))
+        parts = []
+        for i in range(0, len(body), 2):
+            h = body[i : i + 2]
+            parts.append(b'.' if h == '??' else re.escape(bytes.fromhex(h)))
+        return pattern(text, re.compile(b''.join(parts), re.DOTALL), len(body) // 2)
+
+    if kind == 'r':
+        try:
+            rx = re.compile(body.encode('latin1'), re.DOTALL)
+        except (re.error, UnicodeEncodeError) as e:
+            raise error('bad regex: {}'.format(e))
+        return pattern(text, rx, None)
+
+    data = encode_literal(kind, body)
+    return pattern(text, re.compile(re.escape(data), re.DOTALL), len(data))
+
+#* get_overlap **************************************************************
+def get_overlap (pat):
+    '''
+    Returns how many bytes past its end a chunk must extend so that no
+    match starting inside it gets cut.
+    '''
+    return (pat.max_len or REGEX_OVERLAP) - 1
+
+#* can_match_zeros **********************************************************
+def can_match_zeros (pat):
+    '''
+    Returns True if the pattern matches in a run of zero bytes (then the
+    holes of sparse files cannot be skipped when searching).
+    '''
+    return pat.regex.search(bytes(pat.max_len or REGEX_OVERLAP)) is not None
+
+#* make_overlapping_regex ***************************************************
+def make_overlapping_regex (rx):
+    '''
+    Returns a regex matching (empty) at each start of a match of rx,
+    including overlapping ones; needed to find the last match in a chunk.
+    '''
+    return re.compile(b'(?=' + rx.pattern + b')', rx.flags)
+
+#* find *********************************************************************
+def find (read, pat, start, end, backward = False,
+        chunk_size = CHUNK_SIZE, progress = None, cancel = None):
+    '''
+    Searches in the stream read through read(offset, size).
+    Forward searches return the first match starting in [start, end);
+    backward searches the last match starting in [start, end).
+    progress(bytes_done) gets called after each chunk and the search stops
+    returning None if cancel (a threading.Event) gets set.
+    Returns the offset of the match or None.
+    '''
+    overlap = get_overlap(pat)
+    rx = pat.regex
+    rx_all = make_overlapping_regex(rx)
+    done = 0
+    if not backward:
+        o = start
+        while o < end:
+            if cancel and cancel.is_set(): return None
+            n = min(chunk_size, end - o)
+            data = read(o, n + overlap)
+            m = rx.search(data, 0, n + overlap)
+            if m and m.start() < n: return o + m.start()
+            if len(data) < n: break
+            o += n
+            done += n
+            if progress: progress(done)
+    else:
+        e = end
+        while e > start:
+            if cancel and cancel.is_set(): return None
+            o = max(start, e - chunk_size)
+            n = e - o
+            data = read(o, n + overlap)
+            last = None
+            for m in rx_all.finditer(data, 0, len(data)):
+                if m.start() >= n: break
+                last = m.start()
+            if last is not None: return o + last
+            e = o
+            done += n
+            if progress: progress(done)
+    return None
+
+#* find_in_shard ************************************************************
+def find_in_shard (path, regex_src, regex_flags, offset, size, overlap, backward):
+    '''
+    Runs in a pool process: maps the file and returns the offset of the
+    first (or last if backward) match starting in [offset, offset + size)
+    or None.
+    '''
+    rx = re.compile(regex_src, regex_flags)
+    with open(path, 'rb') as f:
+        end = min(os.fstat(f.fileno()).st_size, offset + size + overlap)
+        if end <= offset: return None
+        with mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+            if not backward:
+                m = rx.search(mm, offset, end)
+                if m and m.start() < offset + size: return m.start()
+                return None
+            last = None
+            for m in make_overlapping_regex(rx).finditer(mm, offset, end):
+                if m.start() >= offset + size: break
+                last = m.start()
+            return last
+
+#* parallel_find ************************************************************
+def parallel_find (pool, path, pat, start, end, backward = False, workers = 2,
+        shard_size = SHARD_SIZE, progress = None, cancel = None):
+    '''
+    Same as find() for a local file, with the range split in shards
+    scanned by a pool of processes (a concurrent.futures executor with
+    workers processes). Shards are handed out in search order, a few per
+    process at a time, and the results are merged in that order: the
+    search ends as soon as a shard has a match and all shards before it
+    came back empty.
+    '''
+    overlap = get_overlap(pat)
+    if backward:
+        shards = [(max(start, e - shard_size), e) for e in range(end, start, -shard_size)]
+    else:
+        shards = [(o, min(end, o + shard_size)) for o in range(start, end, shard_size)]
+    shards = [(o, e - o) for o, e in shards]
+    pending = collections.deque()
+    next_shard = 0
+    done = 0
+    try:
+        while next_shard < len(shards) or pending:
+            if cancel and cancel.is_set(): return None
+            while next_shard < len(shards) and len(pending) < 2 * workers:
+                o, n = shards[next_shard]
+                pending.append((n, pool.submit(find_in_shard, path,
+                        pat.regex.pattern, pat.regex.flags, o, n, overlap, backward)))
+                next_shard += 1
+            n, fut = pending[0]
+            try:
+                result = fut.result(timeout = 0.1)
+            except concurrent.futures.TimeoutError:
+                continue
+            pending.popleft()
+            if result is not None: return result
+            done += n
+            if progress: progress(done)
+        return None
+    finally:
+        for n, fut in pending: fut.cancel()
+
+#* search_job ***************************************************************
+class search_job (jobs.job):
+    '''
+    Runs find() as a background job; with the path of a local file and
+    more than one worker, large ranges go to parallel_find() in the process
+    pool of the scheduler instead.
+    Only the data extents of a sparse file get searched (unless the
+    pattern matches zeros), so searching costs time proportional to the
+    data, not to the size of the file.
+    The result is the offset of the match or None.
+    '''
+
+# search_job.__init__()
+    def __init__ (self, read, pat, start, end, backward = False,
+            path = None, workers = 1, sparse = None):
+        if sparse and not can_match_zeros(pat):
+            self.ranges = sparse.get_data_ranges(start, end, get_overlap(pat))
+        else:
+            self.ranges = [(start, end)] if start < end else []
+        jobs.job.__init__(self, total = sum(e - s for s, e in self.ranges))
+        self.read = read
+        self.path = path
+        self.workers = workers
+        self.pattern = pat
+        self.start = start
+        self.end = end
+        self.backward = backward
+
+# search_job.describe()
+    def describe (self):
+        return 'search {}{}'.format('?' if self.backward else '/', self.pattern.text)
+
+# search_job.find_range()
+    def find_range (self, start, end, progress):
+        pool = self.get_process_pool() if self.path and self.workers > 1 and end - start > SHARD_SIZE else None
+        if pool is not None:
+            return parallel_find(pool, self.path, self.pattern, start, end,
+                    backward = self.backward,
+                    workers = self.workers,
+                    progress = progress,
+                    cancel = self.cancel_event)
+        return find(self.read, self.pattern, start, end,
+                backward = self.backward,
+                progress = progress,
+                cancel = self.cancel_event)
+
+# search_job.work()
+    def work (self):
+        done = 0
+        for start, end in (self.ranges[::-1] if self.backward else self.ranges):
+            r = self.find_range(start, end, lambda n: self.set_progress(done + n))
+            if r is not None or self.is_cancelled(): return r
+            done += end - start
+        return None
+
+# class search_job - end
+
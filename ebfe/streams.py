@@ -0,0 +1,823 @@
+# standard module imports
+import bisect
+import collections
+import errno
+import mmap
+import os
+import stat
+import threading
+import time
+
+# custom external module imports
+import zlx.int
+import zlx.io
+from zlx.io import dmsg
+
+# granularity used to stamp data versions
+VERSION_PAGE_SHIFT = 12
+
+#* versioned_stream_cache ***************************************************
+class versioned_stream_cache (zlx.io.stream_cache):
+    '''
+    Stream cache that stamps the pages touched by each load with a new
+    version number, so that users can tell whether the content of a range
+    changed since they last looked at it.
+    '''
+
+# versioned_stream_cache.__init__()
+    def __init__ (self, stream, align = 4096, assume_size = None):
+        zlx.io.stream_cache.__init__(self, stream, align = align, assume_size = assume_size)
+        self.version_lock = threading.Lock()
+        self.data_version = 0
+        self.page_versions = {}
+
+# versioned_stream_cache.stamp_range()
+    def stamp_range (self, offset, size):
+        '''
+        Marks the given range as changed.
+        '''
+        with self.version_lock:
+            self.data_version += 1
+            v = self.data_version
+            for p in range(offset >> VERSION_PAGE_SHIFT, ((offset + size - 1) >> VERSION_PAGE_SHIFT) + 1):
+                self.page_versions[p] = v
+        dmsg('stamped o=0x{:X} s=0x{:X} with version {}', offset, size, v)
+
+# versioned_stream_cache.get_data_version()
+    def get_data_version (self, offset, size):
+        '''
+        Returns the version of the most recent change inside the given range.
+        '''
+        if offset < 0:
+            size += offset
+            offset = 0
+        if size <= 0: return 0
+        pv = self.page_versions
+        return max(pv.get(p, 0) for p in range(offset >> VERSION_PAGE_SHIFT, ((offset + size - 1) >> VERSION_PAGE_SHIFT) + 1))
+
+# versioned_stream_cache.load()
+    def load (self, offset, size):
+        zlx.io.stream_cache.load(self, offset, size)
+        self.stamp_range(offset, size)
+
+#* stream_cache_proxy *******************************************************
+class stream_cache_proxy (zlx.io.stream_cache_proxy):
+    '''
+    Proxy served by a zlx.io.stream_cache_server that also exposes the
+    data versions of its versioned_stream_cache source and calls notify()
+    from the worker thread after a batch of loads completes.
+    '''
+
+# stream_cache_proxy.__init__()
+    def __init__ (self, source, server, delay = 0, notify = None):
+        zlx.io.stream_cache_proxy.__init__(self, source, server, delay)
+        self.notify = notify
+
+# stream_cache_proxy.work_()
+    def work_ (self):
+        zlx.io.stream_cache_proxy.work_(self)
+        if self.notify and self.updated:
+            self.notify()
+
+# stream_cache_proxy.get_data_version()
+    def get_data_version (self, offset, size):
+        return self.source.get_data_version(offset, size)
+
+# stream_cache_proxy.prefetch()
+    def prefetch (self, ranges):
+        pass
+
+#* sparse_map ***************************************************************
+class sparse_map (object):
+    '''
+    The data extents of a sparse file as sorted, disjoint (start, end)
+    ranges; the rest of the file, up to size, is holes (reading as zeros).
+    '''
+
+# sparse_map.__init__()
+    def __init__ (self, extents, size):
+        self.starts = [s for s, e in extents]
+        self.ends = [e for s, e in extents]
+        self.size = size
+
+# sparse_map.__repr__()
+    def __repr__ (self):
+        return 'sparse_map({} extents, data=0x{:X}, size=0x{:X})'.format(
+                len(self.starts), self.get_data_size(0, self.size), self.size)
+
+# sparse_map.find()
+    def find (self, offset):
+        '''
+        Returns (is_data, run_end): whether offset is in a data extent and
+        where that extent or hole ends.
+        '''
+        i = bisect.bisect_right(self.starts, offset) - 1
+        if i >= 0 and offset < self.ends[i]: return True, self.ends[i]
+        return False, self.starts[i + 1] if i + 1 < len(self.starts) else self.size
+
+# sparse_map.is_hole()
+    def is_hole (self, start, end):
+        is_data, run_end = self.find(start)
+        return not is_data and run_end >= end
+
+# sparse_map.get_data_ranges()
+    def get_data_ranges (self, start, end, margin = 0):
+        '''
+        Returns the data extents within [start, end), each one extended
+        margin bytes before its start (so that a match of up to margin + 1
+        bytes ending in data gets found), merged where they touch.
+        '''
+        ranges = []
+        i = max(0, bisect.bisect_right(self.starts, start) - 1)
+        while i < len(self.starts) and self.starts[i] < end:
+            s = max(start, self.starts[i] - margin)
+            e = min(end, self.ends[i])
+            i += 1
+            if e <= s: continue
+            if ranges and s <= ranges[-1][1]: ranges[-1] = (ranges[-1][0], max(e, ranges[-1][1]))
+            else: ranges.append((s, e))
+        return ranges
+
+# sparse_map.get_data_size()
+    def get_data_size (self, start, end):
+        return sum(e - s for s, e in self.get_data_ranges(start, end))
+
+# sparse_map.next_data()
+    def next_data (self, offset):
+        '''
+        Returns the start of the first data extent after offset or None.
+        '''
+        i = bisect.bisect_right(self.starts, offset)
+        return self.starts[i] if i < len(self.starts) else None
+
+# sparse_map.prev_data()
+    def prev_data (self, offset):
+        '''
+        Returns the start of the last data extent before offset or None.
+        '''
+        i = bisect.bisect_left(self.starts, offset) - 1
+        return self.starts[i] if i >= 0 else None
+
+# class sparse_map - end
+
+#* load_sparse_map **********************************************************
+def load_sparse_map (path, size):
+    '''
+    Returns the sparse_map of a local file, found with lseek(SEEK_DATA /
+    SEEK_HOLE), or None if the file has no holes or the system cannot
+    tell. The file gets opened again so that the seeks do not move the
+    position of a descriptor shared with readers.
+    '''
+    if not path or not hasattr(os, 'SEEK_DATA'): return None
+    extents = []
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        dmsg('cannot open {!r} to map holes: {}', path, e)
+        return None
+    try:
+        o = 0
+        while o < size:
+            try:
+                start = os.lseek(fd, o, os.SEEK_DATA)
+            except OSError as e:
+                # ENXIO: no data past o
+                if e.errno == errno.ENXIO: break
+                raise
+            o = min(size, os.lseek(fd, start, os.SEEK_HOLE))
+            if start >= size: break
+            extents.append((start, o))
+    except OSError as e:
+        dmsg('cannot map holes of {!r}: {}', path, e)
+        return None
+    finally:
+        os.close(fd)
+    if extents == [(0, size)]: return None
+    return sparse_map(extents, size)
+
+#* block_source *************************************************************
+class block_source (object):
+    '''
+    Base for the stream sources implemented here; derive and provide
+    get_part() and get_known_end_offset().
+    '''
+
+# block_source.get()
+    def get (self, offset, size):
+        '''
+        Returns the list of blocks describing the given range, as returned
+        by get_part().
+        '''
+        a = []
+        while size:
+            blk = self.get_part(offset, size)
+            a.append(blk)
+            offset += blk.get_size()
+            size -= blk.get_size() or size
+        return a
+
+# block_source.read()
+    def read (self, offset, size):
+        '''
+        Reads data synchronously (for background jobs, not for the UI).
+        Returns a bytes-like object, shorter than size at the end.
+        '''
+        raise RuntimeError('reading not supported by {!r}'.format(self))
+
+# block_source.get_local_path()
+    def get_local_path (self):
+        '''
+        Returns the path of the regular file behind the source (so that
+        other processes can open it) or None.
+        '''
+        return None
+
+# block_source.get_sparse_map()
+    def get_sparse_map (self):
+        '''
+        Returns the sparse_map of the holes of the source or None.
+        '''
+        return None
+
+# block_source.get_data_version()
+    def get_data_version (self, offset, size):
+        return 0
+
+# block_source.growth_ends
+    # where the stream ended before each time it grew (see add_growth())
+    growth_ends = ()
+    growth_versions = ()
+
+# block_source.add_growth()
+    def add_growth (self, old_end, version):
+        '''
+        Records that the stream grew past old_end, which changed the data
+        of ranges reaching beyond it (their end-of-stream part).
+        '''
+        if not self.growth_ends: self.growth_ends, self.growth_versions = [], []
+        # versions first: get_growth_version() can run in another thread
+        self.growth_versions.append(version)
+        self.growth_ends.append(old_end)
+
+# block_source.get_growth_version()
+    def get_growth_version (self, end):
+        '''
+        Returns the version of the last growth that changed data before
+        end or 0; ranges that were complete already keep their version, so
+        only the rows around the old end get rendered again.
+        '''
+        i = bisect.bisect_left(self.growth_ends, end)
+        return self.growth_versions[i - 1] if i else 0
+
+# block_source.load()
+    def load (self, offset, size):
+        pass
+
+# block_source.prefetch()
+    def prefetch (self, ranges):
+        '''
+        Hints that the given (offset, size) ranges will be needed soon.
+        The hint replaces the previous one: ranges hinted before and not
+        read yet can be dropped.
+        '''
+        pass
+
+# block_source.reset_updated()
+    def reset_updated (self):
+        '''
+        Returns True if data arrived since the last call.
+        '''
+        return False
+
+#* mmap_stream **************************************************************
+class mmap_stream (block_source):
+    '''
+    Read-only view of a local regular file through mmap.
+    Provides the block interface of zlx.io.stream_cache (get(), get_part(),
+    get_known_end_offset()) with all data reported as cached blocks holding
+    memoryview slices of the mapping, so nothing gets copied or loaded in the
+    background; the OS page cache does the caching.
+    With start / size only that region of the file is shown (a member
+    stored in an archive); it is then not offered as a local file.
+    Whole files can grow (see extend()); notify() is called then.
+    '''
+
+# mmap_stream.__init__()
+    def __init__ (self, f, start = 0, size = None, notify = None):
+        self.stream = f
+        self.notify = notify
+        self.updated = False
+        self.data_version = 0
+        file_size = os.fstat(f.fileno()).st_size
+        self.start = start
+        self.size = file_size - start if size is None else size
+        self.whole = start == 0 and self.size == file_size
+        self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        self.view = memoryview(self.map)[start : start + self.size]
+        self.sparse = load_sparse_map(self.get_local_path(), self.size)
+
+# mmap_stream.__repr__()
+    def __repr__ (self):
+        return 'mmap_stream({!r}, size=0x{:X})'.format(self.stream, self.size)
+
+# mmap_stream.get_part()
+    def get_part (self, offset, size):
+        if size < 0:
+            raise ValueError('negative size: {}'.format(size))
+        if offset < 0:
+            return zlx.io.hole_block(offset, min(size, -offset))
+        if offset >= self.size:
+            return zlx.io.hole_block(offset, 0)
+        if self.sparse:
+            is_data, run_end = self.sparse.find(offset)
+            if not is_data: return zlx.io.hole_block(offset, min(size, run_end - offset))
+            size = min(size, run_end - offset)
+        return zlx.io.cached_data_block(offset, self.view[offset : offset + size])
+
+# mmap_stream.get_known_end_offset()
+    def get_known_end_offset (self):
+        return self.size
+
+# mmap_stream.extend()
+    def extend (self, end):
+        '''
+        Maps the file again after it grew to end (when following it); can
+        be called from any thread. The old mapping is left to the garbage
+        collector as jobs can still hold views of it.
+        '''
+        if not self.whole or end <= self.size: return
+        m = mmap.mmap(self.stream.fileno(), 0, access = mmap.ACCESS_READ)
+        if len(m) < end: end = len(m)
+        if end <= self.size: return
+        self.data_version += 1
+        self.add_growth(self.size, self.data_version)
+        self.map = m
+        self.view = memoryview(m)[:end]
+        if self.sparse: self.sparse = load_sparse_map(self.get_local_path(), end)
+        self.size = end
+        self.updated = True
+        if self.notify: self.notify()
+
+# mmap_stream.get_data_version()
+    def get_data_version (self, offset, size):
+        return self.get_growth_version(offset + size)
+
+# mmap_stream.reset_updated()
+    def reset_updated (self):
+        u = self.updated
+        self.updated = False
+        return u
+
+# mmap_stream.get_local_path()
+    def get_local_path (self):
+        return get_regular_file_path(self.stream) if self.whole else None
+
+# mmap_stream.get_sparse_map()
+    def get_sparse_map (self):
+        return self.sparse
+
+# mmap_stream.read()
+    def read (self, offset, size):
+        offset = max(0, offset)
+        return self.view[offset : offset + size]
+
+# mmap_stream.prefetch()
+    def prefetch (self, ranges):
+        # the kernel reads the pages in the background; there is nothing to
+        # cancel as reading ahead is cheap for it to drop
+        if not hasattr(mmap, 'MADV_WILLNEED'): return
+        for offset, size in ranges:
+            e = self.start + min(self.size, offset + size)
+            o = zlx.int.pow2_round_down(self.start + max(0, offset), mmap.PAGESIZE)
+            if e <= o: continue
+            try:
+                self.map.madvise(mmap.MADV_WILLNEED, o, e - o)
+            except OSError as e:
+                dmsg('madvise failed: {}', e)
+                return
+
+#* get_regular_file_path ****************************************************
+def get_regular_file_path (f):
+    path = getattr(f, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path): return path
+    return None
+
+#* can_mmap *****************************************************************
+def can_mmap (f):
+    '''
+    Returns True if f is a non-empty regular file that mmap_stream can map.
+    '''
+    try:
+        st = os.fstat(f.fileno())
+    except (AttributeError, OSError, ValueError):
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+
+#* page_pool ****************************************************************
+class page_pool (object):
+    '''
+    Pages loaded by all block_cache instances of a session, kept under a
+    common memory budget. The least recently used pages get evicted first.
+    '''
+
+# page_pool.__init__()
+    def __init__ (self, budget, page_size = 0x10000):
+        assert zlx.int.pow2_check(page_size), 'page size must be a power of 2'
+        self.page_size = page_size
+        self.page_shift = page_size.bit_length() - 1
+        # never go below a few screens worth of pages to avoid thrashing
+        self.budget = max(budget, 16 * page_size)
+        self.lock = threading.Lock()
+        self.pages = collections.OrderedDict()
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+
+# page_pool.lookup()
+    def lookup (self, owner, index):
+        '''
+        Returns the page data or None if the page is not in the pool.
+        '''
+        key = (owner, index)
+        with self.lock:
+            data = self.pages.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.pages.move_to_end(key)
+        return data
+
+# page_pool.peek()
+    def peek (self, owner, index):
+        '''
+        Returns the page data (or None) without counting a lookup or
+        refreshing its age.
+        '''
+        with self.lock:
+            return self.pages.get((owner, index))
+
+# page_pool.contains()
+    def contains (self, owner, index):
+        '''
+        Checks for a page without counting a lookup or refreshing its age.
+        '''
+        with self.lock:
+            return (owner, index) in self.pages
+
+# page_pool.insert()
+    def insert (self, owner, index, data):
+        key = (owner, index)
+        evicted = []
+        with self.lock:
+            old = self.pages.pop(key, None)
+            if old is not None: self.used -= len(old)
+            self.pages[key] = data
+            self.used += len(data)
+            self.loads += 1
+            while self.used > self.budget and len(self.pages) > 1:
+                k, d = self.pages.popitem(last = False)
+                self.used -= len(d)
+                self.evictions += 1
+                evicted.append(k)
+        for o, i in evicted:
+            o.on_evict(i)
+
+# page_pool.discard()
+    def discard (self, owner, index):
+        '''
+        Removes a page if present.
+        '''
+        with self.lock:
+            data = self.pages.pop((owner, index), None)
+            if data is not None: self.used -= len(data)
+
+# page_pool.drop()
+    def drop (self, owner):
+        '''
+        Removes all pages of the given owner.
+        '''
+        with self.lock:
+            for k in [k for k in self.pages if k[0] is owner]:
+                self.used -= len(self.pages.pop(k))
+
+# page_pool.get_stats()
+    def get_stats (self):
+        with self.lock:
+            return dict(
+                    pages = len(self.pages),
+                    used = self.used,
+                    budget = self.budget,
+                    page_size = self.page_size,
+                    hits = self.hits,
+                    misses = self.misses,
+                    loads = self.loads,
+                    evictions = self.evictions)
+
+# page_pool.format_stats()
+    def format_stats (self):
+        st = self.get_stats()
+        lookups = st['hits'] + st['misses']
+        return [
+            'block cache: {} pages of {} KiB, {:.1f} / {:.1f} MiB used'.format(
+                st['pages'], st['page_size'] >> 10,
+                st['used'] / (1 << 20), st['budget'] / (1 << 20)),
+            'hits: {}, misses: {} ({:.1f}% hit), loads: {}, evictions: {}'.format(
+                st['hits'], st['misses'],
+                100.0 * st['hits'] / lookups if lookups else 0,
+                st['loads'], st['evictions']),
+        ]
+
+#* block_cache **************************************************************
+class block_cache (block_source):
+    '''
+    Stream source that reads a seekable stream in fixed size pages kept in
+    a page_pool. Missing pages are reported as uncached blocks and get
+    loaded by the workers of a zlx.io.stream_cache_server (this class has
+    what the server expects from a stream_cache_proxy: queued, load_queue
+    and work_()); notify() is called after a batch of loads.
+    '''
+
+# block_cache.__init__()
+    def __init__ (self, stream, pool, server, delay = 0, notify = None):
+        self.stream = stream
+        self.pool = pool
+        self.server = server
+        self.delay = delay
+        self.notify = notify
+        self.page_size = pool.page_size
+        self.page_shift = pool.page_shift
+        self.end = stream.seek(0, os.SEEK_END)
+        self.lock = threading.Lock()
+        self.stream_lock = threading.Lock()
+        self.queued = False
+        self.demand_queue = []
+        self.prefetch_queue = collections.deque()
+        self.queued_pages = set()
+        # pages some get() asked for while missing
+        self.wanted_pages = set()
+        # prefetches never take more than this share of the pool
+        self.prefetch_limit = pool.budget // 4
+        self.updated = False
+        self.data_version = 0
+        self.page_versions = {}
+        self.sparse = load_sparse_map(self.get_local_path(), self.end)
+
+# block_cache.__repr__()
+    def __repr__ (self):
+        return 'block_cache({!r}, size=0x{:X})'.format(self.stream, self.end)
+
+# block_cache.get_part()
+    def get_part (self, offset, size):
+        if size < 0:
+            raise ValueError('negative size: {}'.format(size))
+        if offset < 0:
+            return zlx.io.hole_block(offset, min(size, -offset))
+        if offset >= self.end:
+            return zlx.io.hole_block(offset, 0)
+        if self.sparse:
+            is_data, run_end = self.sparse.find(offset)
+            if not is_data: return zlx.io.hole_block(offset, min(size, run_end - offset))
+            size = min(size, run_end - offset)
+        index = offset >> self.page_shift
+        o = offset & (self.page_size - 1)
+        n = min(size, self.end - offset, self.page_size - o)
+        data = self.pool.lookup(self, index)
+        if data is None:
+            self.queue_page_(index)
+            return zlx.io.uncached_data_block(offset, n)
+        if o >= len(data):
+            # the stream got shorter than it was when opened
+            return zlx.io.hole_block(offset, 0)
+        return zlx.io.cached_data_block(offset, memoryview(data)[o : o + n])
+
+# block_cache.get_known_end_offset()
+    def get_known_end_offset (self):
+        return self.end
+
+# block_cache.extend()
+    def extend (self, end):
+        '''
+        Grows the stream to end, for streams whose size gets known as they
+        get processed (see compressed.compressed_file) and files being
+        followed; can be called from any thread.
+        '''
+        with self.lock:
+            if end <= self.end: return
+            # the last page got loaded short
+            last = (self.end >> self.page_shift) if self.end & (self.page_size - 1) else None
+            self.data_version += 1
+            self.add_growth(self.end, self.data_version)
+            self.end = end
+            self.updated = True
+        if last is not None:
+            self.pool.discard(self, last)
+            self.page_versions.pop(last, None)
+        if self.sparse: self.sparse = load_sparse_map(self.get_local_path(), end)
+        if self.notify: self.notify()
+
+# block_cache.get_data_version()
+    def get_data_version (self, offset, size):
+        if offset < 0:
+            size += offset
+            offset = 0
+        if size <= 0: return 0
+        pv = self.page_versions
+        return max(self.get_growth_version(offset + size),
+                max(pv.get(p, 0) for p in range(offset >> self.page_shift, ((offset + size - 1) >> self.page_shift) + 1)))
+
+# block_cache.reset_updated()
+    def reset_updated (self):
+        with self.lock:
+            u = self.updated
+            self.updated = False
+        return u
+
+# block_cache.load_queue
+    @property
+    def load_queue (self):
+        # checked by the server to decide whether to keep calling work_()
+        return self.demand_queue or self.prefetch_queue
+
+# block_cache.queue_page_()
+    def queue_page_ (self, index):
+        with self.lock:
+            self.wanted_pages.add(index)
+            if index in self.queued_pages: return
+            self.queued_pages.add(index)
+            self.demand_queue.append(index)
+        self.server.queue_stream_(self)
+
+# block_cache.prefetch()
+    def prefetch (self, ranges):
+        pages = []
+        seen = set()
+        for offset, size in ranges:
+            o = max(0, offset)
+            e = min(self.end, offset + size)
+            for index in range(o >> self.page_shift, ((e - 1) >> self.page_shift) + 1 if e > o else 0):
+                if index in seen: continue
+                seen.add(index)
+                pages.append(index)
+        pages = pages[: max(1, self.prefetch_limit >> self.page_shift)]
+        # pages get checked outside the cache lock; a page loaded meanwhile
+        # is just skipped by work_()
+        pages = [i for i in pages if not self.pool.contains(self, i)]
+        with self.lock:
+            self.prefetch_queue.clear()
+            self.prefetch_queue.extend(i for i in pages if i not in self.queued_pages)
+            pending = bool(self.prefetch_queue)
+        dmsg('prefetch {} pages', len(pages))
+        if pending: self.server.queue_stream_(self)
+
+# block_cache.load_page()
+    def load_page (self, index):
+        offset = index << self.page_shift
+        while True:
+            n = min(self.page_size, self.end - offset)
+            data = self.read_stream(offset, n)
+            with self.lock:
+                # a page read while the stream grew (see extend()) is read again
+                if n != min(self.page_size, self.end - offset): continue
+                self.pool.insert(self, index, bytes(data))
+                break
+        dmsg('loaded page 0x{:X}: 0x{:X} bytes', index, len(data))
+        with self.lock:
+            self.data_version += 1
+            self.page_versions[index] = self.data_version
+            self.queued_pages.discard(index)
+            if index in self.wanted_pages:
+                # only pages someone waits for need a refresh
+                self.wanted_pages.discard(index)
+                self.updated = True
+
+# block_cache.get_local_path()
+    def get_local_path (self):
+        return get_regular_file_path(self.stream)
+
+# block_cache.get_sparse_map()
+    def get_sparse_map (self):
+        return self.sparse
+
+# block_cache.read_stream()
+    def read_stream (self, offset, size):
+        with self.stream_lock:
+            self.stream.seek(offset)
+            return self.stream.read(size) or b''
+
+# block_cache.read()
+    def read (self, offset, size):
+        '''
+        Reads through the pages already in the pool and straight from the
+        stream for the rest (without adding pages to the pool, so that a long
+        scan does not evict the pages on screen); holes of sparse files are
+        filled with zeros without reading them.
+        '''
+        offset = max(0, offset)
+        size = min(size, self.end - offset)
+        out = bytearray()
+        o = offset
+        e = offset + size
+        while o < e:
+            run_end = e
+            if self.sparse:
+                is_data, run_end = self.sparse.find(o)
+                run_end = min(e, run_end)
+                if not is_data:
+                    out += bytes(run_end - o)
+                    o = run_end
+                    continue
+            index = o >> self.page_shift
+            po = o & (self.page_size - 1)
+            n = min(run_end - o, self.page_size - po)
+            data = self.pool.peek(self, index)
+            if data is not None:
+                chunk = data[po : po + n]
+            else:
+                # read all missing pages in one go
+                me = o + n
+                while me < run_end and not self.pool.contains(self, me >> self.page_shift):
+                    me = min(run_end, (me | (self.page_size - 1)) + 1)
+                chunk = self.read_stream(o, me - o)
+            if not chunk: break
+            out += chunk
+            o += len(chunk)
+        return out
+
+# block_cache.on_evict()
+    def on_evict (self, index):
+        self.page_versions.pop(index, None)
+
+# block_cache.work_()
+    def work_ (self):
+        if self.delay: time.sleep(self.delay)
+        while True:
+            with self.lock:
+                if not self.server.up: break
+                if self.demand_queue:
+                    index = self.demand_queue.pop(0)
+                elif self.prefetch_queue:
+                    index = self.prefetch_queue.popleft()
+                    if index in self.queued_pages or self.pool.contains(self, index):
+                        continue
+                    self.queued_pages.add(index)
+                else:
+                    break
+            self.load_page(index)
+        if self.notify and self.updated: self.notify()
+
+#* read_ahead ***************************************************************
+class read_ahead (object):
+    '''
+    Guesses the ranges a view will need next from the way it moves.
+    Scrolling in the same direction in quick succession reads further and
+    further ahead (up to max_screens); a jump reads radius screens around
+    the new position.
+    '''
+
+    # moves closer in time than this (seconds) make a streak
+    STREAK_INTERVAL = 0.5
+
+# read_ahead.__init__()
+    def __init__ (self, max_screens = 8, radius = 2):
+        self.max_screens = max_screens
+        self.radius = radius
+        self.last_offset = None
+        self.last_time = 0
+        self.direction = 0
+        self.streak = 0
+
+# read_ahead.update()
+    def update (self, offset, screen_size, jump = False):
+        '''
+        Records that the view now shows screen_size bytes from offset.
+        Returns the list of (offset, size) ranges to prefetch or None if the
+        view did not move.
+        '''
+        now = time.monotonic()
+        delta = 0 if self.last_offset is None else offset - self.last_offset
+        if self.last_offset is not None and not delta and not jump: return None
+        if jump or self.last_offset is None or abs(delta) > self.max_screens * screen_size:
+            self.direction = 0
+            self.streak = 0
+            r = self.radius * screen_size
+            ranges = [(offset + screen_size, r), (offset - r, r)]
+        else:
+            d = 1 if delta > 0 else -1
+            if d == self.direction and now - self.last_time < self.STREAK_INTERVAL:
+                self.streak += 1
+            else:
+                self.streak = 1
+            self.direction = d
+            screens = min(self.max_screens, self.streak + abs(delta) // screen_size)
+            if d > 0:
+                ranges = [(offset + screen_size, screens * screen_size)]
+            else:
+                ranges = [(offset - screens * screen_size, screens * screen_size)]
+        self.last_offset = offset
+        self.last_time = now
+        return ranges
+
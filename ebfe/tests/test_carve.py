@@ -0,0 +1,91 @@
+# standard module imports
+import random
+import unittest
+
+# internal module imports
+import ebfe.carve as carve
+
+# overlapping on purpose: prefixes, suffixes and repeats of each other
+SIGNATURES = [
+    ('ab', b'ab'),
+    ('abab', b'abab'),
+    ('bab', b'bab'),
+    ('b', b'b'),
+    ('aaa', b'aaa'),
+    ('ca', b'ca'),
+    ('cabab', b'cabab'),
+    ('abab-too', b'abab'),
+]
+
+#* naive_carve **************************************************************
+def naive_carve (data, signatures, start, end):
+    '''
+    Model of carve_job: (offset, signature index) of every signature
+    starting in [start, end), in offset then index order; hits may run past
+    end.
+    '''
+    return [(o, i)
+            for o in range(start, min(end, len(data)))
+            for i, (name, sig) in enumerate(signatures)
+            if data.startswith(sig, o)]
+
+#* run_carve ****************************************************************
+def run_carve (data, signatures, start, end, chunk_size, known = ()):
+    j = carve.carve_job(lambda o, n: data[o : o + n], carve.automaton(signatures),
+            start, end, chunk_size = chunk_size, known = known)
+    j.run()
+    assert j.exception is None, j.exception
+    return j
+
+#* carve_test ***************************************************************
+class carve_test (unittest.TestCase):
+
+# carve_test.hits()
+    def hits (self, j):
+        return sorted(zip(j.offsets, j.sig_indexes))
+
+# carve_test.test_against_model()
+    def test_against_model (self):
+        rng = random.Random(3)
+        for i in range(200):
+            data = bytes(rng.choice(b'abc') for i in range(rng.randint(0, 80)))
+            start = rng.randint(0, len(data))
+            end = rng.randint(start, len(data) + 5)
+            chunk_size = rng.randint(1, 30)
+            j = run_carve(data, SIGNATURES, start, end, chunk_size)
+            self.assertEqual(self.hits(j), naive_carve(data, SIGNATURES, start, end),
+                    (data, start, end, chunk_size))
+            # appended in offset order
+            self.assertEqual(list(j.offsets), sorted(j.offsets))
+
+# carve_test.test_hit_across_chunks()
+    def test_hit_across_chunks (self):
+        data = b'xxcababxx'
+        for chunk_size in range(1, 31):
+            j = run_carve(data, SIGNATURES, 0, len(data), chunk_size)
+            self.assertEqual(self.hits(j), naive_carve(data, SIGNATURES, 0, len(data)))
+            self.assertIn((2, 6), self.hits(j))
+
+# carve_test.test_many_prefixes()
+    def test_many_prefixes (self):
+        # past MAX_PREFILTER_PREFIXES the prefilter looks for first bytes only
+        sigs = [('s{}'.format(i), bytes((i % 7 + 97, i // 7 + 97, 97))) for i in range(150)]
+        rng = random.Random(4)
+        data = bytes(rng.choice(b'abcdefghijklmnopqrstuvw') for i in range(3000))
+        for chunk_size in (1, 2, 3, 29, 4096):
+            j = run_carve(data, sigs, 0, len(data), chunk_size)
+            self.assertEqual(self.hits(j), naive_carve(data, sigs, 0, len(data)))
+
+# carve_test.test_growth_spans()
+    def test_growth_spans (self):
+        rng = random.Random(5)
+        for i in range(50):
+            data = bytes(rng.choice(b'abc') for i in range(rng.randint(0, 60)))
+            old_end = rng.randint(0, len(data))
+            old = run_carve(data[:old_end], SIGNATURES, 0, old_end, rng.randint(1, 30))
+            j = run_carve(data, SIGNATURES, 0, len(data), rng.randint(1, 30),
+                    known = carve.get_growth_spans(old))
+            self.assertEqual(self.hits(j), naive_carve(data, SIGNATURES, 0, len(data)))
+
+# class carve_test - end
+
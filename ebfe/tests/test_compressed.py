@@ -0,0 +1,154 @@
+# standard module imports
+import bz2
+import gzip
+import lzma
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import unittest
+import unittest.mock
+import zlib
+
+# internal module imports
+import ebfe.compressed as compressed
+
+#* make_data ****************************************************************
+def make_data (rng, size):
+    '''
+    Returns data that compresses somewhat but keeps runs short (bzip2
+    sizes its blocks after its own run-length encoding).
+    '''
+    words = [bytes(rng.randrange(256) for i in range(rng.randint(1, 12))) for i in range(200)]
+    out = bytearray()
+    while len(out) < size: out += rng.choice(words)
+    return bytes(out[:size])
+
+#* compressed_test **********************************************************
+class compressed_test (unittest.TestCase):
+
+# compressed_test.setUp()
+    def setUp (self):
+        self.dir = tempfile.mkdtemp()
+        self.files = []
+        # small reads: checkpoints land closer to the spacing asked for and
+        # reads stop inside compressed blocks more often
+        for name, value in (('READ_SIZE', 1000), ('OUTPUT_SIZE', 5000)):
+            p = unittest.mock.patch.object(compressed, name, value)
+            p.start()
+            self.addCleanup(p.stop)
+
+# compressed_test.tearDown()
+    def tearDown (self):
+        for cf in self.files: cf.close()
+        shutil.rmtree(self.dir)
+
+# compressed_test.write()
+    def write (self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, 'wb') as f: f.write(data)
+        return path
+
+# compressed_test.open()
+    def open (self, path, fmt, cache_dir = None, **kw):
+        '''
+        Returns a compressed_file for path after running its index job.
+        '''
+        cf = compressed.compressed_file(path, fmt, **kw)
+        self.files.append(cf)
+        j = compressed.index_job(cf, cache_dir)
+        j.run()
+        self.assertIsNone(j.exception)
+        self.assertTrue(cf.complete)
+        return cf
+
+# compressed_test.check_seeks()
+    def check_seeks (self, cf, model, points = None):
+        '''
+        Compares random reads of cf against model, favouring offsets near
+        the seek points; seeks go back and forth so both the cached cursor
+        and fresh ones get used.
+        '''
+        self.assertEqual(cf.size, len(model))
+        if points is not None: self.assertGreaterEqual(len(cf.points), points)
+        rng = random.Random(len(model))
+        starts = [u for u, state in cf.points]
+        for i in range(150):
+            o = rng.choice([rng.randint(0, len(model)), rng.choice(starts) + rng.randint(-3, 3)])
+            o = max(0, o)
+            n = rng.choice([1, rng.randint(0, 100), rng.randint(0, 300000)])
+            cf.seek(o)
+            self.assertEqual(cf.read(n), model[o : o + n], (o, n))
+            self.assertEqual(cf.tell(), min(max(o, len(model)), o + n) if o < len(model) else o)
+        cf.seek(0)
+        self.assertEqual(cf.read(), model)
+
+# compressed_test.test_gzip_members()
+    def test_gzip_members (self):
+        rng = random.Random(1)
+        parts = [make_data(rng, n) for n in (200000, 1, 0, 150000, 70000)]
+        path = self.write('a.gz', b''.join(gzip.compress(p) for p in parts))
+        model = b''.join(parts)
+        cf = self.open(path, compressed.gzip_format(30000))
+        self.check_seeks(cf, model, points = len(model) // 30000)
+        # member starts are the only points stored, as the rest need windows
+        members = {0, 200000, 200001, 350001}
+        self.assertTrue(members <= set(u for u, a, b in cf.get_packed_points()))
+
+# compressed_test.test_raw_deflate()
+    def test_raw_deflate (self):
+        rng = random.Random(2)
+        model = make_data(rng, 300000)
+        c = zlib.compressobj(wbits = -zlib.MAX_WBITS)
+        data = c.compress(model) + c.flush()
+        path = self.write('member', b'junk' + data + b'more junk')
+        cf = self.open(path, compressed.gzip_format(20000, raw = True),
+                start = 4, end = 4 + len(data), name = path + ':member')
+        self.check_seeks(cf, model, points = 10)
+
+# compressed_test.test_xz_streams()
+    def test_xz_streams (self):
+        rng = random.Random(3)
+        parts = [make_data(rng, n) for n in (100000, 1, 60000, 120000)]
+        # stream padding is allowed between streams
+        path = self.write('a.xz', bytes(4).join(lzma.compress(p) for p in parts) + bytes(8))
+        cf = self.open(path, compressed.xz_format(0))
+        self.assertEqual([u for u, state in cf.points], [0, 100000, 100001, 160001])
+        self.check_seeks(cf, b''.join(parts))
+
+# compressed_test.test_xz_blocks()
+    @unittest.skipUnless(shutil.which('xz'), 'xz not installed')
+    def test_xz_blocks (self):
+        rng = random.Random(4)
+        model = make_data(rng, 400000)
+        data = subprocess.run(['xz', '-c', '--block-size=50000'], input = model,
+                stdout = subprocess.PIPE, check = True).stdout
+        cf = self.open(self.write('b.xz', data), compressed.xz_format(0))
+        self.assertEqual(len(cf.points), 8)
+        self.check_seeks(cf, model)
+
+# compressed_test.test_bz2_blocks()
+    def test_bz2_blocks (self):
+        rng = random.Random(5)
+        # compression level 1 makes blocks of about 100 KB
+        parts = [make_data(rng, n) for n in (350000, 1, 20000)]
+        path = self.write('a.bz2', b''.join(bz2.compress(p, 1) for p in parts))
+        model = b''.join(parts)
+        cf = self.open(path, compressed.bz2_format(0))
+        self.assertGreaterEqual(len(cf.points), 6)
+        self.check_seeks(cf, model)
+
+# compressed_test.test_seek_index()
+    def test_seek_index (self):
+        rng = random.Random(6)
+        parts = [make_data(rng, n) for n in (250000, 50000)]
+        path = self.write('c.bz2', b''.join(bz2.compress(p, 1) for p in parts))
+        cache_dir = os.path.join(self.dir, 'cache')
+        first = self.open(path, compressed.bz2_format(0), cache_dir)
+        again = self.open(path, compressed.bz2_format(0), cache_dir)
+        self.assertEqual(again.points, first.points)
+        self.check_seeks(again, b''.join(parts))
+
+# class compressed_test - end
+
@@ -0,0 +1,263 @@
+# standard module imports
+import random
+import unittest
+
+# custom external module imports
+import zlx.io
+
+# internal module imports
+import ebfe.edit_buffer as edit_buffer
+import ebfe.streams as streams
+
+#* bytes_source *************************************************************
+class bytes_source (streams.block_source):
+    '''
+    In-memory stream source; extend() appends to it like a followed file.
+    '''
+
+# bytes_source.__init__()
+    def __init__ (self, data):
+        self.data = bytearray(data)
+
+# bytes_source.get_part()
+    def get_part (self, offset, size):
+        if offset < 0: return zlx.io.hole_block(offset, min(size, -offset))
+        if offset >= len(self.data): return zlx.io.hole_block(offset, 0)
+        return zlx.io.cached_data_block(offset, bytes(self.data[offset : offset + size]))
+
+# bytes_source.get_known_end_offset()
+    def get_known_end_offset (self):
+        return len(self.data)
+
+# bytes_source.read()
+    def read (self, offset, size):
+        return bytes(self.data[max(0, offset) : max(0, offset) + size])
+
+# bytes_source.extend()
+    def extend (self, data):
+        self.data += data
+
+# class bytes_source - end
+
+#* random_edit **************************************************************
+def random_edit (rng, table, model):
+    '''
+    Applies the same random edit to table and to the bytearray model;
+    offsets favour piece boundaries and the end of the stream.
+    '''
+    end = len(model)
+    offset = rng.choice([0, end, max(0, end - 1), rng.randint(0, end)])
+    size = rng.choice([0, 1, rng.randint(0, 20)])
+    data = bytes(rng.randrange(256) for i in range(rng.choice([0, 1, rng.randint(1, 20)])))
+    op = rng.randrange(4)
+    if op == 0:
+        table.insert(offset, data)
+        model[offset:offset] = data
+    elif op == 1:
+        table.delete(offset, size)
+        del model[offset : offset + size]
+    elif op == 2:
+        table.overwrite(offset, data)
+        model[offset : offset + len(data)] = data
+    else:
+        table.replace(offset, size, data)
+        model[offset : offset + size] = data
+
+#* read_blocks **************************************************************
+def read_blocks (table, offset, size):
+    '''
+    Returns the bytes of [offset, offset + size) as get() reports them,
+    up to the end of the stream.
+    '''
+    out = b''
+    for blk in table.get(offset, size):
+        if blk.kind == zlx.io.SCK_HOLE:
+            assert blk.get_size() == 0, 'hole before the end: {!r}'.format(blk)
+            break
+        out += bytes(blk.data)
+    return out
+
+#* piece_table_test *********************************************************
+class piece_table_test (unittest.TestCase):
+
+# piece_table_test.check()
+    def check (self, table, model):
+        end = len(model)
+        self.assertEqual(table.get_known_end_offset(), end)
+        self.assertEqual(table.read(0, end + 10), bytes(model))
+        self.assertEqual(read_blocks(table, 0, end + 10), bytes(model))
+        parts = table.map_range(0, end)
+        self.assertEqual(sum(n for o, src, so, n in parts), end)
+        o = 0
+        for po, src, so, n in parts:
+            self.assertEqual(po, o)
+            self.assertGreater(n, 0)
+            o += n
+
+# piece_table_test.test_unmodified()
+    def test_unmodified (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123456789'))
+        self.assertFalse(t.is_modified())
+        self.assertEqual(t.read(3, 4), b'3456')
+        self.assertEqual(t.get_piece_count(), 1)
+
+# piece_table_test.test_edits_at_boundaries()
+    def test_edits_at_boundaries (self):
+        model = bytearray(b'0123456789')
+        t = edit_buffer.piece_table(bytes_source(model))
+        t.insert(0, b'ab'); model[0:0] = b'ab'
+        t.insert(len(model), b'yz'); model += b'yz'
+        t.delete(len(model) - 1, 5); del model[-1:]
+        t.overwrite(len(model) - 1, b'QRS'); model[-1:] = b'QRS'
+        t.delete(2, 0)
+        t.replace(1, 3, b''); del model[1:4]
+        self.check(t, model)
+        self.assertTrue(t.is_modified())
+
+# piece_table_test.test_offsets_clamped()
+    def test_offsets_clamped (self):
+        t = edit_buffer.piece_table(bytes_source(b'abc'))
+        t.insert(100, b'd')
+        t.delete(-5, 1)
+        self.check(t, bytearray(b'bcd'))
+
+# piece_table_test.test_random_edits()
+    def test_random_edits (self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            model = bytearray(rng.randrange(256) for i in range(rng.randint(0, 300)))
+            t = edit_buffer.piece_table(bytes_source(model))
+            for i in range(300):
+                random_edit(rng, t, model)
+                if i % 25 == 0:
+                    o = rng.randint(0, len(model))
+                    n = rng.randint(0, 50)
+                    self.assertEqual(t.read(o, n), bytes(model[o : o + n]))
+                    self.assertEqual(read_blocks(t, o, n), bytes(model[o : o + n]))
+            self.check(t, model)
+
+# piece_table_test.test_typing_coalesces_pieces()
+    def test_typing_coalesces_pieces (self):
+        t = edit_buffer.piece_table(bytes_source(b'x' * 100))
+        for i in range(50): t.insert(10 + i, b'a')
+        # the original split in two around one added piece
+        self.assertEqual(t.get_piece_count(), 3)
+        self.check(t, bytearray(b'x' * 10 + b'a' * 50 + b'x' * 90))
+
+# piece_table_test.test_growing_source()
+    def test_growing_source (self):
+        src = bytes_source(b'0123')
+        t = edit_buffer.piece_table(src)
+        t.insert(2, b'ab')
+        src.extend(b'4567')
+        self.check(t, bytearray(b'01ab234567'))
+        # editing past the old end pulls the new bytes in the table
+        t.delete(8, 1)
+        src.extend(b'89')
+        self.check(t, bytearray(b'01ab2345789'))
+
+# piece_table_test.test_snapshots_unchanged()
+    def test_snapshots_unchanged (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123456789'))
+        t.insert(5, b'abc')
+        state = t.state
+        t.delete(0, 7)
+        t.state = state
+        self.check(t, bytearray(b'01234abc56789'))
+
+# class piece_table_test - end
+
+#* edit_journal_test ********************************************************
+class edit_journal_test (unittest.TestCase):
+
+# edit_journal_test.test_random_undo_redo()
+    def test_random_undo_redo (self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            model = bytearray(rng.randrange(256) for i in range(100))
+            t = edit_buffer.piece_table(bytes_source(model))
+            j = edit_buffer.edit_journal(t)
+            history = [bytes(model)]
+            for i in range(60):
+                offset = rng.randint(0, len(model))
+                data = bytes(rng.randrange(256) for i in range(rng.randint(0, 4)))
+                size = rng.randint(0, 4)
+                j.replace('edit', offset, size, data, 0, 0)
+                j.seal()
+                model[offset : offset + size] = data
+                history.append(bytes(model))
+            for expected in reversed(history[:-1]):
+                self.assertIsNotNone(j.undo())
+                self.assertEqual(t.read(0, 1000), expected)
+            self.assertIsNone(j.undo())
+            self.assertFalse(t.is_modified())
+            for expected in history[1:]:
+                self.assertIsNotNone(j.redo())
+                self.assertEqual(t.read(0, 1000), expected)
+            self.assertIsNone(j.redo())
+
+# edit_journal_test.test_typing_coalesces()
+    def test_typing_coalesces (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123456789'))
+        j = edit_buffer.edit_journal(t)
+        for i in range(5): j.replace('insert', 3 + i, 0, b'a', 3 + i, 4 + i)
+        self.assertEqual(len(j.undo_entries), 1)
+        # a different kind starts a new entry
+        j.replace('delete', 7, 1, b'', 8, 7)
+        self.assertEqual(len(j.undo_entries), 2)
+        e = j.undo()
+        self.assertEqual(e.kind, 'delete')
+        self.assertEqual(t.read(0, 100), b'012aaaaa3456789')
+        e = j.undo()
+        self.assertEqual((e.cursor_before, e.cursor_after), (3, 8))
+        self.assertEqual(t.read(0, 100), b'0123456789')
+
+# edit_journal_test.test_seal_and_distance_break_coalescing()
+    def test_seal_and_distance_break_coalescing (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123456789'))
+        j = edit_buffer.edit_journal(t)
+        j.replace('overwrite', 1, 1, b'a', 1, 2)
+        j.seal()
+        j.replace('overwrite', 2, 1, b'b', 2, 3)
+        j.replace('overwrite', 8, 1, b'c', 8, 9)
+        self.assertEqual(len(j.undo_entries), 3)
+
+# edit_journal_test.test_new_edit_drops_redo()
+    def test_new_edit_drops_redo (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123'))
+        j = edit_buffer.edit_journal(t)
+        j.replace('insert', 0, 0, b'a', 0, 1)
+        j.undo()
+        self.assertTrue(j.can_redo())
+        j.replace('insert', 4, 0, b'b', 4, 5)
+        self.assertFalse(j.can_redo())
+        self.assertEqual(j.cost, sum(e.cost for e in j.undo_entries))
+
+# edit_journal_test.test_budget_trimming()
+    def test_budget_trimming (self):
+        t = edit_buffer.piece_table(bytes_source(bytes(1000)))
+        j = edit_buffer.edit_journal(t, budget = 4 * edit_buffer.JOURNAL_ENTRY_COST * 8)
+        for i in range(100):
+            j.replace('overwrite', i * 7, 1, b'x', 0, 0)
+            j.seal()
+        self.assertLess(len(j.undo_entries), 100)
+        self.assertLessEqual(j.cost, j.budget)
+        self.assertEqual(j.cost, sum(e.cost for e in j.undo_entries))
+        # the oldest entries went: undoing all keeps the first edits
+        while j.undo(): pass
+        self.assertEqual(t.read(0, 1), b'x')
+        self.assertEqual(t.read(693, 1), b'\0')
+
+# edit_journal_test.test_budget_keeps_last_entry()
+    def test_budget_keeps_last_entry (self):
+        t = edit_buffer.piece_table(bytes_source(b'0123'))
+        j = edit_buffer.edit_journal(t, budget = 1)
+        j.replace('insert', 0, 0, b'a', 0, 1)
+        j.seal()
+        j.replace('insert', 0, 0, b'b', 0, 1)
+        self.assertEqual(len(j.undo_entries), 1)
+        j.undo()
+        self.assertEqual(t.read(0, 10), b'a0123')
+
+# class edit_journal_test - end
+
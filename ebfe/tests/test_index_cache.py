@@ -0,0 +1,113 @@
+# standard module imports
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+# internal module imports
+import ebfe.index_cache as index_cache
+import ebfe.overview as overview
+
+#* index_cache_test *********************************************************
+class index_cache_test (unittest.TestCase):
+
+# index_cache_test.setUp()
+    def setUp (self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        self.path = os.path.join(self.dir, 'data')
+        p = unittest.mock.patch.object(index_cache, 'MIN_FILE_SIZE', 1)
+        p.start()
+        self.addCleanup(p.stop)
+        rng = random.Random(1)
+        self.write(bytes(rng.randrange(256) for i in range(16 * overview.MIN_BUCKET_SIZE + 5)))
+
+# index_cache_test.tearDown()
+    def tearDown (self):
+        shutil.rmtree(self.dir)
+
+# index_cache_test.write()
+    def write (self, data, offset = 0):
+        with open(self.path, 'r+b' if os.path.exists(self.path) else 'wb') as f:
+            f.seek(offset)
+            f.write(data)
+
+# index_cache_test.read()
+    def read (self, offset, size):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(size)
+
+# index_cache_test.map()
+    def map (self):
+        '''
+        Loads the index, maps the file reusing the stats it has (as
+        main.run_overview() does) and stores it again; returns the index as
+        loaded (with the stats it had) and the job.
+        '''
+        index = index_cache.load_index(self.cache_dir, self.path, self.read)
+        known = index.get_overview()
+        end = index.key[0]
+        job = overview.overview_job(self.read, end, known = known,
+                bucket_size = index.get_bucket_size())
+        self.assertEqual(job.bucket_count, index.region_count)
+        self.assertEqual(job.bucket_size, index.region_size)
+        job.run()
+        self.assertIsNone(job.exception)
+        index.set_overview(job.stats)
+        self.assertTrue(index_cache.store_index(self.cache_dir, index, self.read))
+        return known, job
+
+# index_cache_test.assert_stats()
+    def assert_stats (self, stats, expected):
+        '''
+        Compares overview stats (stored as 32-bit floats).
+        '''
+        self.assertEqual([s is None for s in stats], [s is None for s in expected])
+        for s, e in zip(stats, expected):
+            if s is None: continue
+            for f in ('entropy', 'zero', 'text', 'high'):
+                self.assertAlmostEqual(getattr(s, f), getattr(e, f), places = 5)
+
+# index_cache_test.test_unchanged()
+    def test_unchanged (self):
+        self.map()
+        known, job = self.map()
+        self.assert_stats(known, job.stats)
+
+# index_cache_test.test_grown()
+    def test_grown (self):
+        known, first = self.map()
+        self.assertIsNone(known)
+        # the last region was partial: only the ones before it are kept
+        self.write(b'x', first.end)
+        known, job = self.map()
+        self.assertEqual(job.bucket_size, first.bucket_size)
+        kept = first.end // first.bucket_size
+        self.assert_stats(known, first.stats[:kept] + [None] * (job.bucket_count - kept))
+        # a change inside a kept region gets noticed; growing past a few
+        # regions still keeps the layout
+        self.write(b'y', 3 * job.bucket_size)
+        self.write(bytes(5 * job.bucket_size), job.end)
+        known, job = self.map()
+        self.assertEqual(job.bucket_size, first.bucket_size)
+        self.assertEqual([i for i, s in enumerate(known) if s is None],
+                [3] + list(range(kept, job.bucket_count)))
+        # the stats kept are those the file has
+        fresh = overview.overview_job(self.read, job.end, bucket_size = job.bucket_size)
+        fresh.run()
+        self.assert_stats(known[:3] + known[4:kept], fresh.stats[:3] + fresh.stats[4:kept])
+
+# index_cache_test.test_shrunk()
+    def test_shrunk (self):
+        self.map()
+        os.truncate(self.path, 8 * overview.MIN_BUCKET_SIZE)
+        known, job = self.map()
+        self.assertIsNone(known)
+        self.assertEqual((job.bucket_count, job.bucket_size),
+                overview.get_bucket_layout(job.end))
+
+# class index_cache_test - end
+
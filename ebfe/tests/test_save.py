@@ -0,0 +1,152 @@
+# standard module imports
+import os
+import random
+import stat
+import tempfile
+import unittest
+
+# internal module imports
+import ebfe.edit_buffer as edit_buffer
+import ebfe.save as save
+import ebfe.streams as streams
+
+#* save_test ****************************************************************
+class save_test (unittest.TestCase):
+
+# save_test.setUp()
+    def setUp (self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.files = []
+        rng = random.Random(1)
+        self.original = bytes(rng.randrange(256) for i in range(100000))
+        self.path = os.path.join(self.dir, 'data.bin')
+        with open(self.path, 'wb') as f: f.write(self.original)
+        os.chmod(self.path, 0o640)
+
+# save_test.tearDown()
+    def tearDown (self):
+        for f in self.files: f.close()
+        self.tmp.cleanup()
+
+# save_test.open_table()
+    def open_table (self):
+        f = open(self.path, 'rb')
+        self.files.append(f)
+        return edit_buffer.piece_table(streams.mmap_stream(f))
+
+# save_test.read_file()
+    def read_file (self, path):
+        with open(path, 'rb') as f: return f.read()
+
+# save_test.run_save()
+    def run_save (self, table, path):
+        job = save.save_job(table, path)
+        job.run()
+        self.assertIsNone(job.exception)
+        return job
+
+# save_test.test_layout_of_overwrites()
+    def test_layout_of_overwrites (self):
+        t = self.open_table()
+        t.overwrite(10, b'ab')
+        t.overwrite(12, b'cd')
+        t.overwrite(5000, b'x')
+        parts = save.get_layout(t)
+        self.assertTrue(save.is_overwrite_only(t, parts))
+        ranges = save.get_dirty_ranges(parts)
+        self.assertEqual([(o, sum(n for so, n in pl)) for o, pl in ranges], [(10, 4), (5000, 1)])
+
+# save_test.test_layout_of_moves()
+    def test_layout_of_moves (self):
+        t = self.open_table()
+        t.insert(10, b'ab')
+        t.delete(20, 2)
+        self.assertFalse(save.is_overwrite_only(t, save.get_layout(t)))
+        t = self.open_table()
+        t.delete(len(self.original) - 1, 1)
+        self.assertFalse(save.is_overwrite_only(t, save.get_layout(t)))
+        t = self.open_table()
+        t.insert(len(self.original), b'z')
+        self.assertFalse(save.is_overwrite_only(t, save.get_layout(t)))
+
+# save_test.test_save_in_place()
+    def test_save_in_place (self):
+        t = self.open_table()
+        t.overwrite(0, b'head')
+        t.overwrite(50000, b'middle')
+        t.overwrite(len(self.original) - 3, b'end')
+        expected = t.read(0, len(self.original))
+        job = self.run_save(t, self.path)
+        self.assertTrue(job.in_place)
+        self.assertEqual(job.total, 13)
+        self.assertEqual(self.read_file(self.path), expected)
+
+# save_test.test_rebuild_in_place_of_original()
+    def test_rebuild_in_place_of_original (self):
+        t = self.open_table()
+        t.insert(0, b'start')
+        t.delete(1000, 5000)
+        t.insert(20000, b'inserted' * 1000)
+        t.overwrite(30000, b'over')
+        t.insert(t.get_known_end_offset(), b'tail')
+        size = t.get_known_end_offset()
+        expected = t.read(0, size)
+        job = self.run_save(t, self.path)
+        self.assertFalse(job.in_place)
+        self.assertEqual(self.read_file(self.path), expected)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o640)
+        self.assertEqual(os.listdir(self.dir), ['data.bin'])
+
+# save_test.test_save_to_new_file()
+    def test_save_to_new_file (self):
+        t = self.open_table()
+        t.overwrite(7, b'x')
+        expected = t.read(0, len(self.original))
+        path = os.path.join(self.dir, 'new.bin')
+        job = self.run_save(t, path)
+        self.assertFalse(job.in_place)
+        self.assertEqual(self.read_file(path), expected)
+        self.assertEqual(self.read_file(self.path), self.original)
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o666 & ~umask)
+
+# save_test.test_shrinking_rebuild()
+    def test_shrinking_rebuild (self):
+        t = self.open_table()
+        t.delete(0, 90000)
+        self.run_save(t, self.path)
+        self.assertEqual(self.read_file(self.path), self.original[90000:])
+
+# save_test.test_saved_state_is_the_one_at_start()
+    def test_saved_state_is_the_one_at_start (self):
+        t = self.open_table()
+        t.insert(5, b'kept')
+        job = save.save_job(t, self.path)
+        expected = t.read(0, t.get_known_end_offset())
+        t.insert(0, b'later')
+        t.state = job.table_state
+        job.run()
+        self.assertEqual(self.read_file(self.path), expected)
+
+# save_test.test_cancelled_rebuild_leaves_original()
+    def test_cancelled_rebuild_leaves_original (self):
+        t = self.open_table()
+        t.insert(0, b'a')
+        t.insert(60000, b'b')
+        job = save.save_job(t, self.path)
+        # cancelled once the first part got written
+        add_progress = job.add_progress
+        def cancel_after (n):
+            add_progress(n)
+            job.cancel()
+        job.add_progress = cancel_after
+        job.run()
+        self.assertIsNone(job.exception)
+        self.assertLess(job.bytes_done, job.total)
+        self.assertEqual(self.read_file(self.path), self.original)
+        self.assertEqual(os.listdir(self.dir), ['data.bin'])
+
+# class save_test - end
+
@@ -0,0 +1,102 @@
+# standard module imports
+import concurrent.futures
+import os
+import random
+import tempfile
+import unittest
+
+# internal module imports
+import ebfe.search as search
+
+PATTERNS = ('x:61 62', 'x:61 ?? 61', 'a:aba', 'a:b', 'u:ab', 'r:a[bc]+a', 'x:00 00 00')
+
+#* naive_find ***************************************************************
+def naive_find (data, pat, start, end, backward = False):
+    '''
+    Model of search.find(): tries the regex at each offset of [start, end);
+    matches may run past end.
+    '''
+    offsets = range(start, min(end, len(data)))
+    if backward: offsets = reversed(offsets)
+    for o in offsets:
+        if pat.regex.match(data, o): return o
+    return None
+
+#* random_data **************************************************************
+def random_data (rng, size):
+    '''
+    Returns bytes over a tiny alphabet so that patterns match often and
+    straddle chunk boundaries.
+    '''
+    return bytes(rng.choice(b'abc\x00') for i in range(size))
+
+#* find_test ****************************************************************
+class find_test (unittest.TestCase):
+
+# find_test.test_against_model()
+    def test_against_model (self):
+        rng = random.Random(1)
+        for text in PATTERNS:
+            pat = search.compile_pattern(text)
+            for i in range(150):
+                data = random_data(rng, rng.randint(0, 60))
+                start = rng.randint(0, len(data))
+                end = rng.randint(start, len(data) + 3)
+                chunk_size = rng.randint(1, 9)
+                for backward in (False, True):
+                    self.assertEqual(
+                            search.find(lambda o, n: data[o : o + n], pat, start, end,
+                                backward = backward, chunk_size = chunk_size),
+                            naive_find(data, pat, start, end, backward),
+                            (text, data, start, end, chunk_size, backward))
+
+# find_test.test_match_across_chunks()
+    def test_match_across_chunks (self):
+        pat = search.compile_pattern('a:needle')
+        data = b'.' * 13 + b'needle' + b'.' * 13
+        read = lambda o, n: data[o : o + n]
+        for chunk_size in range(1, 12):
+            self.assertEqual(search.find(read, pat, 0, len(data), chunk_size = chunk_size), 13)
+            self.assertEqual(search.find(read, pat, 0, len(data), backward = True, chunk_size = chunk_size), 13)
+        # only the start of the match has to be inside the range
+        self.assertEqual(search.find(read, pat, 0, 14, chunk_size = 4), 13)
+        self.assertIsNone(search.find(read, pat, 14, len(data), backward = True, chunk_size = 4))
+
+# find_test.test_backward_overlapping()
+    def test_backward_overlapping (self):
+        pat = search.compile_pattern('a:aa')
+        data = b'xaaaax'
+        read = lambda o, n: data[o : o + n]
+        for chunk_size in range(1, 8):
+            self.assertEqual(search.find(read, pat, 0, 6, backward = True, chunk_size = chunk_size), 3)
+            self.assertEqual(search.find(read, pat, 0, 3, backward = True, chunk_size = chunk_size), 2)
+
+# class find_test - end
+
+#* parallel_find_test *******************************************************
+class parallel_find_test (unittest.TestCase):
+
+# parallel_find_test.test_against_model()
+    def test_against_model (self):
+        rng = random.Random(2)
+        fd, path = tempfile.mkstemp()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(2) as pool:
+                for i in range(40):
+                    data = random_data(rng, rng.randint(1, 80))
+                    with open(path, 'wb') as f: f.write(data)
+                    pat = search.compile_pattern(rng.choice(PATTERNS))
+                    start = rng.randint(0, len(data))
+                    end = rng.randint(start, len(data))
+                    for backward in (False, True):
+                        self.assertEqual(
+                                search.parallel_find(pool, path, pat, start, end,
+                                    backward = backward, shard_size = rng.randint(1, 10)),
+                                naive_find(data, pat, start, end, backward),
+                                (pat.text, data, start, end, backward))
+        finally:
+            os.close(fd)
+            os.unlink(path)
+
+# class parallel_find_test - end
+
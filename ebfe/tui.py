@@ -1,4 +1,7 @@
 import functools
+import heapq
+import itertools
+import time
 from collections import namedtuple
 
 import zlx.record
@@ -82,8 +85,13 @@ class resize_message (message):
 
 #* key_message **************************************************************
 class key_message (message):
-    __slots__ = 'key'.split()
+    '''
+    Key press; count > 1 when the application merged a run of the same key.
+    '''
+    __slots__ = 'key count'.split()
     name = 'key'
+    def __init__ (self, key, count = 1):
+        message.__init__(self, key, count)
 
 #* driver *******************************************************************
 class driver (object):
@@ -129,22 +137,61 @@ class driver (object):
         return style
 
 # driver.get_message()
-    def get_message (self):
+    def get_message (self, timeout = None):
         '''
+        Waits for a message at most timeout seconds (forever if None).
+        Should return message(name = 'timeout') if nothing happened in time
+        and message(name = 'wakeup') if wakeup() got called meanwhile.
         Overload this or else...
         '''
         return message('quit')
 
+# driver.wakeup()
+    def wakeup (self):
+        '''
+        Makes a get_message() in progress (or the next one) return a wakeup
+        message. Must be safe to call from any thread.
+        Overload this!
+        '''
+        pass
+
+# driver.can_scroll()
+    def can_scroll (self):
+        '''
+        Overload this to return True if scroll_rect() is implemented.
+        '''
+        return False
+
+# driver.scroll_rect()
+    def scroll_rect (self, row, col, height, width, count):
+        '''
+        Shifts the content of the given rectangle up by count rows (down if
+        count is negative); the rows exposed get blanked. The application
+        only asks for rectangles spanning the whole width of the screen.
+        Overload this together with can_scroll().
+        '''
+        raise RuntimeError('must be implemented in derived class')
+
+# driver.get_pending_message()
+    def get_pending_message (self):
+        '''
+        Returns a message if one is available without waiting, None otherwise.
+        Overload this to let the application batch the pending input.
+        '''
+        return None
+
 # driver.render()
-    def render (self, updates):
+    def render (self, updates, scrolls = ()):
         '''
-        Goes through all update strips and renders them.
+        Performs the scrolls then goes through all update strips and renders them.
         No need to overload this.
         '''
         focus_row = 0
         focus_col = 0
-        dmsg('driver: {} updates', len(updates))
+        dmsg('driver: {} updates, {} scrolls', len(updates), len(scrolls))
         self.prepare_render_text()
+        for s in scrolls:
+            self.scroll_rect(s.row, s.col, s.height, s.width, s.count)
         for row, strips in updates.items():
             for s in strips:
                 if isinstance(s, cursor_update):
@@ -263,9 +310,20 @@ def trim_strips (sl, col, width = None, end_col = None, transform_strip = None):
         r.append(transform_strip(s))
     return r
 
+#* styled_strip *************************************************************
+# styled text (with style markers) written from col, starting in style_name;
+# windows send whole rows this way instead of a strip per chunk
+styled_strip = zlx.record.make('tui.styled_strip', 'text style_name col')
+
+#* timer ********************************************************************
+timer = zlx.record.make('tui.timer', 'deadline interval func repeat active')
+
 #* cursor_update ************************************************************
 cursor_update = zlx.record.make('tui.cursor_update', 'mode row col')
 
+#* scroll_update ************************************************************
+scroll_update = zlx.record.make('tui.scroll_update', 'row col height width count')
+
 #* style_update *************************************************************
 style_update = zlx.record.make('tui.style_update', 'col width restyler')
 
@@ -321,7 +379,7 @@ def styled_text_chunks (styled_text, initial_style = 'default'):
 
 #* strip_styles_from_styled_text ********************************************
 def strip_styles_from_styled_text (styled_text):
-    return ''.join((x.split(STYLE_END, 1)[1] for x in (STYLE_END + text).split(STYLE_BEGIN)))
+    return ''.join((x.split(STYLE_END, 1)[1] for x in (STYLE_END + styled_text).split(STYLE_BEGIN)))
 
 #* get_char_width ***********************************************************
 def get_char_width (ch):
@@ -356,7 +414,7 @@ def compute_styled_text_index_of_column (styled_text, column):
 
 #* compute_styled_text_width ************************************************
 def compute_styled_text_width (styled_text):
-    return compute_styled_text_index_of_column(styled_text, 9999)[1]
+    return compute_text_width(strip_styles_from_styled_text(styled_text))
 
 #* generate_style_markers ***************************************************/
 def generate_style_markers (styles_desc):
@@ -463,29 +521,38 @@ class window (object):
         self._write_updates(row, (strip(text, style_name, col),))
         #dmsg('win={!r}({}x{}) write strip: row={} col={} style={!r} text={!r}', self, self.width, self.height, row, col, style_name, text)
 
-# window.write()
-    def write (self, row, col, style_name, text, clip_col = 0, clip_width = None):
+# window._clip()
+    def _clip (self, col, text, clip_col, clip_width):
         '''
-        Adds the given text taking into account the given clipping coords.
-        No need to overload this.
+        Returns the (col, text) part of text written at col that lies in
+        the given clipping coords, or None if nothing does.
         '''
         # limit clipping coords to window width
         clip_end_col = clip_col + clip_width if clip_width is not None else self.width
         if clip_col < 0: clip_col = 0
         if clip_end_col > self.width: clip_end = self.width
-        if clip_col >= clip_end_col: return
+        if clip_col >= clip_end_col: return None
 
         if col < clip_col:
             i = compute_index_of_column(text, clip_col - col)
-            if i is None: return
+            if i is None: return None
             col = clip_col
             text = text[i:]
         #clip_end_col = clip_col + clip_width if clip_width is not None else self.width
         #if clip_end_col > self.width: clip_end_col = self.width
-        if col >= clip_end_col: return
+        if col >= clip_end_col: return None
         i = compute_index_of_column(text, clip_end_col - col)
         if i is not None: text = text[:i]
-        self._write(row, col, style_name, text)
+        return col, text
+
+# window.write()
+    def write (self, row, col, style_name, text, clip_col = 0, clip_width = None):
+        '''
+        Adds the given text taking into account the given clipping coords.
+        No need to overload this.
+        '''
+        ct = self._clip(col, text, clip_col, clip_width)
+        if ct is not None: self._write(row, ct[0], style_name, ct[1])
 
 # window.sfmt()
     def sfmt (self, fmt, *l, **kw):
@@ -496,10 +563,29 @@ class window (object):
 
 # window.put()
     def put (self, row, col, styled_text, clip_col = 0, clip_width = None):
+        '''
+        Writes styled text. Text that needs no clipping goes up to the
+        application as one styled_strip; otherwise its chunks (adjacent
+        ones of the same style merged) go as a single list of strips.
+        No need to overload this.
+        '''
         #dmsg("************* put self: {}, row: {}, col: {}, clip_col: {}, clip_width: {}", self, row, col, clip_col, clip_width)
+        clip_end_col = min(self.width, clip_col + clip_width if clip_width is not None else self.width)
+        if clip_col <= col and col + compute_styled_text_width(styled_text) <= clip_end_col:
+            self._write_updates(row, (styled_strip(styled_text, self.default_style_name, col), ))
+            return
+        runs = []
         for style, text in styled_text_chunks(styled_text, self.default_style_name):
-            self.write(row, col, style, text, clip_col, clip_width)
+            if not text: continue
+            if runs and runs[-1][0] == style: runs[-1][1].append(text)
+            else: runs.append((style, [text]))
+        strips = []
+        for style, texts in runs:
+            text = ''.join(texts)
+            ct = self._clip(col, text, clip_col, clip_width)
+            if ct is not None: strips.append(strip(ct[1], style, ct[0]))
             col += compute_text_width(text)
+        self._write_updates(row, strips)
 
 # window.set_cursor()
     def set_cursor (self, mode, row = 0, col = 0):
@@ -508,6 +594,39 @@ class window (object):
             return
         self._write_updates(row, [cursor_update(mode, row, col)])
 
+# window.add_timer()
+    def add_timer (self, interval, func, repeat = True):
+        '''
+        Requests func() to be called after interval seconds (and every
+        interval seconds if repeat is set). The request goes up to the
+        application so the window must be attached.
+        Returns the timer object (None if the window has no parent).
+        No need to overload this.
+        '''
+        if not self.parent:
+            dmsg('{}: cannot add timer without parent', self)
+            return None
+        return self.parent.add_timer(interval, func, repeat)
+
+# window.cancel_timer()
+    def cancel_timer (self, t):
+        if t is not None: t.active = False
+
+# window.scroll_rows()
+    def scroll_rows (self, count, start_row = 0, height = None):
+        '''
+        Shifts the displayed content of the given rows up by count rows (down
+        if count is negative). The rows exposed at the other end are left
+        with stale content and must be refreshed by the caller.
+        Returns False if the content could not be shifted, in which case the
+        caller must refresh all the rows.
+        No need to overload this.
+        '''
+        if height is None: height = self.height - start_row
+        if count == 0 or abs(count) >= height or not self.parent:
+            return False
+        return self.parent.on_child_scroll(self, start_row, 0, height, self.width, count)
+
 # window.update_style()
     def update_style (self, row, col, width, restyler):
         if isinstance(restyler, str):
@@ -579,6 +698,8 @@ class window (object):
 
 # window.handle_key()
     def handle_key (self, msg):
+        if msg.count > 1:
+            return self.on_key_repeat(msg.key, msg.count)
         return self.on_key(msg.key)
 
 # window.on_key()
@@ -586,6 +707,18 @@ class window (object):
         dmsg('{}: received key {}', self, key)
         return False
 
+# window.on_key_repeat()
+    def on_key_repeat (self, key, count):
+        '''
+        Called when the same key was pressed count times in a row.
+        Overload this to handle the whole run at once (for instance to
+        scroll once by count rows); by default on_key() is called count times.
+        '''
+        key_handled = False
+        for i in range(count):
+            key_handled = self.on_key(key)
+        return key_handled
+
 # window.handle()
     def handle (self, msg):
         '''
@@ -662,6 +795,8 @@ class window (object):
     def input_timeout (self):
         '''
         Calls on_input_timeout on self.
+        The application calls this on the whole window tree when it gets
+        woken up by a background event (see application.wakeup()).
         '''
         dmsg('{}.input_timeout()', self)
         self.on_input_timeout()
@@ -771,7 +906,10 @@ class container (window):
         ul = []
         for u in update_list:
             if isinstance(u, strip):
-                ul.append(strip(u.text, u.style_name, u.col + c))
+                # children at column 0 (most of them) pass their strips on
+                ul.append(strip(u.text, u.style_name, u.col + c) if c else u)
+            elif isinstance(u, styled_strip):
+                ul.append(styled_strip(u.text, u.style_name, u.col + c) if c else u)
             elif isinstance(u, cursor_update):
                 ul.append(cursor_update(u.mode, u.row + r, u.col + c))
             elif isinstance(u, style_update):
@@ -780,6 +918,14 @@ class container (window):
                 raise error("boo")
         self._write_updates(row + r, ul)
 
+# container.on_child_scroll()
+    def on_child_scroll (self, child, row, col, height, width, count):
+        item = self.win_to_item_[child]
+        r, c = self._get_item_row_col(item)
+        if c is None or not self.parent:
+            return False
+        return self.parent.on_child_scroll(self, row + r, col + c, height, width, count)
+
 # container.set_item_visibility()
     def set_item_visibility (self, win, visible = True, toggle = False):
         '''
@@ -1052,6 +1198,19 @@ class container (window):
 
         return key_handled
 
+# container.on_key_repeat()
+    def on_key_repeat (self, key, count):
+        if not self.focused_item:
+            return window.on_key_repeat(self, key, count)
+        if self.pre_key(key):
+            window.on_key_repeat(self, key, count - 1)
+            return True
+        key_handled = self.focused_item.window.on_key_repeat(key, count)
+        if not key_handled:
+            for i in range(count):
+                key_handled = self.post_key(key)
+        return key_handled
+
 # class container - end
 
 #* vcontainer ***************************************************************
@@ -1566,6 +1725,12 @@ class input_line (window):
             self.pos = 0
             self.refresh()
 
+# input_line.set_text()
+    def set_text (self, text):
+        self.text = text
+        self.pos = len(text)
+        self.refresh()
+
 # input_line.on_key()
     def on_key (self, key):
         if key in ('Ctrl-A', 'Home'):
@@ -1645,8 +1810,14 @@ class application (window):
     - generate_style_map() - to generate style according to driver's capabilities
     - various message handlers: handle_xxx() (handle_timeout, handle_char)
     - refresh_strip() - to generate output for a row portion when asked
+    Set REPEATABLE_KEYS to the keys whose consecutive presses can be merged
+    into a single key message with a count (see on_key_repeat()).
     '''
 
+    REPEATABLE_KEYS = frozenset()
+    # max number of messages handled before rendering a frame
+    MAX_MESSAGE_BATCH = 256
+
 # application.__init__()
     def __init__ (self):
         '''
@@ -1654,7 +1825,15 @@ class application (window):
         Overload this!
         '''
         window.__init__(self)
-        self.updates = {}
+        self.style_ids = {}
+        self.style_names = []
+        self.cursor = None
+        self.scrolls = []
+        self.hw_scroll = False
+        self.driver = None
+        self.timers = []
+        self.timer_seq = itertools.count()
+        self._alloc_screen(0, 0)
 
 # application.generate_style_map()
     def generate_style_map (self, style_caps):
@@ -1671,38 +1850,299 @@ class application (window):
                 bg = style_caps.bg_default)
         return dict(default = default_style)
 
+# application._get_style_id()
+    def _get_style_id (self, style_name):
+        sid = self.style_ids.get(style_name)
+        if sid is None:
+            sid = len(self.style_names)
+            self.style_ids[style_name] = sid
+            self.style_names.append(style_name)
+        return sid
+
+# application._alloc_screen()
+    def _alloc_screen (self, width, height):
+        '''
+        Allocates the shadow screen: frame_text/frame_style hold the content
+        the windows want displayed (one char and one style id per cell),
+        screen_text/screen_style hold what was last sent to the driver.
+        No need to overload this.
+        '''
+        sid = self._get_style_id('default')
+        self.frame_text = [[' '] * width for r in range(height)]
+        self.frame_style = [[sid] * width for r in range(height)]
+        self.screen_text = [[None] * width for r in range(height)]
+        self.screen_style = [[None] * width for r in range(height)]
+        self.dirty_rows = set(range(height))
+        self.scrolls = []
+
+# application.invalidate_screen()
+    def invalidate_screen (self):
+        '''
+        Forgets what the driver displays so the next frame sends everything.
+        Call this when the screen got wiped behind our back.
+        '''
+        for row in range(len(self.screen_text)):
+            self.screen_text[row] = [None] * len(self.screen_text[row])
+            self.screen_style[row] = [None] * len(self.screen_style[row])
+        self.dirty_rows = set(range(len(self.screen_text)))
+
+# application.resize()
+    def resize (self, width = None, height = None):
+        if width is None: width = self.width
+        if height is None: height = self.height
+        self._alloc_screen(max(0, width), max(0, height))
+        window.resize(self, width, height)
+
 # application.wipe_updates()
     def wipe_updates (self):
         '''
-        Empties the strips from the updates field.
+        Drops the pending updates (the shadow screen is left as it is).
         No need to overload this.
         '''
-        self.updates = {}
+        self.dirty_rows = set()
+        self.cursor = None
+        self.scrolls = []
+
+# application._diff_row()
+    def _diff_row (self, row):
+        '''
+        Returns the strips needed to bring the displayed row to the content
+        of the shadow screen and marks them as displayed.
+        Changed runs of the same style separated by only a few unchanged cells
+        are merged to avoid extra cursor moves.
+        '''
+        ft = self.frame_text[row]
+        fs = self.frame_style[row]
+        st = self.screen_text[row]
+        ss = self.screen_style[row]
+        if ft == st and fs == ss: return []
+        w = len(ft)
+        changed = [ft[c] != st[c] or fs[c] != ss[c] for c in range(w)]
+        sl = []
+        c = 0
+        while c < w:
+            if not changed[c]:
+                c += 1
+                continue
+            start = c
+            sid = fs[c]
+            end = c + 1
+            c += 1
+            while c < w and fs[c] == sid and c - end <= 3:
+                if changed[c]: end = c + 1
+                c += 1
+            c = end
+            sl.append(strip(''.join(ft[start:end]), self.style_names[sid], start))
+        self.screen_text[row] = ft[:]
+        self.screen_style[row] = fs[:]
+        return sl
 
 # application.fetch_updates()
     def fetch_updates (self):
         '''
-        Extracts the updates from this window.
+        Extracts the updates from this window: only the runs of cells that
+        differ from what the driver displays.
         No need to overload this
         '''
-        u = self.updates
+        u = {}
+        for row in sorted(self.dirty_rows):
+            sl = self._diff_row(row)
+            if sl: u[row] = sl
+        if self.cursor:
+            u.setdefault(self.cursor.row, []).append(self.cursor)
         self.wipe_updates()
         dmsg('updates: {!r}', u)
         return u
 
+# application.fetch_scrolls()
+    def fetch_scrolls (self):
+        '''
+        Extracts the scrolls the driver must perform before rendering the
+        updates. Call this before fetch_updates().
+        No need to overload this
+        '''
+        sl = self.scrolls
+        self.scrolls = []
+        return sl
+
+# application._shift_rows()
+    @staticmethod
+    def _shift_rows (rows, row, col, height, width, count):
+        '''
+        Shifts the cells of the rectangle and returns the range of rows
+        exposed (which keep their previous content).
+        '''
+        if count > 0:
+            rr = range(row, row + height - count)
+            vacated = range(row + height - count, row + height)
+        else:
+            rr = range(row + height - 1, row - count - 1, -1)
+            vacated = range(row, row - count)
+        for r in rr:
+            rows[r][col : col + width] = rows[r + count][col : col + width]
+        return vacated
+
+# application.on_child_scroll()
+    def on_child_scroll (self, child, row, col, height, width, count):
+        '''
+        Shifts the shadow screen content of the given rectangle.
+        If the driver can scroll, the displayed copy is shifted as well and
+        the scroll is queued for the driver, so only the exposed rows will
+        need sending. Terminals only scroll whole lines: the rows get
+        scrolled across the screen and the cells beside the rectangle are
+        sent again, which only pays off for rectangles spanning at least
+        half the screen width; narrower ones are repainted.
+        '''
+        if row < 0 or col < 0 or row + height > len(self.frame_text) \
+                or col + width > self.width or abs(count) >= height:
+            return False
+        self._shift_rows(self.frame_text, row, col, height, width, count)
+        self._shift_rows(self.frame_style, row, col, height, width, count)
+        if self.hw_scroll and 2 * width >= self.width:
+            w = self.width
+            self._shift_rows(self.screen_text, row, 0, height, w, count)
+            for r in self._shift_rows(self.screen_style, row, 0, height, w, count):
+                self.screen_text[r][:] = [None] * w
+                self.screen_style[r][:] = [None] * w
+            self.scrolls.append(scroll_update(row, 0, height, w, count))
+        self.dirty_rows.update(range(row, row + height))
+        return True
+
+# application._put_text()
+    def _put_text (self, row, col, text, style_name):
+        ft = self.frame_text[row]
+        if col < 0:
+            text = text[-col:]
+            col = 0
+        n = min(len(text), len(ft) - col)
+        if n <= 0: return
+        ft[col : col + n] = text[:n]
+        self.frame_style[row][col : col + n] = [self._get_style_id(style_name)] * n
+
+# application._put_styled_text()
+    def _put_styled_text (self, row, col, styled_text, style_name):
+        '''
+        Same as _put_text() for each chunk of styled text, with the cells of
+        the row assigned once.
+        '''
+        text = []
+        styles = []
+        for style_name, t in styled_text_chunks(styled_text, style_name):
+            text.append(t)
+            styles.extend(itertools.repeat(self._get_style_id(style_name), len(t)))
+        text = ''.join(text)
+        ft = self.frame_text[row]
+        if col < 0:
+            text = text[-col:]
+            styles = styles[-col:]
+            col = 0
+        n = min(len(text), len(ft) - col)
+        if n <= 0: return
+        ft[col : col + n] = text[:n]
+        self.frame_style[row][col : col + n] = styles[:n]
+
+# application._restyle()
+    def _restyle (self, row, col, width, restyler):
+        ft = self.frame_text[row]
+        fs = self.frame_style[row]
+        end = min(len(ft), col + width)
+        c = max(0, col)
+        while c < end:
+            start = c
+            sid = fs[c]
+            while c < end and fs[c] == sid: c += 1
+            new_sid = self._get_style_id(restyler(strip(''.join(ft[start:c]), self.style_names[sid], start)))
+            fs[start:c] = [new_sid] * (c - start)
+
 # application on_child_row_updates()
     def on_child_row_updates (self, child, row, update_list):
         #dmsg('app={} row={} updates={!r}', self, row, update_list)
-        if row not in self.updates:
-            ur = []
-        else:
-            ur = self.updates[row]
+        if row < 0 or row >= len(self.frame_text): return
         for u in update_list:
             if isinstance(u, style_update):
-                ur = apply_style_update(ur, u.col, u.width, u.restyler)
+                self._restyle(row, u.col, u.width, u.restyler)
+            elif isinstance(u, cursor_update):
+                self.cursor = u
+            elif isinstance(u, styled_strip):
+                self._put_styled_text(row, u.col, u.text, u.style_name)
+            else:
+                self._put_text(row, u.col, u.text, u.style_name)
+        self.dirty_rows.add(row)
+
+# application.add_timer()
+    def add_timer (self, interval, func, repeat = True):
+        t = timer(time.monotonic() + interval, interval, func, repeat, True)
+        heapq.heappush(self.timers, (t.deadline, next(self.timer_seq), t))
+        return t
+
+# application.run_timers()
+    def run_timers (self):
+        '''
+        Calls the functions of the timers that expired.
+        No need to overload this.
+        '''
+        now = time.monotonic()
+        while self.timers:
+            deadline, seq, t = self.timers[0]
+            if t.active and deadline > now: break
+            heapq.heappop(self.timers)
+            if not t.active: continue
+            if t.repeat:
+                t.deadline = max(deadline + t.interval, now)
+                heapq.heappush(self.timers, (t.deadline, next(self.timer_seq), t))
             else:
-                ur.append(u)
-        self.updates[row] = ur
+                t.active = False
+            t.func()
+
+# application.next_timer_delay()
+    def next_timer_delay (self):
+        '''
+        Returns the number of seconds until the next timer expires or None
+        if there are no timers.
+        '''
+        while self.timers and not self.timers[0][2].active:
+            heapq.heappop(self.timers)
+        if not self.timers: return None
+        return max(0, self.timers[0][0] - time.monotonic())
+
+# application.wakeup()
+    def wakeup (self):
+        '''
+        Wakes up the main loop; can be called from any thread.
+        Background producers (loaders, jobs) call this when they have
+        something for the UI.
+        '''
+        drv = self.driver
+        if drv: drv.wakeup()
+
+# application.fetch_messages()
+    def fetch_messages (self, drv):
+        '''
+        Waits for a message (or until the next timer is due) then drains all the messages already pending
+        (up to MAX_MESSAGE_BATCH) so that one frame gets rendered for the
+        whole batch. Runs of the same repeatable key are merged into one key
+        message with a count, repeated timeouts and resizes are collapsed.
+        No need to overload this.
+        '''
+        ml = [drv.get_message(self.next_timer_delay())]
+        while len(ml) < self.MAX_MESSAGE_BATCH:
+            msg = drv.get_pending_message()
+            if msg is None: break
+            ml.append(msg)
+        if len(ml) == 1: return ml
+        dmsg('batch of {} messages', len(ml))
+        r = []
+        for msg in ml:
+            prev = r[-1] if r else None
+            if prev and prev.name == msg.name:
+                if msg.name == 'key' and msg.key == prev.key and msg.key in self.REPEATABLE_KEYS:
+                    r[-1] = key_message(msg.key, prev.count + msg.count)
+                    continue
+                if msg.name in ('timeout', 'resize', 'wakeup'):
+                    r[-1] = msg
+                    continue
+            r.append(msg)
+        return r
 
 # application.loop()
     def loop (app, drv):
@@ -1711,17 +2151,47 @@ class application (window):
         No need to overload this.
         '''
         try:
+            app.driver = drv
             drv.register_styles(app.generate_style_map(drv.get_style_caps()))
+            app.hw_scroll = drv.can_scroll()
             ss = drv.get_screen_size()
             app.resize(width = ss.width, height = ss.height)
             while True:
-                drv.render(app.fetch_updates())
-                app.handle(drv.get_message())
+                app.run_timers()
+                scrolls = app.fetch_scrolls()
+                drv.render(app.fetch_updates(), scrolls)
+                for msg in app.fetch_messages(drv):
+                    app.handle(msg)
         except app_quit as e:
             return e.ret_code
+        finally:
+            app.driver = None
+
+# application.handle_key()
+    def handle_key (self, msg):
+        if msg.key == 'Ctrl-L':
+            # the driver cleared the screen
+            self.invalidate_screen()
+        return window.handle_key(self, msg)
+
+# application.quit()
+    def quit (self):
+        '''
+        Ends the loop; overload this to clean up first.
+        '''
+        raise app_quit(0)
+
+# application.handle_quit()
+    def handle_quit (self, msg):
+        self.quit()
 
 # application.handle_timeout()
     def handle_timeout (self, msg):
+        # the due timers get run by the loop
+        pass
+
+# application.handle_wakeup()
+    def handle_wakeup (self, msg):
         self.input_timeout()
 
 # class application - end
@@ -1,5 +1,8 @@
 import curses
 import os
+import selectors
+import signal
+import sys
 import time
 import traceback
 import ebfe.tui as tui
@@ -19,13 +22,54 @@ class driver (tui.driver):
         self.cursor_mode = tui.CM_INVISIBLE
         self.cursor_row = 0
         self.cursor_col = 0
+        self.input_fd = sys.stdin.fileno()
+        self.wakeup_rfd, self.wakeup_wfd = os.pipe()
+        os.set_blocking(self.wakeup_rfd, False)
+        os.set_blocking(self.wakeup_wfd, False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.input_fd, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_rfd, selectors.EVENT_READ)
+        self.resize_pending = False
+        self.prev_sigwinch = signal.signal(signal.SIGWINCH, self.on_sigwinch)
 
-    # Returns a tuple containing the state of ALT/escape key and the translated input
-    # wait for 0.1 seconds before returning None if no key was pressed
-    def get_message (self):
-        esc = False
-        curses.halfdelay(1)
+    def close (self):
+        signal.signal(signal.SIGWINCH, self.prev_sigwinch)
+        self.selector.close()
+        os.close(self.wakeup_rfd)
+        os.close(self.wakeup_wfd)
+
+    # Runs in the main thread while it waits in get_message(); the select
+    # gets retried after this and sees the pipe readable
+    def on_sigwinch (self, signum, frame):
+        self.resize_pending = True
+        self.wakeup()
+
+    def wakeup (self):
+        try:
+            os.write(self.wakeup_wfd, b'\0')
+        except BlockingIOError:
+            # pipe full: a wakeup is pending anyway
+            pass
 
+    def drain_wakeup (self):
+        try:
+            while os.read(self.wakeup_rfd, 4096): pass
+        except BlockingIOError:
+            pass
+
+    def get_resize_message (self):
+        try:
+            ts = os.get_terminal_size(self.input_fd)
+            curses.resizeterm(ts.lines, ts.columns)
+        except (OSError, curses.error):
+            pass
+        yx = self.scr.getmaxyx()
+        return tui.resize_message(yx[1], yx[0])
+
+    # Returns the message for the next key or no_input_msg if there is no key
+    # available in the current input mode
+    def read_message (self, no_input_msg):
+        esc = False
         try:
             #c = self.scr.getkey()
             c = self.scr.getkey()
@@ -64,7 +108,38 @@ class driver (tui.driver):
             if esc:
                 return tui.key_message('Esc')
             else:
+                return no_input_msg
+
+    # Returns the translated input
+    # sleeps in select() on the terminal and the wakeup pipe; returns a
+    # timeout message if nothing happened for timeout seconds
+    def get_message (self, timeout = None):
+        msg = self.read_message(None)
+        if msg: return msg
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is not None:
+                timeout = max(0, deadline - time.monotonic())
+            events = self.selector.select(timeout)
+            if not events:
                 return tui.message(name = 'timeout')
+            if any(key.fd == self.wakeup_rfd for key, mask in events):
+                self.drain_wakeup()
+                if self.resize_pending:
+                    self.resize_pending = False
+                    return self.get_resize_message()
+                return tui.message(name = 'wakeup')
+            # input may be an incomplete escape sequence; keep waiting then
+            msg = self.read_message(None)
+            if msg: return msg
+
+    # Returns the translated input or None if no key is waiting
+    def get_pending_message (self):
+        if self.resize_pending:
+            self.resize_pending = False
+            self.drain_wakeup()
+            return self.get_resize_message()
+        return self.read_message(None)
 
     def get_screen_size (self):
         yx = self.scr.getmaxyx()
@@ -85,6 +160,26 @@ class driver (tui.driver):
         except curses.error:
             pass
 
+    def can_scroll (self):
+        return True
+
+    def scroll_rect (self, row, col, height, width, count):
+        try:
+            # full lines only (see tui.driver.scroll_rect()), which curses
+            # turns into a terminal scroll region
+            w = self.scr.derwin(height, width, row, col)
+            w.scrollok(True)
+            w.scroll(count)
+            # the sub-window shares its cells with the screen but keeps its
+            # own change markers
+            self.scr.touchline(row, height)
+            # curses only finds the scroll by comparing whole lines, so it
+            # gets sent before the cells beside the scrolled window change
+            self.scr.noutrefresh()
+            curses.doupdate()
+        except curses.error:
+            pass
+
     def prepare_render_text (self):
         self.scr.noutrefresh()
         self.scr.leaveok(True)
@@ -110,7 +205,11 @@ class driver (tui.driver):
         return
 
 def wrapped_run (stdscr, func):
-    return func(driver(stdscr))
+    drv = driver(stdscr)
+    try:
+        return func(drv)
+    finally:
+        drv.close()
 
 def run (func):
     os.environ.setdefault('ESCDELAY', '10')
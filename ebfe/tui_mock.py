@@ -0,0 +1,252 @@
+# standard module imports
+import threading
+import time
+
+# custom external module imports
+import zlx.record
+from zlx.io import dmsg
+
+# internal module imports
+import ebfe.tui as tui
+
+#* frame_stats **************************************************************
+frame_stats = zlx.record.make('tui_mock.frame_stats', 'latency bytes cells scrolls')
+
+#* estimate_sgr_size ********************************************************
+def estimate_sgr_size (style):
+    '''
+    Returns the size of the escape sequence a terminal would receive to
+    switch to the given style (reset, bold, 256-color fg and bg).
+    '''
+    s = '\x1b[0'
+    if style.attr & tui.A_BOLD: s += ';1'
+    s += ';38;5;{};48;5;{}m'.format(style.fg, style.bg)
+    return len(s)
+
+#* estimate_cup_size ********************************************************
+def estimate_cup_size (row, col):
+    return len('\x1b[{};{}H'.format(row + 1, col + 1))
+
+#* parse_script *************************************************************
+def parse_script (text):
+    '''
+    Parses a comma separated list of key names into a driver script.
+    KEY*N repeats the key N times, KEY+N hands out N presses in one go and
+    an empty item waits for the background loads.
+    '''
+    script = []
+    for item in text.split(','):
+        if not item:
+            script.append(None)
+        elif '*' in item[1:]:
+            key, n = item.rsplit('*', 1)
+            script.extend([key] * int(n))
+        elif '+' in item[1:]:
+            key, n = item.rsplit('+', 1)
+            script.append((key, ) * int(n))
+        else:
+            script.append(item)
+    return script
+
+#* driver *******************************************************************
+class driver (tui.driver):
+    '''
+    Headless driver: keeps the screen in memory and replays a script.
+    Each script item is either:
+    - a key name or a tui.message
+    - a tuple of those, handed out in one go (as if typed faster than
+      the application renders)
+    - None: waits for a wakeup() (at most settle_timeout seconds)
+    When the script runs out a quit message is returned.
+    With settle_styles set, after each frame that shows cells in one of those
+    styles the driver waits for the background loads to wake it up before
+    moving on with the script.
+    Output is not sent anywhere; the number of bytes a terminal would have
+    received is estimated for each frame and kept in self.frames.
+    '''
+
+# driver.__init__()
+    def __init__ (self, script = (),
+            width = 120, height = 40,
+            settle_styles = (), settle_timeout = 1.0,
+            can_scroll = True):
+        tui.driver.__init__(self)
+        self.script = list(script)
+        self.script_index = 0
+        self.pending = []
+        self.width = width
+        self.height = height
+        self.settle_styles = frozenset(settle_styles)
+        self.settle_timeout = settle_timeout
+        self.hw_scroll = can_scroll
+        self.wakeup_event = threading.Event()
+        self.screen_text = [[' '] * width for i in range(height)]
+        self.screen_style = [[None] * width for i in range(height)]
+        self.cursor_mode = tui.CM_INVISIBLE
+        self.cursor_row = 0
+        self.cursor_col = 0
+        self.frames = []
+        self.idle_time = 0
+        self.input_time = None
+        self.frame_bytes = 0
+        self.frame_cells = 0
+        self.frame_scrolls = 0
+        self.term_row = None
+        self.term_col = None
+        self.term_style = None
+
+# driver.get_screen_size()
+    def get_screen_size (self):
+        return tui.screen_size(width = self.width, height = self.height)
+
+# driver.get_style_caps()
+    def get_style_caps (self):
+        return tui.style_caps(
+                attr = tui.A_BOLD,
+                fg_count = 256,
+                bg_count = 256,
+                fg_default = 7,
+                bg_default = 0)
+
+# driver.wakeup()
+    def wakeup (self):
+        self.wakeup_event.set()
+
+# driver.needs_settle()
+    def needs_settle (self):
+        if not self.settle_styles: return False
+        for sl in self.screen_style:
+            if not self.settle_styles.isdisjoint(sl): return True
+        return False
+
+# driver.wait_wakeup()
+    def wait_wakeup (self, timeout):
+        t0 = time.perf_counter()
+        woken = self.wakeup_event.wait(timeout)
+        self.idle_time += time.perf_counter() - t0
+        if woken:
+            self.wakeup_event.clear()
+            return tui.message(name = 'wakeup')
+        return tui.message(name = 'timeout')
+
+# driver.next_message()
+    def next_message (self):
+        if self.pending: return self.pending.pop(0)
+        if self.wakeup_event.is_set() or self.needs_settle():
+            return self.wait_wakeup(self.settle_timeout)
+        if self.script_index >= len(self.script):
+            return tui.message(name = 'quit')
+        item = self.script[self.script_index]
+        self.script_index += 1
+        if item is None:
+            return self.wait_wakeup(self.settle_timeout)
+        if isinstance(item, tuple):
+            self.pending = [self.make_message(x) for x in item[1:]]
+            item = item[0]
+        return self.make_message(item)
+
+# driver.make_message()
+    def make_message (self, item):
+        if isinstance(item, tui.message): return item
+        return tui.key_message(item)
+
+# driver.get_message()
+    def get_message (self, timeout = None):
+        if timeout is not None and timeout <= 0:
+            return tui.message(name = 'timeout')
+        msg = self.next_message()
+        if self.input_time is None: self.input_time = time.perf_counter()
+        return msg
+
+# driver.get_pending_message()
+    def get_pending_message (self):
+        if self.pending: return self.pending.pop(0)
+        return None
+
+# driver.can_scroll()
+    def can_scroll (self):
+        return self.hw_scroll
+
+# driver.scroll_rect()
+    def scroll_rect (self, row, col, height, width, count):
+        rows = range(row, row + height)
+        # copy in the direction that does not overwrite the source rows
+        for r in (rows if count > 0 else reversed(rows)):
+            sr = r + count
+            if sr >= row and sr < row + height:
+                self.screen_text[r][col : col + width] = self.screen_text[sr][col : col + width]
+                self.screen_style[r][col : col + width] = self.screen_style[sr][col : col + width]
+        if count > 0:
+            blank = range(max(row, row + height - count), row + height)
+        else:
+            blank = range(row, min(row + height, row - count))
+        for r in blank:
+            self.screen_text[r][col : col + width] = [' '] * width
+            self.screen_style[r][col : col + width] = [None] * width
+        self.frame_scrolls += 1
+        if col == 0 and width == self.width:
+            # set scroll region, scroll, reset scroll region
+            self.frame_bytes += len('\x1b[{};{}r\x1b[{}S\x1b[r'.format(row + 1, row + height, abs(count)))
+        else:
+            # terminals only scroll full lines; the rectangle gets repainted
+            self.frame_bytes += height * (estimate_cup_size(row, col) + width)
+        self.term_row = None
+
+# driver.prepare_render_text()
+    def prepare_render_text (self):
+        self.frame_bytes = 0
+        self.frame_cells = 0
+        self.frame_scrolls = 0
+        if self.input_time is None: self.input_time = time.perf_counter()
+
+# driver.render_text()
+    def render_text (self, text, style_name, column, row):
+        if row < 0 or row >= self.height or column >= self.width: return
+        text = text[: self.width - column]
+        if self.term_row != row or self.term_col != column:
+            self.frame_bytes += estimate_cup_size(row, column)
+        if self.term_style != style_name:
+            self.frame_bytes += estimate_sgr_size(self.style_map[style_name])
+            self.term_style = style_name
+        self.frame_bytes += len(text.encode('utf8'))
+        self.frame_cells += len(text)
+        self.screen_text[row][column : column + len(text)] = list(text)
+        self.screen_style[row][column : column + len(text)] = [style_name] * len(text)
+        self.term_row = row
+        self.term_col = column + len(text)
+
+# driver.set_cursor()
+    def set_cursor (self, mode, row, col):
+        self.cursor_mode = mode
+        self.cursor_row = row
+        self.cursor_col = col
+
+# driver.finish_render_text()
+    def finish_render_text (self):
+        if self.cursor_mode != tui.CM_INVISIBLE and (self.term_row, self.term_col) != (self.cursor_row, self.cursor_col):
+            self.frame_bytes += estimate_cup_size(self.cursor_row, self.cursor_col)
+            self.term_row = self.cursor_row
+            self.term_col = self.cursor_col
+        latency = time.perf_counter() - self.input_time
+        self.input_time = None
+        self.frames.append(frame_stats(latency, self.frame_bytes, self.frame_cells, self.frame_scrolls))
+        dmsg('mock frame: {:.6f}s, {} bytes, {} cells', latency, self.frame_bytes, self.frame_cells)
+
+# driver.get_row_text()
+    def get_row_text (self, row):
+        return ''.join(self.screen_text[row])
+
+# driver.get_screen_text()
+    def get_screen_text (self):
+        return '\n'.join(self.get_row_text(r) for r in range(self.height))
+
+# class driver - end
+
+#* run **********************************************************************
+def run (func, drv = None):
+    '''
+    Runs func(drv) with a mock driver; the counterpart of tui_curses.run().
+    '''
+    if drv is None: drv = driver()
+    return func(drv)
+